@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+
+Batch_Runner.py
+
+Run many cases derived from one case input file, in parallel processes.
+
+The cases are defined by a sweep specification file, a csv file such as:
+
+    mode,grid
+    order,nearest
+    workers,4
+    solver_threads,1
+    tech_name,keyword,values
+    node_2_natgas,fixed_cost,0.01 0.02 0.03
+    node_2_solar,capacity,0 1 2
+    ,numerics_scaling,1e9 1e12
+
+Rows before the 'tech_name,keyword,values' header are settings:
+
+    mode            -- grid (default): every combination of the values
+                       list: the n-th values of every row together (all rows
+                       must have the same number of values)
+    order           -- input (default): cases run in the order of the expansion
+                       nearest: cases run in nearest-neighbour order through the
+                       values (see utilities.nearest_neighbour_order), so that
+                       each case is similar to the one before
+    workers         -- number of parallel processes (default 0 = one per CPU);
+                       1 to run the cases in this process
+    solver_threads  -- number of solver threads in each process (default 1);
+                       0 to leave <solver_options> unchanged. It is passed to
+                       the solver as the generic option 'threads', so only
+                       solvers with a 'threads' option in <generic_options>
+                       (see Solver_Interface.py) respect it; CLARABEL, ECOS
+                       and SCS do not. With threadpoolctl installed, the
+                       thread pools of numpy's BLAS and of OpenMP in each
+                       worker process are limited to it as well.
+
+Each row after the header gives the values (separated by spaces, as text as in
+the case input file) of one keyword of the technology <tech_name>, or of the
+CASE_DATA section when <tech_name> is empty. Any keyword that can be given in
+the case input file can be swept.
+
+Each case is run through preprocess_input, then the same steps as in
+Macro_Energy_Model.py (prepare_time_steps and solve_case in Run_Case.py, so
+<time_step_hours>, <num_representative_periods>, <solution_file>,
+<dispatch_only>, <rolling_horizon>, <benders> and <model_backend> apply), and
+save_basic_results, with <case_name> followed by the case number. A case with a
+<problem_file> fails, as writing a problem file stops a run before the solve. With
+<result_cache> in the case input file, cases solved before in this or an earlier
+batch are taken from the result cache (see Result_Cache.py). With <warm_start>
+in the case input file, the cases are split into one run of consecutive cases
+per process, and each case is solved as a parameterized model starting from the
+solution of the case before it in the same process (see Solver_Interface.py);
+this works best with 'order,nearest'. A summary
+with the values, status, cost and timing of each case (and the error of any
+case that failed) is saved as <case_name>_batch_summary.csv in the output folder.
+
+Run from the top level MEM directory:
+
+    > python Batch_Runner.py case_input_path_filename sweep_spec_path_filename
+
+"""
+
+#%%
+
+import os
+import sys
+import csv
+import time
+import itertools
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+from Preprocess_Input import preprocess_input
+from Save_Basic_Results import save_basic_results
+from Run_Case import prepare_time_steps, solve_case
+from Result_Cache import result_cache_key, load_cached_result, store_cached_result
+from Dispatch_Only import load_fixed_capacities
+from Profiling import save_profile
+from utilities import dict_of_lists_to_list_of_dicts, nearest_neighbour_order
+
+#%%
+
+def run_batch(case_input_path_filename, sweep_spec_path_filename):
+
+    settings_dic, sweep_list = read_sweep_spec(sweep_spec_path_filename)
+    override_list_list = expand_sweep(settings_dic, sweep_list)
+    num_cases = len(override_list_list)
+
+    # first case, for the settings that apply to the whole batch (e.g., output_path)
+    case_dic,tech_list = preprocess_input(case_input_path_filename, override_list_list[0])
+    base_case_name = case_dic['case_name']
+    case_name_format = base_case_name + '_%0' + str(len(str(num_cases - 1))) + 'd'
+
+    workers = settings_dic['workers']
+    if workers == 0:
+        workers = min(num_cases, os.cpu_count())
+    solver_threads = settings_dic['solver_threads']
+    print ('Batch_Runner: ' + str(num_cases) + ' cases, ' + str(workers) + ' processes')
+
+    arg_list = [(case_input_path_filename, override_list, case_name_format % case_num, solver_threads)
+                for case_num, override_list in enumerate(override_list_list)]
+
+    if settings_dic['order'] == 'nearest':
+        run_order = nearest_neighbour_order(sweep_points(sweep_list, override_list_list))
+    else:
+        run_order = list(range(num_cases))
+    if case_dic['warm_start']:
+        # consecutive cases in the same process, so each can start from the one before
+        chunk_list = [list(chunk) for chunk in np.array_split(run_order, workers) if len(chunk) > 0]
+    else:
+        chunk_list = [[case_num] for case_num in run_order]
+
+    start_time = time.time()
+    summary_list = [None] * num_cases
+    num_done = 0
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers = workers, initializer = set_solver_threads,
+                                 initargs = (solver_threads,)) as executor:
+            future_dic = {executor.submit(run_batch_chunk, [arg_list[case_num] for case_num in chunk]): chunk
+                          for chunk in chunk_list}
+            for future in as_completed(future_dic):
+                for case_num, summary_dic in zip(future_dic[future], future.result()):
+                    summary_list[case_num] = summary_dic
+                    num_done += 1
+                    print_progress(num_done, num_cases, summary_dic)
+    else:
+        for chunk in chunk_list:
+            for case_num in chunk:
+                summary_list[case_num] = run_batch_case(*arg_list[case_num])
+                num_done += 1
+                print_progress(num_done, num_cases, summary_list[case_num])
+
+    # values of each case next to its results
+    for summary_dic, override_list in zip(summary_list, override_list_list):
+        for tech_name, keyword, value in override_list:
+            summary_dic[(tech_name + ' ' + keyword).strip()] = value
+
+    case_dic['case_name'] = base_case_name
+    save_batch_summary(case_dic, summary_list)
+
+    num_failed = len([summary_dic for summary_dic in summary_list if summary_dic['error'] != ''])
+    print ('Batch_Runner: ' + str(num_cases - num_failed) + ' cases run, ' + str(num_failed) + ' failed, ' +
+           '%.2f' % (time.time() - start_time) + ' s')
+    if case_dic['result_cache']:
+        num_hits = len([summary_dic for summary_dic in summary_list if summary_dic['result_cache'] == 'hit'])
+        num_misses = len([summary_dic for summary_dic in summary_list if summary_dic['result_cache'] == 'miss'])
+        print ('Batch_Runner: result cache: ' + str(num_hits) + ' hits, ' + str(num_misses) + ' misses')
+
+    return summary_list
+
+#%%
+
+def read_sweep_spec(sweep_spec_path_filename):
+    # Returns the settings of the sweep and a list of (tech_name, keyword, value list).
+
+    settings_dic = {'mode':'grid', 'order':'input', 'workers':0, 'solver_threads':1}
+    sweep_list = []
+    header_found = False
+    with open(sweep_spec_path_filename, newline='') as sweep_file:
+        for row in csv.reader(sweep_file):
+            row = [item.strip() for item in row]
+            if len(row) == 0 or row[0].startswith('#') or ''.join(row) == '':
+                continue
+            if not header_found:
+                if row[:3] == ['tech_name','keyword','values']:
+                    header_found = True
+                elif row[0] in ('workers','solver_threads'):
+                    settings_dic[row[0]] = int(row[1])
+                elif row[0] in ('mode','order'):
+                    settings_dic[row[0]] = row[1].lower()
+                else:
+                    raise ValueError('sweep specification: unknown setting ' + row[0])
+            else:
+                sweep_list.append((row[0], row[1], row[2].split()))
+
+    if not settings_dic['mode'] in ('grid','list'):
+        raise ValueError('sweep specification: mode must be grid or list, not ' + settings_dic['mode'])
+    if not settings_dic['order'] in ('input','nearest'):
+        raise ValueError('sweep specification: order must be input or nearest, not ' + settings_dic['order'])
+    if len(sweep_list) == 0:
+        raise ValueError('sweep specification ' + sweep_spec_path_filename + ' has no tech_name,keyword,values rows')
+    return settings_dic, sweep_list
+
+def expand_sweep(settings_dic, sweep_list):
+    # One override list of (tech_name, keyword, value) per case.
+
+    if settings_dic['mode'] == 'grid':
+        value_tuple_list = list(itertools.product(*[value_list for tech_name, keyword, value_list in sweep_list]))
+    else:
+        num_values_list = [len(value_list) for tech_name, keyword, value_list in sweep_list]
+        if len(set(num_values_list)) != 1:
+            raise ValueError('sweep specification: in list mode all rows need the same number of values')
+        values_dic = {i: value_list for i, (tech_name, keyword, value_list) in enumerate(sweep_list)}
+        value_tuple_list = [tuple(case_values[i] for i in range(len(sweep_list)))
+                            for case_values in dict_of_lists_to_list_of_dicts(values_dic)]
+
+    override_list_list = []
+    for value_tuple in value_tuple_list:
+        override_list_list.append([(tech_name, keyword, value)
+                                   for (tech_name, keyword, value_list), value in zip(sweep_list, value_tuple)])
+    return override_list_list
+
+def sweep_points(sweep_list, override_list_list):
+    # Values of each case as a point (num_cases x num_rows); values that are not
+    # numbers are replaced by their position in the row.
+    points = np.zeros((len(override_list_list), len(sweep_list)))
+    for j, (tech_name, keyword, value_list) in enumerate(sweep_list):
+        for i, override_list in enumerate(override_list_list):
+            value = override_list[j][2]
+            try:
+                points[i, j] = float(value)
+            except ValueError:
+                points[i, j] = value_list.index(value)
+    return points
+
+#%%
+
+def set_solver_threads(solver_threads):
+    # Runs once in each worker process, so that numerical libraries in the
+    # process do not start one thread per CPU on top of the other processes.
+    # numpy and its BLAS are already loaded in the worker, so their thread pools
+    # are limited with threadpoolctl; OMP_NUM_THREADS etc. only reach libraries
+    # loaded later and processes started from the worker.
+    if solver_threads > 0:
+        if threadpool_limits is not None:
+            threadpool_limits(solver_threads)
+        for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            os.environ[name] = str(solver_threads)
+
+def run_batch_case(case_input_path_filename, override_list, case_name, solver_threads):
+    # Run one case; errors are returned in the summary rather than raised, so
+    # that one failed case does not stop the batch.
+
+    summary_dic = {'case_name':case_name, 'status':'', 'value':float('nan'), 'error':'', 'result_cache':'',
+                   'preprocess_time':float('nan'), 'model_time':float('nan'), 'solve_time':float('nan'),
+                   'num_iterations':float('nan'), 'warm_start':False, 'save_time':float('nan'),
+                   'total_time':float('nan'), 'process_id':os.getpid()}
+    start_time = time.time()
+    try:
+        case_dic,tech_list = preprocess_input(case_input_path_filename, override_list)
+        case_dic['case_name'] = case_name
+        case_dic['verbose'] = False
+        if case_dic['problem_file'] != '':
+            raise ValueError('problem_file is not run by Batch_Runner; write it with Macro_Energy_Model.py')
+        case_dic,tech_list = prepare_time_steps(case_dic, tech_list)
+        if solver_threads > 0 and not 'threads' in case_dic['solver_options']:
+            case_dic['solver_options'] = case_dic['solver_options'] + '; threads=' + str(solver_threads)
+        if case_dic['warm_start']:
+            case_dic['parameterized'] = True # the same cvxpy problem is solved again
+        if case_dic['dispatch_only']:
+            load_fixed_capacities(case_dic, tech_list)
+        case_dic['dispatch_workers'] = 1 # cases already run in parallel
+        case_dic['benders_workers'] = 1
+        preprocess_end_time = time.time()
+        summary_dic['preprocess_time'] = preprocess_end_time - start_time
+
+        cached_result = None
+        if case_dic['result_cache']:
+            cache_key = result_cache_key(case_dic, tech_list)
+            cached_result = load_cached_result(case_dic, cache_key)
+            summary_dic['result_cache'] = 'miss' if cached_result is None else 'hit'
+        if cached_result is not None:
+            cvxpy_constraints = None
+            prob_dic,capacity_dic,dispatch_dic = cached_result
+        else:
+            cvxpy_constraints,prob_dic,capacity_dic,dispatch_dic = solve_case(case_dic, tech_list)
+            if case_dic['result_cache']:
+                store_cached_result(case_dic, cache_key, prob_dic, capacity_dic, dispatch_dic)
+            # not every model reports iterations or warm starts
+            summary_dic['solve_time'] = prob_dic['solve_time']
+            summary_dic['num_iterations'] = prob_dic.get('num_iterations', float('nan'))
+            summary_dic['warm_start'] = prob_dic.get('warm_start', False)
+        model_end_time = time.time()
+        summary_dic['model_time'] = model_end_time - preprocess_end_time
+        summary_dic['status'] = prob_dic['status']
+        summary_dic['value'] = prob_dic['value']
+
+        save_basic_results(case_dic, tech_list, cvxpy_constraints,prob_dic,capacity_dic,dispatch_dic)
+        summary_dic['save_time'] = time.time() - model_end_time
+        if case_dic['profile']:
+            save_profile(case_dic)
+    except Exception as error:
+        summary_dic['status'] = 'failed'
+        summary_dic['error'] = traceback.format_exception_only(type(error), error)[-1].strip()
+    summary_dic['total_time'] = time.time() - start_time
+    return summary_dic
+
+def run_batch_chunk(arg_list):
+    # Run several cases one after the other in this process.
+    return [run_batch_case(*args) for args in arg_list]
+
+def print_progress(num_done, num_cases, summary_dic):
+    print ('    [' + str(num_done) + '/' + str(num_cases) + '] ' + summary_dic['case_name'] + ' ' +
+           summary_dic['status'] + ' ' + '%.2f' % summary_dic['total_time'] + ' s' +
+           ('' if summary_dic['error'] == '' else ': ' + summary_dic['error']))
+
+#%%
+
+def save_batch_summary(case_dic, summary_list):
+
+    output_folder = case_dic['output_path'] + '/' + case_dic['case_name']
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    fieldnames = []
+    for summary_dic in summary_list:
+        fieldnames += [key for key in summary_dic if not key in fieldnames]
+
+    output_file_path_name = output_folder + '/' + case_dic['case_name'] + '_batch_summary.csv'
+    with open(output_file_path_name, 'w', newline='') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames = fieldnames)
+        writer.writeheader()
+        writer.writerows(summary_list)
+
+    print ('file written: ' + output_file_path_name)
+
+#%%
+
+if __name__ == '__main__':
+
+    run_batch(sys.argv[1], sys.argv[2])
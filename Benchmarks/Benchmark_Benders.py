@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Benders.py
+
+Solves a case with core_model and with Benders decomposition (see
+Benders_Decomposition.py) and compares total system cost, capacities and time.
+
+With several subproblems, storage cannot carry energy between blocks in the
+decomposed problem, so the comparison is made against core_model with
+benders_block_length set to 0 in the case input file (or in the arguments).
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Benders.py case_input_path_filename [benders_block_length [benders_workers]]
+
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input
+from Core_Model import core_model
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Benders_Decomposition import benders_decomposition
+
+#%%
+
+if __name__ == '__main__':
+
+    case_input_path_filename = sys.argv[1]
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    if len(sys.argv) > 2:
+        case_dic['benders_block_length'] = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        case_dic['benders_workers'] = int(sys.argv[3])
+    case_dic['verbose'] = False
+
+    start_time = time.time()
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    full_prob_dic,full_capacity_dic,full_dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                    cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+    full_time = time.time() - start_time
+
+    case_dic['verbose'] = True
+    start_time = time.time()
+    prob_dic,capacity_dic,dispatch_dic = benders_decomposition(case_dic, tech_list)
+    benders_time = time.time() - start_time
+
+    print ('%-30s %16s %16s %12s' % ('', 'core_model', 'benders', 'rel. diff'))
+    print ('%-30s %16.8g %16.8g %12.2e' % ('system cost', full_prob_dic['value'], prob_dic['value'],
+                (prob_dic['value'] - full_prob_dic['value']) / full_prob_dic['value']))
+    for tech_name in full_capacity_dic:
+        print ('%-30s %16.8g %16.8g %12.2e' % (tech_name + ' capacity', full_capacity_dic[tech_name],
+                capacity_dic[tech_name], (capacity_dic[tech_name] - full_capacity_dic[tech_name]) /
+                max(abs(value) for value in full_capacity_dic.values())))
+    print ('%-30s %15.2fs %15.2fs' % ('time', full_time, benders_time))
+    print ('Benders iterations ' + str(prob_dic['benders_iterations']) + ', gap ' + '%.3e' % prob_dic['benders_gap'])
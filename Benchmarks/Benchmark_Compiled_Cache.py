@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Compiled_Cache.py
+
+Compares a case solved without and with the compiled problem cache (see
+Compiled_Cache.py), each run in a new python process, as separate runs of
+Macro_Energy_Model.py would be:
+
+    none  -- parameterized model, built and compiled without the cache
+    cold  -- empty cache: built, compiled and stored
+    warm  -- loaded from the cache, parameters set to the values of the case
+    warm  -- the same, with all fixed costs scaled by <cost_scale>, so that
+             only the numbers of the case differ from the cached problem
+    none  -- the same scaled case without the cache, for comparison
+
+Reported for each run are the time to build (or load) the model, the time cvxpy
+spends compiling (canonicalization before the solve, plus applying parameter
+values in the solve), the total time of core_model, and the system cost.
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Compiled_Cache.py case_input_path_filename [cost_scale]
+
+The cache is written to a temporary folder. The exit status is 1 if any run
+with the cache differs in system cost from the run without it by more than
+1e-9 (relative).
+
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input
+from Core_Model import core_model
+from Compiled_Cache import compiled_cache_stats
+from Profiling import profile_dic
+
+#%%
+
+def run_case(case_input_path_filename, cache_path, use_cache, cost_scale):
+    # Solve the case once; returns the timings and system cost.
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    case_dic['verbose'] = False
+    case_dic['parameterized'] = True
+    case_dic['compiled_cache'] = use_cache
+    case_dic['output_path'] = cache_path
+    for tech_dic in tech_list:
+        if 'fixed_cost' in tech_dic:
+            tech_dic['fixed_cost'] *= cost_scale
+
+    start_time = time.perf_counter()
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    model_time = time.perf_counter() - start_time
+
+    build_time = compiled_cache_stats['load_time'] + sum(entry['time'] for (stage, name), entry in profile_dic.items()
+                                                         if stage == 'build')
+    compile_time = compiled_cache_stats['compile_time'] + profile_dic[('compile', 'cvxpy')]['time']
+    return {'build_time':build_time, 'compile_time':compile_time, 'model_time':model_time,
+            'value':cvxpy_prob.value, 'hits':compiled_cache_stats['hits']}
+
+#%%
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 2 and sys.argv[2] == 'run':
+        # one run, in a process of its own
+        print (json.dumps(run_case(sys.argv[1], sys.argv[3], sys.argv[4] == 'True', float(sys.argv[5]))))
+        sys.exit(0)
+
+    case_input_path_filename = sys.argv[1]
+    cost_scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.1
+
+    cache_path = tempfile.mkdtemp(prefix = 'compiled_cache_')
+    run_list = [('none', 1.0), ('cold', 1.0), ('warm', 1.0), ('warm', cost_scale), ('none', cost_scale)]
+    result_list = []
+    try:
+        for mode, scale in run_list:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), case_input_path_filename, 'run',
+                                     cache_path, str(mode != 'none'), str(scale)],
+                                    check = True, capture_output = True, text = True).stdout
+            result_list.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(cache_path, ignore_errors = True)
+
+    print ('%6s %12s %12s %12s %12s %22s' % ('cache', 'cost scale', 'build/load', 'compile', 'core_model', 'system cost'))
+    for (mode, scale), result_dic in zip(run_list, result_list):
+        print ('%6s %12.3g %11.3fs %11.3fs %11.3fs %22.15g' % (mode, scale, result_dic['build_time'],
+                    result_dic['compile_time'], result_dic['model_time'], result_dic['value']))
+    print ('compile time: %.3f s cold, %.3f s warm (%.0f times faster)' % (result_list[1]['compile_time'],
+                    result_list[2]['compile_time'], result_list[1]['compile_time'] / result_list[2]['compile_time']))
+
+    warm_hits = result_list[2]['hits'] == 1 and result_list[3]['hits'] == 1
+    if not warm_hits:
+        print ('warm runs did not find the cached problem')
+    differences = [abs(result_list[k]['value'] - result_list[0]['value']) / abs(result_list[0]['value']) for k in [1, 2]]
+    differences.append(abs(result_list[3]['value'] - result_list[4]['value']) / abs(result_list[4]['value']))
+    print ('largest relative difference in system cost: %.2e' % max(differences))
+
+    sys.exit(0 if warm_hits and max(differences) <= 1e-9 else 1)
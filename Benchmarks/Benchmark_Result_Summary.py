@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Result_Summary.py
+
+Measures peak memory and time of the scalar summary of tech dictionaries
+(meanify in Save_Basic_Results.py) against the deep copy it used to make, and
+the time of reduce_vectors against computing each statistic of each vector
+one at a time, on synthetic technologies with long series.
+
+The summaries of all techs are kept until the end of the measurement, as
+save_basic_results keeps them. The summary is measured with series held in
+memory and with series read from a .npy file, which Preprocess_Input.py opens
+as a memory map (numpy.memmap). The deep copy replaced only series of type
+numpy.ndarray by their mean, so it kept a full copy of every memory-mapped
+series.
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Result_Summary.py [num_techs [num_time_periods]]
+
+'''
+
+import os
+import sys
+import copy
+import time
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Save_Basic_Results import meanify, reduce_vectors, default_statistics
+
+#%%
+
+def meanify_deepcopy(dic_in):
+    # meanify as it was
+    dic_out = copy.deepcopy(dic_in)
+    for item in dic_out:
+        if np.ndarray == type(dic_out[item]):
+            dic_out[item] = np.average(dic_out[item])
+        elif dict == type(dic_out[item]):
+            dic_out[item] = meanify_deepcopy(dic_out[item])
+    return dic_out
+
+def peak_memory(function, *args):
+    # Peak memory allocated while <function> runs, with its result still held.
+    tracemalloc.start()
+    start_time = time.time()
+    result = function(*args)
+    elapsed_time = time.time() - start_time
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak, elapsed_time
+
+def reduce_one_at_a_time(vector_dic):
+    result = {}
+    for key in vector_dic:
+        vector = vector_dic[key]
+        result[key] = [np.mean(vector), np.sum(vector), np.min(vector), np.max(vector),
+                       np.percentile(vector, 5), np.percentile(vector, 50), np.percentile(vector, 95)]
+    return result
+
+#%%
+
+if __name__ == '__main__':
+
+    num_techs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    num_time_periods = int(sys.argv[2]) if len(sys.argv) > 2 else 10 * 8760
+
+    rng = np.random.RandomState(0)
+    tech_list = [{'tech_name':'tech_' + str(i), 'tech_type':'fixed_generator', 'fixed_cost':0.01,
+                  'series':rng.rand(num_time_periods)} for i in range(num_techs)]
+    series_bytes = sum(tech_dic['series'].nbytes for tech_dic in tech_list)
+    print (str(num_techs) + ' techs, ' + str(num_time_periods) + ' time steps, ' +
+           '%.1f' % (series_bytes / 1e6) + ' MB of series')
+
+    # the same series memory-mapped from a .npy file
+    npy_folder = tempfile.mkdtemp(prefix = 'result_summary_')
+    np.save(npy_folder + '/series.npy', np.array([tech_dic['series'] for tech_dic in tech_list]))
+    series_array = np.load(npy_folder + '/series.npy', mmap_mode = 'r')
+    memmap_tech_list = [dict(tech_dic, series = series_array[i].view()) for i, tech_dic in enumerate(tech_list)]
+
+    for series_name, series_tech_list in [('in memory', tech_list), ('memory-mapped', memmap_tech_list)]:
+        for name, function in [('deepcopy meanify', meanify_deepcopy), ('meanify', meanify)]:
+            peak, elapsed_time = peak_memory(lambda: list(map(function, series_tech_list)))
+            print ('%-16s %-18s peak memory %10.1f MB %10.3f s' % (series_name, name, peak / 1e6, elapsed_time))
+    del memmap_tech_list, series_array
+    shutil.rmtree(npy_folder, ignore_errors = True)
+
+    vector_dic = {tech_dic['tech_name']:tech_dic['series'] for tech_dic in tech_list}
+    for name, function in [('one at a time', reduce_one_at_a_time), ('reduce_vectors', reduce_vectors)]:
+        start_time = time.time()
+        function(vector_dic)
+        print ('%-35s %d statistics %10.3f s' % (name, len(default_statistics), time.time() - start_time))
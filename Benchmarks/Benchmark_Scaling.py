@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Scaling.py
+
+Measures how the time and memory of a MEM run grow with the size of the
+system, using synthetic cases.
+
+For each configuration in <scaling_configurations> (number of nodes, number of
+hours, network topology and technology mix), a case input file and series
+files are generated (see write_synthetic_case) and the full pipeline is run:
+preprocess_input, core_model, extract_cvxpy_output and save_basic_results,
+with <profile> True (see Profiling.py). Each configuration runs in a new
+process, so that its peak memory is its own.
+
+Reported for each configuration are the problem size and the time of each
+stage (preprocess, build, compile, solver, extract, save), the total time and
+the peak memory. All results are written as <output_folder>/scaling_results.json,
+which can be kept as a baseline. Given a baseline, each stage is compared with
+it, and stages that are slower by more than <regression_ratio> (and by more
+than <regression_min_time>, to ignore noise in short stages) are listed as
+regressions; the exit status is then 1.
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Scaling.py output_folder [baseline.json]
+
+Topologies (for n nodes):
+
+    line  -- node i linked to node i+1
+    ring  -- line, and node n-1 linked to node 0
+    star  -- node 0 linked to every other node
+    mesh  -- every pair of nodes linked
+
+Each node has demand and lost_load, and the technologies of its mix out of
+solar and wind (fixed_generator), natgas (generator) and storage; with
+transmission in the mix, each link is a transmission line.
+
+'''
+
+import os
+import sys
+import json
+import time
+import datetime
+import platform
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input, write_npy_dated_data_file
+
+# Configurations to run: name of the result is built from these values.
+scaling_configurations = [
+    {'nodes':1,  'hours':168,  'topology':'line', 'techs':'solar wind natgas storage'},
+    {'nodes':3,  'hours':168,  'topology':'ring', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':3,  'hours':720,  'topology':'ring', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':3,  'hours':2160, 'topology':'ring', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':10, 'hours':168,  'topology':'ring', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':10, 'hours':720,  'topology':'ring', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':10, 'hours':720,  'topology':'line', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':10, 'hours':720,  'topology':'star', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':10, 'hours':720,  'topology':'mesh', 'techs':'solar wind natgas storage transmission'},
+    {'nodes':10, 'hours':720,  'topology':'ring', 'techs':'solar wind natgas'},
+    {'nodes':30, 'hours':168,  'topology':'ring', 'techs':'solar wind natgas storage transmission'},
+    ]
+
+regression_ratio = 1.5      # slower than the baseline by this factor
+regression_min_time = 0.1   # and by at least this many seconds
+
+# stages reported, as summed over the names of each stage in Profiling.profile_dic
+scaling_stages = ['preprocess','build','compile','solver','extract','save']
+
+series_start_date = datetime.datetime(2018, 1, 1)
+
+#%% Synthetic cases
+
+def configuration_name(configuration):
+    return (configuration['topology'] + '_n' + str(configuration['nodes']) + '_h' + str(configuration['hours']) +
+            '_' + '-'.join(configuration['techs'].split()))
+
+def topology_links(topology, num_nodes):
+    if topology == 'line':
+        return [(i, i + 1) for i in range(num_nodes - 1)]
+    elif topology == 'ring':
+        links = [(i, i + 1) for i in range(num_nodes - 1)]
+        if num_nodes > 2:
+            links.append((num_nodes - 1, 0))
+        return links
+    elif topology == 'star':
+        return [(0, i) for i in range(1, num_nodes)]
+    elif topology == 'mesh':
+        return [(i, j) for i in range(num_nodes) for j in range(i + 1, num_nodes)]
+    raise ValueError('unknown topology ' + topology)
+
+def synthetic_series(kind, num_hours, rng, phase = 0.0):
+    # Hourly series with a daily and a seasonal cycle, normalized to a typical mean.
+    hour = np.arange(num_hours)
+    hour_of_day = (hour + phase) % 24
+    day_of_year = hour / 24.
+    if kind == 'demand':
+        series = (1. + 0.2 * np.sin(2 * np.pi * (hour_of_day - 9) / 24) + 0.1 * np.cos(2 * np.pi * day_of_year / 365)
+                  + 0.05 * rng.standard_normal(num_hours))
+        mean = 1.0
+    elif kind == 'solar':
+        cloud = rng.uniform(0.4, 1.0, num_hours // 24 + 1)[hour // 24]
+        series = np.maximum(0., np.sin(np.pi * (hour_of_day - 6) / 12)) * cloud
+        mean = 0.2
+    elif kind == 'wind':
+        log_wind = np.zeros(num_hours)
+        noise = 0.15 * rng.standard_normal(num_hours)
+        for i in range(1, num_hours):
+            log_wind[i] = 0.97 * log_wind[i - 1] + noise[i]
+        series = np.exp(log_wind)
+        mean = 0.38
+    series = np.maximum(series, 0.) * mean / np.mean(np.maximum(series, 0.))
+    if kind != 'demand':
+        series = np.minimum(series, 1.)
+    return series
+
+def write_synthetic_case(case_folder, configuration, seed = 0):
+    # Write the series files and case input file of <configuration>; returns the case input file name.
+
+    num_nodes = configuration['nodes']
+    num_hours = configuration['hours']
+    techs = configuration['techs'].split()
+    name = configuration_name(configuration)
+    if not os.path.exists(case_folder):
+        os.makedirs(case_folder)
+
+    # yyyymmddhh of each hour, with hours 1 to 24 of each day as in the series files
+    hour_num = np.array([int((series_start_date + datetime.timedelta(days = i // 24)).strftime('%Y%m%d')) * 100 + i % 24 + 1
+                         for i in range(num_hours)], dtype = np.int64)
+    rng = np.random.default_rng(seed)
+
+    tech_rows = []
+    for node in range(num_nodes):
+        node_name = 'node_' + str(node)
+        phase = 3. * node / max(num_nodes, 1) # nodes spread over a few time zones
+        for kind in ['demand'] + [kind for kind in ['solar','wind'] if kind in techs]:
+            series_file = name + '_' + node_name + '_' + kind + '.npy'
+            write_npy_dated_data_file(case_folder + '/' + series_file, hour_num, synthetic_series(kind, num_hours, rng, phase))
+            if kind == 'demand':
+                tech_rows.append([node_name + '_demand', 'demand', node_name, '', series_file, '', '', '', ''])
+            else:
+                tech_rows.append([node_name + '_' + kind, 'fixed_generator', '', node_name, series_file, '0.03', '', '', ''])
+        tech_rows.append([node_name + '_lost_load', 'lost_load', '', node_name, '', '', '10', '', ''])
+        tech_rows.append([node_name + '_curtailment', 'curtailment', node_name, '', '', '', '0', '', ''])
+        if 'natgas' in techs:
+            tech_rows.append([node_name + '_natgas', 'generator', '', node_name, '', '0.02', '0.02', '', ''])
+        if 'storage' in techs:
+            tech_rows.append([node_name + '_storage', 'storage', node_name, node_name, '', '0.01', '', '0.9', '0.00001'])
+    if 'transmission' in techs:
+        for node_from, node_to in topology_links(configuration['topology'], num_nodes):
+            tech_rows.append(['node_' + str(node_from) + '_to_' + str(node_to) + '_transmission', 'transmission',
+                              'node_' + str(node_from), 'node_' + str(node_to), '', '0.02', '0.01', '0.9', ''])
+
+    end_date = series_start_date + datetime.timedelta(days = (num_hours - 1) // 24)
+    case_rows = [['case_name', name], ['data_path', case_folder], ['output_path', case_folder + '/results'],
+                 ['verbose', 'False'], ['profile', 'True'],
+                 ['year_start', '2018'], ['month_start', '1'], ['day_start', '1'], ['hour_start', '1'],
+                 ['year_end', str(end_date.year)], ['month_end', str(end_date.month)],
+                 ['day_end', str(end_date.day)], ['hour_end', str((num_hours - 1) % 24 + 1)],
+                 ['numerics_scaling', '1']]
+
+    case_input_path_filename = case_folder + '/' + name + '.csv'
+    with open(case_input_path_filename, 'w') as case_file:
+        case_file.write('Synthetic case written by Benchmark_Scaling.py\n,\nCASE_DATA\n')
+        for row in case_rows:
+            case_file.write(','.join(row) + '\n')
+        case_file.write(',\nTECH_DATA\n')
+        case_file.write('tech_name,tech_type,node_from,node_to,series_file,fixed_cost,var_cost,efficiency,decay_rate\n')
+        for row in tech_rows:
+            case_file.write(','.join(row) + '\n')
+        case_file.write(',\nEND_CASE_DATA\n')
+    return case_input_path_filename
+
+#%% One run
+
+def run_configuration(case_input_path_filename):
+    # Full pipeline for one case, in its own process; returns its measurements.
+    import Profiling
+    from Core_Model import core_model
+    from Extract_Cvxpy_Output import extract_cvxpy_output
+    from Save_Basic_Results import save_basic_results
+
+    start_time = time.perf_counter()
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                    cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+    save_basic_results(case_dic, tech_list, cvxpy_constraints,prob_dic,capacity_dic,dispatch_dic)
+    total_time = time.perf_counter() - start_time
+
+    result = {'status':prob_dic['status'], 'value':prob_dic['value'], 'solver_name':prob_dic['solver_name'],
+              'num_time_periods':case_dic['num_time_periods'], 'num_techs':len(tech_list)}
+    result.update(Profiling.problem_size_dic)
+    for stage in scaling_stages:
+        result[stage + '_time'] = sum(entry['time'] for (entry_stage, name), entry in Profiling.profile_dic.items()
+                                      if entry_stage == stage)
+    result['total_time'] = total_time
+    result['peak_rss_mb'] = Profiling.peak_rss_mb()
+    return result
+
+#%% Comparison with a baseline
+
+def compare_with_baseline(result_list, baseline_result_list):
+    # Print the change of each stage time relative to the baseline; returns the list of regressions.
+
+    baseline_dic = {result['name']:result for result in baseline_result_list}
+    regression_list = []
+    print ('\ncomparison with baseline (ratio of times, current / baseline):')
+    print ('%-54s' % 'configuration' + ''.join(['%10s' % stage for stage in scaling_stages + ['total','rss']]))
+    for result in result_list:
+        if not result['name'] in baseline_dic:
+            print ('%-54s not in baseline' % result['name'])
+            continue
+        baseline = baseline_dic[result['name']]
+        line = '%-54s' % result['name']
+        for key in [stage + '_time' for stage in scaling_stages] + ['total_time', 'peak_rss_mb']:
+            ratio = result[key] / baseline[key] if baseline[key] > 0 else np.nan
+            line += '%10.2f' % ratio
+            if key.endswith('_time') and ratio > regression_ratio and result[key] - baseline[key] > regression_min_time:
+                regression_list.append(result['name'] + ' ' + key + ': ' + '%.3f' % baseline[key] + ' s -> ' +
+                                       '%.3f' % result[key] + ' s')
+        print (line)
+        if result['solver_name'] != baseline['solver_name']:
+            print ('    solver ' + result['solver_name'] + ', baseline solver ' + baseline['solver_name'])
+        if abs(result['value'] - baseline['value']) > 1.e-6 * abs(baseline['value']):
+            print ('    total cost ' + '%.8g' % result['value'] + ', baseline ' + '%.8g' % baseline['value'])
+
+    if len(regression_list) > 0:
+        print ('\nregressions:')
+        for regression in regression_list:
+            print ('    ' + regression)
+    else:
+        print ('\nno regressions')
+    return regression_list
+
+#%%
+
+if __name__ == '__main__':
+
+    output_folder = sys.argv[1]
+    baseline_path_filename = sys.argv[2] if len(sys.argv) > 2 else None
+    case_folder = os.path.abspath(output_folder) + '/cases'
+
+    print ('%-54s %8s %10s %12s' % ('configuration', 'steps', 'variables', 'nonzeros') +
+           ''.join(['%11s' % stage for stage in scaling_stages]) + '%11s %10s' % ('total', 'rss (MB)'))
+    result_list = []
+    for configuration in scaling_configurations:
+        case_input_path_filename = write_synthetic_case(case_folder, configuration)
+        with ProcessPoolExecutor(max_workers = 1) as executor: # new process for each configuration
+            result = executor.submit(run_configuration, case_input_path_filename).result()
+        result['name'] = configuration_name(configuration)
+        result.update(configuration)
+        result_list.append(result)
+        print ('%-54s %8d %10d %12d' % (result['name'], result['num_time_periods'], result['num_variables'],
+                                        result['num_nonzeros']) +
+               ''.join(['%11.3f' % result[stage + '_time'] for stage in scaling_stages]) +
+               '%11.3f %10.1f' % (result['total_time'], result['peak_rss_mb']) +
+               ('' if result['status'] == 'optimal' else ' ' + result['status']))
+
+    import cvxpy
+    output = {'date':datetime.datetime.now().isoformat(timespec = 'seconds'),
+              'platform':platform.platform(), 'python':platform.python_version(),
+              'numpy':np.__version__, 'cvxpy':cvxpy.__version__,
+              'results':result_list}
+    output_path_filename = output_folder + '/scaling_results.json'
+    with open(output_path_filename, 'w') as output_file:
+        json.dump(output, output_file, indent = 1)
+    print ('file written: ' + output_path_filename)
+
+    if baseline_path_filename is not None:
+        with open(baseline_path_filename) as baseline_file:
+            baseline = json.load(baseline_file)
+        regression_list = compare_with_baseline(result_list, baseline['results'])
+        sys.exit(1 if len(regression_list) > 0 else 0)
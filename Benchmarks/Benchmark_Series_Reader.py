@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Series_Reader.py
+
+Times reading dated series files (see read_csv_dated_data_file in
+Preprocess_Input.py) line by line with csv.reader, as done before, against
+the vectorized reader without and with its .cache.npz file, and checks that
+all three give the same series.
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Series_Reader.py [data_file ...]
+
+Without arguments, all csv files in Input_Data are used. The whole file
+(years 1900 to 2100) is selected.
+
+'''
+
+import os
+import sys
+import csv
+import glob
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import read_csv_dated_data_file
+
+#%%
+
+def read_csv_dated_data_file_csv_reader(start_hour, end_hour, path_filename):
+    # The reader as it was, one line at a time.
+    with open(path_filename) as fin:
+        data_reader = csv.reader(fin)
+        while True:
+            line = next(data_reader)
+            if line[0] == 'BEGIN_DATA':
+                break
+        line = next(data_reader)
+        data = []
+        while True:
+            try:
+                line = next(data_reader)
+                if any(field.strip() for field in line):
+                    data.append([int(line[0]),int(line[1]),int(line[2]),int(line[3]),float(line[4])])
+            except:
+                break
+    data_array = np.array(data)
+    hour_num = data_array[:,3] + 100 * (data_array[:,2] + 100 * (data_array[:,1] + 100* data_array[:,0]))
+    series = [item[1] for item in zip(hour_num,data_array[:,4]) if item[0]>= start_hour and item[0] <= end_hour]
+    return np.array(series).flatten()
+
+#%%
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        path_filename_list = sys.argv[1:]
+    else:
+        path_filename_list = sorted(glob.glob('Input_Data/*/*.csv'))
+
+    print ('%-60s %8s %12s %12s %12s' % ('file', 'lines', 'csv.reader', 'vectorized', 'cached'))
+    for path_filename in path_filename_list:
+        data_path, data_filename = os.path.split(path_filename)
+        cache_path_filename = path_filename + '.cache.npz'
+        if os.path.exists(cache_path_filename):
+            os.remove(cache_path_filename)
+
+        start_time = time.time()
+        series_csv_reader = read_csv_dated_data_file_csv_reader(1900010100, 2100123124, path_filename)
+        csv_reader_time = time.time() - start_time
+
+        start_time = time.time()
+        series_vectorized = read_csv_dated_data_file(1900,1,1,0, 2100,12,31,24, data_path, data_filename)
+        vectorized_time = time.time() - start_time
+
+        start_time = time.time()
+        series_cached = read_csv_dated_data_file(1900,1,1,0, 2100,12,31,24, data_path, data_filename)
+        cached_time = time.time() - start_time
+
+        if not (np.array_equal(series_csv_reader, series_vectorized) and np.array_equal(series_csv_reader, series_cached)):
+            print (path_filename + ': series differ')
+        print ('%-60s %8d %11.3fs %11.3fs %11.4fs' % (path_filename[-60:], len(series_csv_reader),
+                    csv_reader_time, vectorized_time, cached_time))
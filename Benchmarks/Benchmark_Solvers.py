@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Solvers.py
+
+Runs one case input file with every installed solver that can solve linear
+programs and compares solve time and objective value.
+
+The <solver_options> given in the case input file are passed to every solver
+(generic options are translated for each solver, see Solver_Interface.py).
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Solvers.py [case_input_path_filename]
+
+'''
+
+import os
+import sys
+import time
+import cvxpy as cvx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input
+from Core_Model import core_model
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Solver_Interface import solver_fallback_order
+
+#%%
+
+if __name__ == '__main__':
+
+    if len(sys.argv) == 1:
+        case_input_path_filename = './case_input_example.csv'
+    else:
+        case_input_path_filename = sys.argv[1]
+
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    case_dic['verbose'] = False
+    case_dic['solver_fallback'] = False # each solver on its own
+
+    solver_list = [solver for solver in solver_fallback_order if solver in cvx.installed_solvers()]
+
+    results = []
+    for solver in solver_list:
+        case_dic['solver'] = solver
+        start_time = time.time()
+        try:
+            constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+            prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                            cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+            results.append([solver, prob_dic['solver_version'], prob_dic['status'],
+                            prob_dic['value'], prob_dic['solve_time'], time.time() - start_time])
+        except Exception as error:
+            print (solver + ' failed: ' + str(error))
+            results.append([solver, '', 'failed', float('nan'), float('nan'), time.time() - start_time])
+
+    best_value = min([item[3] for item in results if item[2] == 'optimal'], default = float('nan'))
+
+    print ('%-10s %-10s %-16s %16s %12s %12s %12s' % ('solver', 'version', 'status',
+                    'objective', 'rel. diff', 'solve time', 'total time'))
+    for solver, version, status, value, solve_time, total_time in results:
+        print ('%-10s %-10s %-16s %16.8g %12.2e %11.3fs %11.3fs' % (solver, version, status,
+                    value, (value - best_value)/abs(best_value), solve_time, total_time))
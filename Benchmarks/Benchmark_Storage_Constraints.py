@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Storage_Constraints.py
+
+Compares the time needed to build the storage state-of-charge constraints
+with one constraint per time step (the formulation previously used in
+Core_Model.py) against the single vectorized constraint now used in
+Core_Model.py.
+
+For each number of time periods, a small storage-only problem is built both
+ways and then canonicalized by cvxpy (without solving).  Reported are:
+
+    build     -- time to create the cvxpy variables and constraints
+    compile   -- time for cvxpy to turn the problem into solver data
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Storage_Constraints.py [num_time_periods ...]
+
+'''
+
+import sys
+import time
+import numpy as np
+import cvxpy as cvx
+
+#%%
+
+def build_storage_problem(num_time_periods, vectorized):
+
+    efficiency = 0.9
+    decay_rate = 0.00001
+    series = 1. + 0.5 * np.sin(np.arange(num_time_periods) * 2. * np.pi / 24.)
+
+    capacity = cvx.Variable(1)
+    dispatch_in = cvx.Variable(num_time_periods)
+    dispatch = cvx.Variable(num_time_periods)
+    energy_stored = cvx.Variable(num_time_periods)
+    constraints = [ capacity >= 0, dispatch_in >= 0, dispatch >= 0,
+                    energy_stored >= 0, energy_stored <= capacity,
+                    dispatch_in <= series ]
+
+    if vectorized:
+        next_step = np.roll(np.arange(num_time_periods), -1)
+        constraints += [
+            energy_stored[next_step] ==
+                energy_stored + efficiency * dispatch_in
+                - dispatch - energy_stored*decay_rate
+                ]
+    else:
+        for i in range(num_time_periods):
+            constraints += [
+                energy_stored[(i+1) % num_time_periods] ==
+                    energy_stored[i] + efficiency * dispatch_in[i]
+                    - dispatch[i] - energy_stored[i]*decay_rate
+                    ]
+
+    fnc2min = capacity * 0.01 * num_time_periods - cvx.sum(dispatch) * 0.001
+    prob = cvx.Problem(cvx.Minimize(fnc2min), constraints)
+    return prob
+
+#%%
+
+def time_build_and_compile(num_time_periods, vectorized, solver):
+
+    start_time = time.perf_counter()
+    prob = build_storage_problem(num_time_periods, vectorized)
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    prob.get_problem_data(solver)
+    compile_time = time.perf_counter() - start_time
+
+    return build_time, compile_time
+
+#%%
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        num_time_periods_list = [int(arg) for arg in sys.argv[1:]]
+    else:
+        num_time_periods_list = [48, 720, 2190, 8760]
+
+    solver = cvx.installed_solvers()[0]
+
+    print ('solver used for canonicalization: ' + solver)
+    print ('%10s %14s %14s %14s %14s %10s' % ('periods', 'loop build', 'loop compile',
+                                            'vector build', 'vector compile', 'speedup'))
+    for num_time_periods in num_time_periods_list:
+        loop_build, loop_compile = time_build_and_compile(num_time_periods, False, solver)
+        vector_build, vector_compile = time_build_and_compile(num_time_periods, True, solver)
+        speedup = (loop_build + loop_compile) / (vector_build + vector_compile)
+        print ('%10d %13.3fs %13.3fs %13.3fs %13.3fs %9.1fx' % (num_time_periods,
+                    loop_build, loop_compile, vector_build, vector_compile, speedup))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Tech_Groups.py
+
+Compares building and compiling a many-site case with one set of cvxpy
+variables and constraints per tech, and with the techs of each tech_type in
+one <tech_group> (see build_tech_group in Core_Model.py).
+
+The case is a synthetic ring of nodes written by write_synthetic_case (see
+Benchmark_Scaling.py), each node with demand, solar, wind, natgas and storage,
+and a transmission line for each link.
+
+Reported for each run are the number of cvxpy constraints, the time to build
+the problem, the cvxpy compile time, the solver time and the total system
+cost, which should be the same for both.
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Tech_Groups.py output_folder [num_nodes [num_hours]]
+
+'''
+
+import os
+import sys
+import copy
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input
+from Core_Model import build_core_model
+from Solver_Interface import solve_problem
+from Benchmark_Scaling import write_synthetic_case
+
+#%%
+
+def run_model(case_dic, tech_list):
+    # Build and solve, returning the size of the problem and the time of each stage.
+    start_time = time.perf_counter()
+    constraint_dic,constraints,prob,capacity_dic,dispatch_dic,parameter_dic = build_core_model(case_dic, tech_list)
+    build_time = time.perf_counter() - start_time
+    solve_problem(case_dic, prob)
+    return {'num_constraints':len(constraints), 'build_time':build_time,
+            'compile_time':prob.compilation_time, 'solver_time':prob.solver_stats.solve_time,
+            'status':prob.status, 'value':prob.value / case_dic['numerics_scaling']}
+
+#%%
+
+if __name__ == '__main__':
+
+    output_folder = sys.argv[1]
+    num_nodes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    num_hours = int(sys.argv[3]) if len(sys.argv) > 3 else 168
+
+    configuration = {'nodes':num_nodes, 'hours':num_hours, 'topology':'ring',
+                     'techs':'solar wind natgas storage transmission'}
+    case_input_path_filename = write_synthetic_case(os.path.abspath(output_folder) + '/cases', configuration)
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+
+    group_tech_list = copy.deepcopy(tech_list)
+    for tech_dic in group_tech_list:
+        tech_dic['tech_group'] = tech_dic['tech_type']
+
+    print ('%-10s %12s %12s %12s %12s %16s' % ('', 'constraints', 'build', 'compile', 'solver', 'system cost'))
+    result_dic = {}
+    for label, run_tech_list in [('per tech', tech_list), ('grouped', group_tech_list)]:
+        result = run_model(case_dic, run_tech_list)
+        result_dic[label] = result
+        print ('%-10s %12d %11.3fs %11.3fs %11.3fs %16.8g' % (label, result['num_constraints'], result['build_time'],
+                                                             result['compile_time'], result['solver_time'], result['value']) +
+               ('' if result['status'] == 'optimal' else ' ' + result['status']))
+
+    print ('build and compile %.1f times faster with tech groups' %
+           ((result_dic['per tech']['build_time'] + result_dic['per tech']['compile_time']) /
+            (result_dic['grouped']['build_time'] + result_dic['grouped']['compile_time'])))
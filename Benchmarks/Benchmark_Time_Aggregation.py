@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Time_Aggregation.py
+
+Compares a case solved at full time resolution with the same case solved on
+representative periods (see Time_Aggregation.py), for several numbers of
+representative periods.
+
+Reported for each number of representative periods are the model time
+(build + solve), the speedup relative to full resolution, the relative error
+in total system cost, and the largest relative error in any capacity
+(relative to the largest capacity of the full resolution solution).
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Time_Aggregation.py case_input_path_filename [num_representative_periods ...]
+
+The period length is taken from the case input file (default 24 time steps).
+
+'''
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input
+from Core_Model import core_model
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Time_Aggregation import aggregate_time_series
+
+#%%
+
+def run_case(case_dic, tech_list):
+    start_time = time.time()
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    model_time = time.time() - start_time
+    prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                    cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+    return model_time, prob_dic, capacity_dic
+
+#%%
+
+if __name__ == '__main__':
+
+    case_input_path_filename = sys.argv[1]
+    if len(sys.argv) > 2:
+        num_representative_periods_list = [int(arg) for arg in sys.argv[2:]]
+    else:
+        num_representative_periods_list = [4, 8, 16, 32]
+
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    case_dic['verbose'] = False
+
+    full_time, full_prob_dic, full_capacity_dic = run_case(case_dic, tech_list)
+    capacity_scale = max(abs(value) for value in full_capacity_dic.values())
+
+    print ('%12s %10s %12s %10s %14s %14s' % ('periods', 'steps', 'model time', 'speedup',
+                                            'cost rel. err', 'cap. rel. err'))
+    print ('%12s %10d %11.2fs %10s %14s %14s' % ('full', case_dic['num_time_periods'], full_time, '', '', ''))
+
+    for num_representative_periods in num_representative_periods_list:
+        case_dic['num_representative_periods'] = num_representative_periods
+        aggregated_case_dic, aggregated_tech_list = aggregate_time_series(case_dic, tech_list)
+        model_time, prob_dic, capacity_dic = run_case(aggregated_case_dic, aggregated_tech_list)
+
+        cost_error = (prob_dic['value'] - full_prob_dic['value']) / full_prob_dic['value']
+        capacity_error = max(abs(capacity_dic[tech_name] - full_capacity_dic[tech_name])
+                             for tech_name in full_capacity_dic) / capacity_scale
+        print ('%12d %10d %11.2fs %9.1fx %14.2e %14.2e' % (num_representative_periods,
+                    aggregated_case_dic['num_time_periods'], model_time, full_time / model_time,
+                    cost_error, capacity_error))
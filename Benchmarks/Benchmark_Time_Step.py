@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Time_Step.py
+
+Compares a case solved at hourly time steps with the same case solved at
+longer time steps (see resample_time_steps in Time_Aggregation.py), for
+several values of <time_step_hours>.
+
+Reported for each time step are the number of time steps, the model time
+(build + solve), the speedup relative to hourly time steps, the relative error
+in total system cost, and the largest relative error in any capacity
+(relative to the largest capacity of the hourly solution).
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Time_Step.py case_input_path_filename [time_step_hours ...]
+
+The number of time steps of the case is cut to a multiple of the longest
+time step.
+
+'''
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input
+from Core_Model import core_model
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Time_Aggregation import resample_time_steps
+
+#%%
+
+def run_case(case_dic, tech_list):
+    start_time = time.time()
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    model_time = time.time() - start_time
+    prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                    cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+    return model_time, prob_dic, capacity_dic
+
+#%%
+
+if __name__ == '__main__':
+
+    case_input_path_filename = sys.argv[1]
+    if len(sys.argv) > 2:
+        time_step_hours_list = [int(arg) for arg in sys.argv[2:]]
+    else:
+        time_step_hours_list = [2, 3, 6]
+
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    case_dic['verbose'] = False
+
+    # whole time steps for every time step length
+    num_time_periods = case_dic['num_time_periods'] - case_dic['num_time_periods'] % np.lcm.reduce(time_step_hours_list)
+    case_dic['num_time_periods'] = num_time_periods
+    for tech_dic in tech_list:
+        if 'series' in tech_dic:
+            tech_dic['series'] = np.asarray(tech_dic['series'])[:num_time_periods]
+
+    hourly_time, hourly_prob_dic, hourly_capacity_dic = run_case(case_dic, tech_list)
+    capacity_scale = max(abs(value) for value in hourly_capacity_dic.values())
+
+    print ('%12s %10s %12s %10s %14s %14s' % ('step hours', 'steps', 'model time', 'speedup',
+                                            'cost rel. err', 'cap. rel. err'))
+    print ('%12d %10d %11.2fs %10s %14s %14s' % (1, num_time_periods, hourly_time, '', '', ''))
+
+    for time_step_hours in time_step_hours_list:
+        case_dic['time_step_hours'] = time_step_hours
+        resampled_case_dic, resampled_tech_list = resample_time_steps(case_dic, tech_list)
+        model_time, prob_dic, capacity_dic = run_case(resampled_case_dic, resampled_tech_list)
+
+        cost_error = (prob_dic['value'] - hourly_prob_dic['value']) / hourly_prob_dic['value']
+        capacity_error = max(abs(capacity_dic[tech_name] - hourly_capacity_dic[tech_name])
+                             for tech_name in hourly_capacity_dic) / capacity_scale
+        print ('%12d %10d %11.2fs %9.1fx %14.2e %14.2e' % (time_step_hours,
+                    resampled_case_dic['num_time_periods'], model_time, hourly_time / model_time,
+                    cost_error, capacity_error))
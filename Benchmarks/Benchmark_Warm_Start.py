@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Benchmark_Warm_Start.py
+
+Compares a parameter sweep solved from scratch for every case with the same
+sweep in which each case starts from the solution of the case before
+(<warm_start>, see Solver_Interface.py).
+
+The sweep is taken from the sweep_tech_name, sweep_keyword and sweep_values
+keywords of the case input file (see Parameter_Sweep.py), and run in the
+order given by <sweep_order>. Both runs use the same parameterized model, so
+the difference is in the solver only.
+
+Reported for each case are the number of solver iterations and the solve
+time with and without warm start, and the largest relative difference in
+total system cost between the two runs.
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Benchmark_Warm_Start.py case_input_path_filename
+
+The case input file must give sweep_tech_name, sweep_keyword and at least two
+sweep_values; otherwise the script stops with a message naming the keywords.
+
+'''
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import utilities
+from Preprocess_Input import preprocess_input
+from Core_Model import core_model, model_cache
+from Extract_Cvxpy_Output import extract_cvxpy_output
+
+#%%
+
+def run_sweep(case_dic, tech_list, sweep_values, warm_start):
+    # Solve the sweep, returning (value, num_iterations, solve_time) per case.
+    model_cache.clear()
+    sweep_case_dic = dict(case_dic)
+    sweep_case_dic['parameterized'] = True
+    sweep_case_dic['warm_start'] = warm_start
+    sweep_tech_list = [dict(tech_dic) for tech_dic in tech_list]
+    sweep_tech_dic = [tech_dic for tech_dic in sweep_tech_list if tech_dic['tech_name'] == case_dic['sweep_tech_name']][0]
+
+    result_list = []
+    for value in sweep_values:
+        sweep_tech_dic[case_dic['sweep_keyword']] = value
+        constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(sweep_case_dic, sweep_tech_list)
+        prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(sweep_case_dic,sweep_tech_list,constraint_dic,
+                        cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+        result_list.append((prob_dic['value'], prob_dic['num_iterations'], prob_dic['solve_time']))
+    return result_list
+
+#%%
+
+if __name__ == '__main__':
+
+    case_input_path_filename = sys.argv[1]
+
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    case_dic['verbose'] = False
+
+    missing_keywords = [key for key in ['sweep_tech_name', 'sweep_keyword'] if case_dic.get(key, '') == '']
+    if len(case_dic['sweep_values'].split()) < 2:
+        missing_keywords.append('sweep_values (at least two values)')
+    if len(missing_keywords) > 0:
+        sys.exit('Benchmark_Warm_Start: ' + case_input_path_filename + ' does not give ' + ', '.join(missing_keywords) +
+                 ' in its CASE_DATA section (see Parameter_Sweep.py)')
+    if not case_dic['sweep_tech_name'] in [tech_dic['tech_name'] for tech_dic in tech_list]:
+        sys.exit('Benchmark_Warm_Start: sweep_tech_name ' + case_dic['sweep_tech_name'] + ' is not a tech of ' +
+                 case_input_path_filename)
+
+    sweep_values = [float(value) for value in case_dic['sweep_values'].split()]
+    if case_dic['sweep_order'] == 'nearest':
+        sweep_values = [sweep_values[i] for i in utilities.nearest_neighbour_order(sweep_values)]
+
+    cold_list = run_sweep(case_dic, tech_list, sweep_values, False)
+    warm_list = run_sweep(case_dic, tech_list, sweep_values, True)
+
+    print ('%14s %12s %12s %12s %12s' % (case_dic['sweep_keyword'], 'cold iters', 'warm iters',
+                                         'cold time', 'warm time'))
+    for value, cold, warm in zip(sweep_values, cold_list, warm_list):
+        print ('%14.6g %12.0f %12.0f %11.3fs %11.3fs' % (value, cold[1], warm[1], cold[2], warm[2]))
+
+    # the first case has no earlier solution to start from
+    cold_iterations = sum(cold[1] for cold in cold_list[1:])
+    warm_iterations = sum(warm[1] for warm in warm_list[1:])
+    cold_time = sum(cold[2] for cold in cold_list[1:])
+    warm_time = sum(warm[2] for warm in warm_list[1:])
+    print ('%14s %12.0f %12.0f %11.3fs %11.3fs' % ('cases 2-' + str(len(sweep_values)),
+                                                  cold_iterations, warm_iterations, cold_time, warm_time))
+    cost_difference = max(abs(warm[0] - cold[0]) / abs(cold[0]) for cold, warm in zip(cold_list, warm_list))
+    print ('largest relative cost difference ' + '%.2e' % cost_difference)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+'''
+File name: Validate_Merit_Order_Dispatch.py
+
+Compares the merit order dispatch simulation (see Merit_Order_Dispatch.py)
+with core_model, and measures how fast it screens capacity portfolios.
+
+Two systems are compared, each with the capacities of its least-cost solution
+from core_model:
+
+    case        -- the case as given, with its network and storage, for which
+                   merit order dispatch is an approximation
+    single node -- all nodes of the case merged into one and storage left out,
+                   for which merit order dispatch is exact, so the system costs
+                   must agree to the tolerance of the solver
+
+Reported for each are the system cost, fixed cost, curtailment, lost load and
+storage cycles of both, and the relative difference in system cost. Then
+<num_portfolios> portfolios (the capacities of the case scaled at random by
+0.5 to 1.5) are simulated as one batch, and the time per portfolio is compared
+with the time of one solve of core_model.
+
+Run from the top level MEM directory:
+
+    > python Benchmarks/Validate_Merit_Order_Dispatch.py [case_input_path_filename [num_portfolios]]
+
+The default case is case_input_example.csv. The exit status is 1 if the
+single node system costs differ by more than 1e-6 (relative).
+
+'''
+
+import os
+import sys
+import time
+import copy
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Preprocess_Input import preprocess_input
+from Core_Model import core_model
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Merit_Order_Dispatch import merit_order_dispatch, capacity_techs
+
+#%%
+
+def run_core_model(case_dic, tech_list):
+    # Least-cost solution of core_model, with its summary in the form of the
+    # result of merit_order_dispatch.
+    start_time = time.time()
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                    cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+    model_time = time.time() - start_time
+
+    summary_dic = {'system_cost':prob_dic['value'], 'fixed_cost':0.0, 'curtailment':0.0, 'lost_load':0.0,
+                   'storage_cycles':{}}
+    for tech_dic in tech_list:
+        tech_name = tech_dic['tech_name']
+        if tech_name in capacity_dic:
+            summary_dic['fixed_cost'] += capacity_dic[tech_name] * tech_dic.get('fixed_cost', 0.0) * case_dic['num_time_periods']
+        if tech_dic['tech_type'] == 'curtailment':
+            summary_dic['curtailment'] += np.sum(dispatch_dic[tech_name + ' dispatch'])
+        elif tech_dic['tech_type'] == 'lost_load':
+            summary_dic['lost_load'] += np.sum(dispatch_dic[tech_name + ' dispatch'])
+        elif tech_dic['tech_type'] == 'storage' and capacity_dic[tech_name] > 0:
+            summary_dic['storage_cycles'][tech_name] = np.sum(dispatch_dic[tech_name + ' dispatch']) / capacity_dic[tech_name]
+    capacity_array = np.array([[max(capacity_dic[tech_name], 0.0) for tech_name in capacity_techs(tech_list)]])
+    return model_time, summary_dic, capacity_array
+
+def single_node(tech_list):
+    # <tech_list> with all nodes merged into one and without storage or links
+    node_tech_list = []
+    for tech_dic in copy.deepcopy(tech_list):
+        if tech_dic['tech_type'] in ['storage', 'transfer', 'transmission']:
+            continue
+        for key in ['node_to', 'node_from']:
+            if key in tech_dic:
+                tech_dic[key] = 'node'
+        node_tech_list.append(tech_dic)
+    return node_tech_list
+
+def compare(label, case_dic, tech_list):
+    # Print core_model and merit order dispatch side by side; returns the
+    # relative difference in system cost.
+    model_time, summary_dic, capacity_array = run_core_model(case_dic, tech_list)
+    result_dic = merit_order_dispatch(case_dic, tech_list, capacity_array)
+
+    print (label)
+    print ('    %-24s %16s %16s' % ('', 'core_model', 'merit order'))
+    for key in ['system_cost', 'fixed_cost', 'curtailment', 'lost_load']:
+        print ('    %-24s %16.8g %16.8g' % (key, summary_dic[key], result_dic[key][0]))
+    for tech_name in summary_dic['storage_cycles']:
+        print ('    %-24s %16.8g %16.8g' % (tech_name + ' cycles', summary_dic['storage_cycles'][tech_name],
+                                           result_dic['storage_cycles'][tech_name][0]))
+    cost_difference = (result_dic['system_cost'][0] - summary_dic['system_cost']) / summary_dic['system_cost']
+    print ('    relative difference in system cost: %.2e' % cost_difference)
+    return model_time, capacity_array, cost_difference
+
+#%%
+
+if __name__ == '__main__':
+
+    case_input_path_filename = sys.argv[1] if len(sys.argv) > 1 else 'case_input_example.csv'
+    num_portfolios = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    case_dic,tech_list = preprocess_input(case_input_path_filename)
+    case_dic['verbose'] = False
+
+    model_time, capacity_array, cost_difference = compare('case', case_dic, tech_list)
+    node_model_time, node_capacity_array, node_cost_difference = compare('single node', case_dic, single_node(tech_list))
+
+    random_generator = np.random.default_rng(0)
+    portfolio_array = capacity_array * random_generator.uniform(0.5, 1.5, (num_portfolios, capacity_array.shape[1]))
+    start_time = time.time()
+    result_dic = merit_order_dispatch(case_dic, tech_list, portfolio_array)
+    batch_time = time.time() - start_time
+    print ('%d portfolios in %.3f s: %.2e s per portfolio, %.0f times faster than core_model (%.3f s)' %
+           (num_portfolios, batch_time, batch_time / num_portfolios, model_time * num_portfolios / batch_time, model_time))
+    print ('system cost of portfolios from %.6g to %.6g' % (np.min(result_dic['system_cost']), np.max(result_dic['system_cost'])))
+
+    sys.exit(1 if abs(node_cost_difference) > 1e-6 else 0)
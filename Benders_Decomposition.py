@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+
+Benders_Decomposition.py
+
+Solve the capacity expansion problem of core_model by Benders decomposition.
+
+The master problem holds the capacity decisions (one per technology) and one
+estimate <theta> of the dispatch cost of each block of time steps. Each block
+(e.g., one year) is a dispatch subproblem with the capacities fixed at the
+values of the master problem, built by core_model with fixed costs set to zero.
+The subproblems are independent, so they are solved in parallel processes.
+
+The dual values of the constraints fixing the capacities give the change in
+the dispatch cost of a block per unit change of each capacity, which is added
+to the master problem as a cut:
+
+    theta[b] >= cost[b] + sum over techs of marginal[b, tech] * (capacity[tech] - capacity_fixed[tech])
+
+The master problem gives a lower bound on the total cost and each set of
+subproblems an upper bound; iterations stop when the gap between the two,
+relative to the upper bound, is at most <benders_tolerance>.
+
+Keywords in the CASE_DATA section of the case input file:
+
+    benders                 -- True to use Benders decomposition (default False)
+    benders_block_length    -- number of time steps per subproblem (default 8760);
+                               0 for a single subproblem over all time steps
+    benders_tolerance       -- relative gap at which to stop (default 1e-4)
+    benders_max_iterations  -- maximum number of iterations (default 100)
+    benders_workers         -- number of parallel processes (default 0 = one per
+                               subproblem, up to the number of CPUs); 1 to solve
+                               subproblems in this process
+
+Storage is cyclic within each block. With one block, the result agrees with
+core_model (within the tolerance); with several blocks, it agrees with a
+core_model solve in which storage cannot carry energy from one block to the next.
+
+Every node must be able to balance through a technology with no capacity
+decision (e.g., lost_load), so that each subproblem is feasible for any capacities.
+The master problem bounds the dispatch cost of each block below by zero, so
+every <var_cost> must be zero or positive.
+
+Node prices are approximate. They are the duals of the energy balance of the
+subproblems solved once more at the final capacities, which are within
+<benders_tolerance> of the optimum, not the capacities of a core_model solve.
+With capacities fixed, the price in hours where a capacity limits dispatch is
+not unique: it may be anywhere between the cost of the marginal technology and
+that of the next one (e.g., lost_load), where core_model gives the price that
+also pays for the capacity. Prices averaged over many hours are close to those
+of core_model; prices of single hours may not be. <node_price_note> in the
+case output says so.
+
+"""
+
+#%%
+
+import os
+import time
+import numpy as np
+import cvxpy as cvx
+from concurrent.futures import ProcessPoolExecutor
+
+from Core_Model import core_model, capacity_tech_types, group_columns, tech_dual_value
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Solver_Interface import solve_problem
+
+# Subproblem data of this process, set by set_block_data:
+#     block_data['case_dic_list'][b], block_data['tech_list_list'][b]
+block_data = {}
+
+#%%
+
+def benders_decomposition(case_dic, tech_list):
+
+    if 'time_weights' in case_dic:
+        raise ValueError('benders cannot be combined with representative periods or time_step_hours')
+    negative_cost_list = [tech_dic['tech_name'] for tech_dic in tech_list if tech_dic.get('var_cost', 0.0) < 0]
+    if len(negative_cost_list) > 0:
+        raise ValueError('benders requires var_cost >= 0, since dispatch costs are bounded below by 0 in the ' +
+                         'master problem; var_cost is negative for ' + ', '.join(negative_cost_list))
+
+    num_time_periods = case_dic['num_time_periods']
+    verbose = case_dic['verbose']
+
+    block_case_dic_list, block_tech_list_list = make_blocks(case_dic, tech_list)
+    num_blocks = len(block_case_dic_list)
+
+    # capacity decisions of the master problem, with any capacity given in the input
+    capacity_tech_list = [tech_dic for tech_dic in tech_list if tech_dic['tech_type'] in capacity_tech_types]
+    capacity_name_list = [tech_dic['tech_name'] for tech_dic in capacity_tech_list]
+    capacity = cvx.Variable(len(capacity_name_list))
+    theta = cvx.Variable(num_blocks)
+    fixed_cost = np.array([tech_dic.get('fixed_cost', 0.0) for tech_dic in capacity_tech_list]) * num_time_periods
+    master_constraints = [ capacity >= 0, theta >= 0 ] # dispatch costs are not negative
+    for i, tech_dic in enumerate(capacity_tech_list):
+        if 'capacity' in tech_dic:
+            master_constraints += [ capacity[i] == tech_dic['capacity'] ]
+
+    workers = case_dic['benders_workers']
+    if workers == 0:
+        workers = min(num_blocks, os.cpu_count())
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers = workers, initializer = set_block_data,
+                                       initargs = (block_case_dic_list, block_tech_list_list))
+        block_map = executor.map
+    else:
+        executor = None
+        set_block_data(block_case_dic_list, block_tech_list_list)
+        block_map = map
+
+    if verbose:
+        print ('    Benders decomposition: ' + str(num_blocks) + ' subproblems, ' + str(workers) + ' processes')
+        print ('    %9s %16s %16s %12s %10s' % ('iteration', 'lower bound', 'upper bound', 'gap', 'time'))
+
+    master_case_dic = dict(case_dic)
+    master_case_dic['verbose'] = False
+
+    start_time = time.time()
+    lower_bound = -np.inf
+    upper_bound = np.inf
+    best_capacity = None
+    iteration_list = []
+    try:
+        for iteration in range(1, case_dic['benders_max_iterations'] + 1):
+
+            # master problem: lower bound and next capacities to try
+            master_prob = cvx.Problem(cvx.Minimize(fixed_cost @ capacity + cvx.sum(theta)), master_constraints)
+            solve_problem(master_case_dic, master_prob)
+            if master_prob.status != 'optimal':
+                raise RuntimeError('Benders master problem status ' + master_prob.status)
+            lower_bound = master_prob.value
+            capacity_fixed = np.maximum(capacity.value, 0.0)
+
+            # subproblems: dispatch cost and its change with capacity in each block
+            capacity_fixed_dic = dict(zip(capacity_name_list, capacity_fixed))
+            result_list = list(block_map(solve_block, range(num_blocks), [capacity_fixed_dic] * num_blocks))
+
+            total_cost = fixed_cost @ capacity_fixed
+            for block, (status, cost, marginal_dic) in enumerate(result_list):
+                if status != 'optimal':
+                    raise RuntimeError('Benders subproblem ' + str(block) + ' status ' + status +
+                                       '; each node needs a technology such as lost_load')
+                total_cost += cost
+                marginal = np.array([marginal_dic.get(tech_name, 0.0) for tech_name in capacity_name_list])
+                master_constraints += [ theta[block] >= cost + marginal @ (capacity - capacity_fixed) ]
+            if total_cost < upper_bound:
+                upper_bound = total_cost
+                best_capacity = capacity_fixed_dic
+
+            gap = (upper_bound - lower_bound) / abs(upper_bound)
+            iteration_list.append([iteration, lower_bound, upper_bound, gap, time.time() - start_time])
+            if verbose:
+                print ('    %9d %16.8g %16.8g %12.3e %9.2fs' % tuple(iteration_list[-1]))
+            if gap <= case_dic['benders_tolerance']:
+                break
+
+        # dispatch and prices at the best capacities
+        result_list = list(block_map(solve_block, range(num_blocks), [best_capacity] * num_blocks,
+                                     [True] * num_blocks))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    dispatch_dic = {}
+    node_price = {}
+    for status, block_prob_dic, block_dispatch_dic in result_list:
+        for key in block_dispatch_dic:
+            dispatch_dic.setdefault(key, []).append(block_dispatch_dic[key])
+        for node in block_prob_dic['node_price']:
+            node_price.setdefault(node, []).append(block_prob_dic['node_price'][node])
+    for key in dispatch_dic:
+        dispatch_dic[key] = np.concatenate(dispatch_dic[key])
+    for node in node_price:
+        node_price[node] = np.concatenate(node_price[node])
+
+    if gap > case_dic['benders_tolerance']:
+        print ('Benders_Decomposition: gap ' + '%.3e' % gap + ' after ' + str(iteration) +
+               ' iterations is above benders_tolerance ' + str(case_dic['benders_tolerance']))
+
+    prob_dic = {}
+    prob_dic['status'] = 'optimal' if gap <= case_dic['benders_tolerance'] else 'not_converged'
+    prob_dic['value'] = upper_bound
+    prob_dic['avg_cost'] = upper_bound / num_time_periods
+    prob_dic['solver_name'] = block_prob_dic['solver_name']
+    prob_dic['solver_version'] = block_prob_dic['solver_version']
+    prob_dic['solve_time'] = time.time() - start_time
+    prob_dic['compilation_time'] = np.nan
+    prob_dic['benders_iterations'] = iteration
+    prob_dic['benders_lower_bound'] = lower_bound
+    prob_dic['benders_upper_bound'] = upper_bound
+    prob_dic['benders_gap'] = gap
+    prob_dic['node_price'] = node_price
+    prob_dic['node_price_note'] = ('approximate: duals of the Benders subproblems at the final capacities, ' +
+                                   'not unique in hours where a capacity limits dispatch')
+
+    return prob_dic, dict(best_capacity), dispatch_dic
+
+#%%
+
+def make_blocks(case_dic, tech_list):
+    # Case and technology dictionaries of the subproblem for each block of time steps.
+    # Capacities are fixed and their fixed costs removed, so the subproblem
+    # objective is the dispatch cost of the block.
+
+    num_time_periods = case_dic['num_time_periods']
+    block_length = case_dic['benders_block_length']
+    if block_length <= 0:
+        block_length = num_time_periods
+
+    block_case_dic_list = []
+    block_tech_list_list = []
+    for block_start in range(0, num_time_periods, block_length):
+        block_end = min(block_start + block_length, num_time_periods)
+        block_case_dic = dict(case_dic)
+        block_case_dic['num_time_periods'] = block_end - block_start
+        block_case_dic['parameterized'] = True
+        block_case_dic['verbose'] = False
+        block_tech_list = []
+        for tech_dic in tech_list:
+            block_tech_dic = dict(tech_dic)
+            if 'series' in tech_dic:
+                block_tech_dic['series'] = np.asarray(tech_dic['series'])[block_start:block_end]
+            if tech_dic['tech_type'] in capacity_tech_types:
+                block_tech_dic['fixed_cost'] = 0.0
+                block_tech_dic['capacity'] = 0.0 # set to the master problem value for each solve
+            block_tech_list.append(block_tech_dic)
+        block_case_dic_list.append(block_case_dic)
+        block_tech_list_list.append(block_tech_list)
+
+    return block_case_dic_list, block_tech_list_list
+
+def set_block_data(case_dic_list, tech_list_list):
+    # Runs once in each process, so that series are not sent with every subproblem.
+    block_data['case_dic_list'] = case_dic_list
+    block_data['tech_list_list'] = tech_list_list
+
+def solve_block(block, capacity_fixed_dic, output = False):
+    # Solve the dispatch subproblem of <block> with capacities from <capacity_fixed_dic>.
+    # Returns (status, cost, marginal cost of each capacity), or with <output>
+    # (status, prob_dic, dispatch_dic) as returned by extract_cvxpy_output.
+
+    case_dic = block_data['case_dic_list'][block]
+    tech_list = block_data['tech_list_list'][block]
+    for tech_dic in tech_list:
+        if tech_dic['tech_name'] in capacity_fixed_dic:
+            tech_dic['capacity'] = capacity_fixed_dic[tech_dic['tech_name']]
+
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    if output:
+        prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                        cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+        return cvxpy_prob.status, prob_dic, dispatch_dic
+
+    if cvxpy_prob.status != 'optimal':
+        return cvxpy_prob.status, np.nan, {}
+    numerics_scaling = case_dic['numerics_scaling']
+    marginal_dic = {}
+    group_column_dic = group_columns(tech_list)
+    for tech_name in capacity_fixed_dic:
+        dual_value = tech_dual_value(constraint_dic, group_column_dic, tech_name, 'capacity_eq_fixed')
+        marginal_dic[tech_name] = -dual_value.item() / numerics_scaling
+    return cvxpy_prob.status, cvxpy_prob.value / numerics_scaling, marginal_dic
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+
+Compiled_Cache.py
+
+Keep compiled cvxpy problems on disk, so that a case with the same structure
+as one run before (in any process) is neither built nor canonicalized again.
+
+Each problem is stored in the folder <output_path>/compiled_cache under a key
+that is a hash of everything that determines its structure:
+
+    -- model_structure_key (see Core_Model.py): tech names, types and nodes,
+       which values each tech has, the number and weights of time steps, ...
+    -- the solver actually used, and the versions of cvxpy and python
+
+but not the numbers of the case (costs, efficiencies, series, ...), which are
+cvxpy Parameters of the problem. The problem is stored compiled for the solver:
+cvxpy keeps, with the problem, its parameterized program, i.e., the matrices
+of the problem as a linear function of its parameters. A problem found in the
+cache is loaded, its parameters are set to the values of the case
+(update_parameters in Core_Model.py), and cvxpy only applies these values to
+the stored program before solving, so both building and canonicalization are
+skipped.
+
+Keywords in the CASE_DATA section of the case input file:
+
+    compiled_cache       -- True to use the compiled problem cache (default
+                            False); implies <parameterized> True
+    compiled_cache_size  -- maximum size of the cache in MB (default 1000);
+                            when it is exceeded, the least recently used
+                            problems are removed
+
+The cache is used by everything solved with core_model: single cases, parameter
+sweeps, rolling horizon windows, Benders subproblems and dispatch_only blocks.
+Files are pickles, so only use a cache folder written by your own runs.
+
+The number of hits, misses and stored problems in this process, and the time
+spent building and compiling (misses) or loading (hits), is kept in
+<compiled_cache_stats> (see compiled_cache_report and
+Benchmarks/Benchmark_Compiled_Cache.py).
+
+"""
+
+#%%
+
+import os
+import sys
+import time
+import pickle
+import hashlib
+import cvxpy as cvx
+import cvxpy.lin_ops.lin_utils as cvx_lin_utils
+
+from Solver_Interface import select_solver
+from Result_Cache import update_hash, evict_cached_results
+
+compiled_cache_folder_name = 'compiled_cache'
+
+# Use of the cache in this process:
+#     hits, misses, stores, evictions -- number of each
+#     load_time                       -- seconds reading problems (hits)
+#     compile_time                    -- seconds canonicalizing problems (misses)
+#     bytes_read, bytes_written       -- bytes of problems read and written
+compiled_cache_stats = {'hits':0, 'misses':0, 'stores':0, 'evictions':0,
+                        'load_time':0.0, 'compile_time':0.0,
+                        'bytes_read':0, 'bytes_written':0}
+
+#%%
+
+def compiled_cache_key(case_dic, structure_key):
+    # Hash of <structure_key> (see model_structure_key), the solver and versions.
+    hasher = hashlib.sha256()
+    update_hash(hasher, ['solver', select_solver(case_dic['solver']), 'cvxpy', cvx.__version__,
+                         'python', list(sys.version_info[:2])])
+    update_hash(hasher, structure_key)
+    return hasher.hexdigest()
+
+def compiled_cache_path(case_dic, key):
+    return case_dic['output_path'] + '/' + compiled_cache_folder_name + '/' + key + '.pkl'
+
+#%%
+
+def load_compiled_model(case_dic, key):
+    # Returns the model tuple of build_core_model stored under <key>, or None.
+
+    path = compiled_cache_path(case_dic, key)
+    start_time = time.perf_counter()
+    try:
+        with open(path, 'rb') as cache_file:
+            id_count, model = pickle.load(cache_file)
+        os.utime(path) # most recently used
+    except (OSError, EOFError, pickle.UnpicklingError):
+        compiled_cache_stats['misses'] += 1
+        return None
+
+    # cvxpy numbers its variables, parameters and constraints from a counter;
+    # new ones must not take the numbers of those loaded
+    cvx_lin_utils.ID_COUNTER.count = max(cvx_lin_utils.ID_COUNTER.count, id_count)
+
+    compiled_cache_stats['hits'] += 1
+    compiled_cache_stats['load_time'] += time.perf_counter() - start_time
+    compiled_cache_stats['bytes_read'] += os.path.getsize(path)
+    if case_dic['verbose']:
+        print ('    compiled cache hit ' + key[:12])
+    return model
+
+def store_compiled_model(case_dic, key, model):
+    # Compile the problem of <model> (see build_core_model) for the solver and
+    # store it under <key>, then remove least recently used problems until the
+    # cache is no larger than <compiled_cache_size>. Must be called before the
+    # problem is solved: a solved problem holds solver objects that cannot be
+    # pickled.
+
+    prob = model[2]
+    start_time = time.perf_counter()
+    prob.get_problem_data(select_solver(case_dic['solver'])) # kept by prob, and used by prob.solve
+    compiled_cache_stats['compile_time'] += time.perf_counter() - start_time
+
+    cache_folder = case_dic['output_path'] + '/' + compiled_cache_folder_name
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder, exist_ok = True)
+
+    # write to a file of this process, then rename, so that parallel runs never
+    # read a partly written problem
+    path = compiled_cache_path(case_dic, key)
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'wb') as cache_file:
+        pickle.dump((cvx_lin_utils.ID_COUNTER.count, model), cache_file, protocol = pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    compiled_cache_stats['stores'] += 1
+    compiled_cache_stats['bytes_written'] += os.path.getsize(path)
+
+    compiled_cache_stats['evictions'] += evict_cached_results(cache_folder, case_dic['compiled_cache_size'] * 1.e6)
+
+def compiled_cache_report():
+    # One line summary of <compiled_cache_stats>.
+    return ('compiled cache: ' + str(compiled_cache_stats['hits']) + ' hits (' +
+            '%.3f' % compiled_cache_stats['load_time'] + ' s loading), ' +
+            str(compiled_cache_stats['misses']) + ' misses (' +
+            '%.3f' % compiled_cache_stats['compile_time'] + ' s compiling), ' +
+            str(compiled_cache_stats['stores']) + ' stored, ' + str(compiled_cache_stats['evictions']) + ' removed, ' +
+            str(compiled_cache_stats['bytes_read']) + ' bytes read, ' +
+            str(compiled_cache_stats['bytes_written']) + ' bytes written')
@@ -54,6 +54,11 @@ node (optional) character string name of node
 node_from (optional) character string name of node
 fixed_cost (required if capacity decision) real number
 var_cost (required if dispatch decision) real number
+capacity (optional) real number, fixes the capacity instead of optimizing it
+energy_stored_initial (optional, storage only) real number, energy stored at the
+    start of the first time step; without it, storage is cyclic
+tech_group (optional) character string name of a group of techs of the same
+    tech_type that are built together (see build_tech_group)
 
 '''
 #%%
@@ -61,6 +66,10 @@ var_cost (required if dispatch decision) real number
 import cvxpy as cvx
 import time, datetime
 import numpy as np
+from Solver_Interface import solve_problem
+from Profiling import add_profile_time, record_cvxpy_problem_size
+from Network import node_index, incidence_matrix
+from Compiled_Cache import compiled_cache_key, load_compiled_model, store_compiled_model
 
 
 #%% Conceptual discussion of model code
@@ -82,22 +91,94 @@ approaches.
 """
 #%% Define main code for Core_Model
 
+# Problems built with cvxpy Parameters, keyed by model_structure_key().
+# A case with the same structure as a previous case only needs new parameter
+# values, and cvxpy reuses its compiled problem when it is solved again.
+# With <compiled_cache>, compiled problems are also kept on disk (see Compiled_Cache.py).
+model_cache = {}
+
+# tech_type values with a capacity decision
+capacity_tech_types = ['fixed_generator','generator','storage','transfer','transmission']
+
+# key in constraint_dic of the (time x node) balance of all nodes
+node_balance_key = ('nodes', 'balance')
+
 def core_model(case_dic, tech_list):
 
     start_time = datetime.datetime.now()    # timer starts
     if case_dic['verbose']:
         print ('    start time = ',start_time)
 
+    time_step_hours(case_dic) # raises if series with <time_step_hours> were not resampled
+
+    if case_dic['parameterized']:
+        structure_key = model_structure_key(case_dic, tech_list)
+        if structure_key in model_cache:
+            if case_dic['verbose']:
+                print ('    reusing parameterized model')
+        elif case_dic['compiled_cache']:
+            compiled_key = compiled_cache_key(case_dic, structure_key)
+            model = load_compiled_model(case_dic, compiled_key)
+            if model is None:
+                model = build_core_model(case_dic, tech_list)
+                store_compiled_model(case_dic, compiled_key, model)
+            model_cache[structure_key] = model
+        else:
+            model_cache[structure_key] = build_core_model(case_dic, tech_list)
+        constraint_dic,constraints,prob,capacity_dic,dispatch_dic,parameter_dic = model_cache[structure_key]
+        update_parameters(case_dic, parameter_dic, tech_list)
+    else:
+        constraint_dic,constraints,prob,capacity_dic,dispatch_dic,parameter_dic = build_core_model(case_dic, tech_list)
+
+    #%%======================================================================
+    # Now solve the problem
+
+    solve_problem(case_dic, prob)
+    if case_dic['profile']:
+        record_cvxpy_problem_size(prob)
+
+    end_time = datetime.datetime.now()    # timer starts
+    if case_dic['verbose']:
+        print ('    end time = ',end_time)
+        print ('    elapsed time = ',end_time - start_time)
+
+    return constraint_dic,constraints,prob,capacity_dic,dispatch_dic
+
+#%% Build the cvxpy problem
+
+def build_core_model(case_dic, tech_list):
+    # If case_dic['parameterized'] is True, costs, efficiencies and time series
+    # enter the problem as cvx.Parameter objects, which are returned in
+    # <parameter_dic> keyed by (tech_name, value name).
+    #
+    # Constraints are returned in <constraint_dic> keyed by (tech_name, constraint
+    # kind), e.g., (tech_name, 'storage_balance'), each holding all time steps;
+    # the balance of all nodes is under <node_balance_key>. Names of individual
+    # rows, if needed, are generated by constraint_names().
+
     # Initialize variables to be used later
     fnc2min = 0.0
-    constraints = []
-    constraint_list = []
+    constraint_dic = {} # dictionary of constraints keyed by (tech_name or node, kind)
+    parameter_dic = {} # dictionary of cvxpy parameters (if parameterized)
     node_balance = {} # dictionary of load balancing values; constrained to equal zero.
     # NOTE: node_names = node_balance.keys()     after this code runs.
+    node_index_dic = node_index(tech_list) # column of each node in the node balance
+    link_flow_list = [] # (flow, node_to, node_from, inv_efficiency) of transfer and transmission
+    node_flow_list = [] # (time x node) flows into nodes, of tech groups and links
     capacity_dic = {} # dictionary of capacity decision variables
     dispatch_dic = {} # dictionary of dispatch decision variables for inflow to tech
     
     num_time_periods = case_dic['num_time_periods']
+    group_dic = tech_groups(tech_list)
+
+    # With representative periods (see Time_Aggregation.py), each time step
+    # stands for time_weights[i] time steps of the full time series.
+    if 'time_weights' in case_dic:
+        time_weights = case_dic['time_weights']
+        num_time_periods_represented = np.sum(time_weights)
+    else:
+        time_weights = None
+        num_time_periods_represented = num_time_periods
                   
     """
     For the purposes of this routine, we will use a high level taxonomy based on
@@ -119,18 +200,43 @@ def core_model(case_dic, tech_list):
 
         tech_name = tech_dic['tech_name']
         tech_type = tech_dic['tech_type']
+        tech_start_time = time.perf_counter()
+
+        # techs of a group are built together, where the first of them appears
+        if 'tech_group' in tech_dic:
+            group_name = tech_dic['tech_group']
+            member_list = group_dic[group_name]
+            if tech_dic is not member_list[0]:
+                continue
+            values = get_group_values(case_dic, group_name, member_list)
+            if case_dic['parameterized']:
+                values = make_parameters(group_name, values, parameter_dic)
+            group_constraint_dic,group_capacity_dic,group_dispatch_dic,group_node_flow_list,group_cost = build_tech_group(
+                    case_dic, group_name, member_list, values, node_index_dic, time_weights, num_time_periods_represented)
+            constraint_dic.update(group_constraint_dic)
+            capacity_dic.update(group_capacity_dic)
+            dispatch_dic.update(group_dispatch_dic)
+            node_flow_list += group_node_flow_list
+            fnc2min += group_cost
+            add_profile_time('build', tech_type, time.perf_counter() - tech_start_time)
+            continue
+
+        # numeric values from tech_dic, or parameters holding those values
+        values = get_tech_values(case_dic, tech_dic)
+        if case_dic['parameterized']:
+            values = make_parameters(tech_name, values, parameter_dic)
         
         # check the input node_to
         if 'node_to' in tech_dic:
             node_to = tech_dic['node_to']
             if not node_to in node_balance.keys():
-                node_balance[node_to] = np.zeros(num_time_periods)
+                node_balance[node_to] = cvx.Constant(np.zeros(num_time_periods))
         
         # check the output node
         if 'node_from' in tech_dic:
             node_from = tech_dic['node_from']
             if not node_from in node_balance.keys():
-                node_balance[node_from] = np.zeros(num_time_periods)
+                node_balance[node_from] = cvx.Constant(np.zeros(num_time_periods))
 
         #----------------------------------------------------------------------
         # demand (n_capacity = 0 and n_dispatch = 0 and n_dispatch = 0)
@@ -139,7 +245,7 @@ def core_model(case_dic, tech_list):
 
         if tech_type == 'demand':
             if 'series' in tech_dic:
-                dispatch = tech_dic['series']
+                dispatch = values['series']
             else:
                 dispatch = np.ones(num_time_periods)
             dispatch_dic[tech_name] = dispatch
@@ -153,11 +259,10 @@ def core_model(case_dic, tech_list):
         
         elif tech_type == 'lost_load':
             dispatch = cvx.Variable(num_time_periods) 
-            constraints += [ dispatch >= 0 ]
-            constraint_list += [tech_name + ' dispatch_ge_0']
+            constraint_dic[(tech_name, 'dispatch_ge_0')] = dispatch >= 0
             dispatch_dic[tech_name] = dispatch
             node_balance[node_to] += dispatch # note that lost load is like a phantom source of pure variable capacity
-            fnc2min +=  cvx.sum(dispatch * tech_dic['var_cost'])
+            fnc2min +=  sum_over_time(dispatch * values['var_cost'], time_weights)
 
         #----------------------------------------------------------------------
         # generic curtailment
@@ -166,12 +271,11 @@ def core_model(case_dic, tech_list):
         
         elif tech_type == 'curtailment':
             dispatch = cvx.Variable(num_time_periods) 
-            constraints += [ dispatch >= 0 ]
-            constraint_list += [tech_name + ' dispatch_ge_0']
+            constraint_dic[(tech_name, 'dispatch_ge_0')] = dispatch >= 0
             dispatch_dic[tech_name] = dispatch
             node_balance[node_from] += - dispatch
             if 'var_cost' in tech_dic: # if cost of curtailment
-                fnc2min +=  cvx.sum(dispatch * tech_dic['var_cost'])
+                fnc2min +=  sum_over_time(dispatch * values['var_cost'], time_weights)
                 
         #----------------------------------------------------------------------
         # non-curtailable generator 
@@ -180,18 +284,16 @@ def core_model(case_dic, tech_list):
         #  capacity.
         
         elif tech_type == 'fixed_generator':
-            capacity = cvx.Variable(1)
-            constraints += [ capacity >= 0 ]
-            constraint_list += [tech_name + ' capacity_ge_0']
+            capacity = capacity_decision(case_dic, tech_name, values, constraint_dic)
             if 'series' in tech_dic:
-                dispatch = capacity * tech_dic['series']
+                dispatch = capacity_times(case_dic, capacity, values, 'series')
             else:
                 dispatch = capacity
                 
             capacity_dic[tech_name] = capacity
             
             node_balance[node_to] += dispatch
-            fnc2min += capacity * tech_dic['fixed_cost'] * num_time_periods
+            fnc2min += capacity_times(case_dic, capacity, values, 'fixed_cost') * num_time_periods_represented
 
         #----------------------------------------------------------------------
         # curtailable generator
@@ -200,25 +302,20 @@ def core_model(case_dic, tech_list):
         # is available, it will be assumed to be output per unit capacity.
         
         elif tech_type == 'generator':
-            capacity = cvx.Variable(1)
+            capacity = capacity_decision(case_dic, tech_name, values, constraint_dic)
             dispatch = cvx.Variable(num_time_periods) 
-            constraints += [ capacity >= 0 ]
-            constraint_list += [tech_name + ' capacity_ge_0']
-            constraints += [ dispatch >= 0 ]
-            constraint_list += [tech_name + ' dispatch_ge_0']
+            constraint_dic[(tech_name, 'dispatch_ge_0')] = dispatch >= 0
             if 'series' in tech_dic:
-                constraints += [ dispatch <= capacity * tech_dic['series'] ]
-                constraint_list += [tech_name + ' dispatch_le_capacity_x_series']
+                constraint_dic[(tech_name, 'dispatch_le_capacity_x_series')] = dispatch <= capacity_times(case_dic, capacity, values, 'series')
             else:
-                constraints += [ dispatch <= capacity ]
-                constraint_list += [tech_name + ' dispatch_le_capacity']
+                constraint_dic[(tech_name, 'dispatch_le_capacity')] = dispatch <= capacity
                 
             capacity_dic[tech_name] = capacity
             dispatch_dic[tech_name] = dispatch
             
             node_balance[node_to] += dispatch
-            fnc2min +=  cvx.sum(dispatch * tech_dic['var_cost']) 
-            fnc2min += capacity * tech_dic['fixed_cost'] * num_time_periods
+            fnc2min +=  sum_over_time(dispatch * values['var_cost'], time_weights) 
+            fnc2min += capacity_times(case_dic, capacity, values, 'fixed_cost') * num_time_periods_represented
         
         #----------------------------------------------------------------------
         # Storage
@@ -226,46 +323,55 @@ def core_model(case_dic, tech_list):
         # Assumed to be storage equivalent to a battery
         # Note variable cost, if present, is applied to output only
         # Optional variables: charging_time, efficiency, decay_rate
-        # Note: Charging time and decay rate is in units of number of time steps !!!
+        # Note: Charging time is in hours and decay rate in units of number of time steps !!!
+        # (the same for hourly time steps; see resample_time_steps in Time_Aggregation.py)
         
         elif tech_type == 'storage':
-            capacity = cvx.Variable(1)
+            capacity = capacity_decision(case_dic, tech_name, values, constraint_dic)
             dispatch_in = cvx.Variable(num_time_periods) 
             dispatch = cvx.Variable(num_time_periods)
             energy_stored = cvx.Variable(num_time_periods)
-            constraints += [ capacity >= 0 ]
-            constraint_list += [tech_name + ' capacity_ge_0']
-            constraints += [ dispatch_in >= 0 ]
-            constraint_list += [tech_name + ' dispatch_in_ge_0']
-            constraints += [ dispatch >= 0 ]
-            constraint_list += [tech_name + ' dispatch_ge_0']
-            constraints += [ energy_stored >= 0 ]
-            constraint_list += [tech_name + ' energy_stored_ge_0']
-            constraints += [ energy_stored <= capacity ]
-            constraint_list += [tech_name + ' energy_stored_le_capacity']
+            constraint_dic[(tech_name, 'dispatch_in_ge_0')] = dispatch_in >= 0
+            constraint_dic[(tech_name, 'dispatch_ge_0')] = dispatch >= 0
             if 'charging_time' in tech_dic:
-                constraints += [ dispatch_in  <= capacity / tech_dic['charging_time'] ]
-                constraint_list += [tech_name + ' dispatch_in_le_charging_rate']
-                constraints += [ dispatch <= capacity / tech_dic['charging_time'] ]
-                constraint_list += [tech_name + ' dispatch_le_discharge_rate']
+                constraint_dic[(tech_name, 'dispatch_in_le_charging_rate')] = dispatch_in  <= capacity_times(case_dic, capacity, values, 'inv_charging_time')
+                constraint_dic[(tech_name, 'dispatch_le_discharge_rate')] = dispatch <= capacity_times(case_dic, capacity, values, 'inv_charging_time')
             if 'decay_rate' in tech_dic:
-                decay_rate = tech_dic['decay_rate']
+                decay_rate = values['decay_rate']
             else:
                 decay_rate = 0
             if 'efficiency' in tech_dic:
-                efficiency = tech_dic['efficiency']
+                efficiency = values['efficiency']
             else:
                 efficiency = 1.0
                 
-            for i in range(num_time_periods):
-
-                constraints += [
-                    energy_stored[(i+1) % num_time_periods] ==
-                        energy_stored[i] + efficiency * dispatch_in[i]
-                        - dispatch[i] - energy_stored[i]*decay_rate
-                        ]
-                constraint_list += [tech_name + ' storage_balance_step_'+str(i).zfill(5)]
-                        
+            if 'period_sequence' in case_dic:
+                # representative periods linked over the original sequence of periods
+                constraint_dic.update(representative_period_storage(
+                        case_dic, tech_name, capacity, dispatch_in, dispatch, energy_stored,
+                        efficiency, decay_rate, values))
+            else:
+                constraint_dic[(tech_name, 'energy_stored_ge_0')] = energy_stored >= 0
+                constraint_dic[(tech_name, 'energy_stored_le_capacity')] = energy_stored <= capacity
+                # energy_stored after each time step from the balance for that time step,
+                # with dispatch as energy per hour over time steps of time_step_hours
+                energy_stored_next = (energy_stored + time_step_hours(case_dic) * (efficiency * dispatch_in - dispatch)
+                                      - energy_stored*decay_rate)
+                if 'energy_stored_initial' in tech_dic:
+                    # Storage starts from a given state (e.g., from the previous window in
+                    # Rolling_Horizon.py); the state after the last time step is free
+                    # within the bounds of the storage.
+                    constraint_dic[(tech_name, 'energy_stored_eq_initial')] = energy_stored[0] == values['energy_stored_initial']
+                    constraint_dic[(tech_name, 'storage_balance')] = energy_stored[1:] == energy_stored_next[:-1]
+                    constraint_dic[(tech_name, 'energy_stored_final_ge_0')] = energy_stored_next[-1] >= 0
+                    constraint_dic[(tech_name, 'energy_stored_final_le_capacity')] = energy_stored_next[-1] <= capacity
+                else:
+                    # Cyclic storage balance for all time steps as a single constraint.
+                    # Element i of this constraint is the balance for time step i, where
+                    # the energy stored after the last time step wraps around to the first.
+                    next_step = np.roll(np.arange(num_time_periods), -1)
+                    constraint_dic[(tech_name, 'storage_balance')] = energy_stored[next_step] == energy_stored_next
+
             capacity_dic[tech_name] = capacity
             dispatch_dic[tech_name] = dispatch
             dispatch_dic[tech_name+' in'] = dispatch_in
@@ -276,8 +382,8 @@ def core_model(case_dic, tech_list):
             else:
                 node_balance[node_to ] += -dispatch_in
             if 'var_cost' in tech_dic:
-                fnc2min += cvx.sum(dispatch * tech_dic['var_cost'])
-            fnc2min += capacity * tech_dic['fixed_cost']  * num_time_periods
+                fnc2min += sum_over_time(dispatch * values['var_cost'], time_weights)
+            fnc2min += capacity_times(case_dic, capacity, values, 'fixed_cost')  * num_time_periods_represented
         
         #----------------------------------------------------------------------
         # Transmission  or concerion (directional)
@@ -285,29 +391,25 @@ def core_model(case_dic, tech_list):
         # Assumed to be unidirectional for simplicity !!!
         
         elif tech_type == 'transfer':
-            capacity = cvx.Variable(1)
+            capacity = capacity_decision(case_dic, tech_name, values, constraint_dic)
             dispatch = cvx.Variable(num_time_periods)
-            constraints += [ capacity >= 0 ]
-            constraint_list += [tech_name + ' capacity_ge_0']
-            constraints += [ dispatch >= 0 ]
-            constraint_list += [tech_name + ' dispatch_ge_0']
-            constraints += [ dispatch <= capacity ]
-            constraint_list += [tech_name + ' dispatch_le_capacity']
+            constraint_dic[(tech_name, 'dispatch_ge_0')] = dispatch >= 0
+            constraint_dic[(tech_name, 'dispatch_le_capacity')] = dispatch <= capacity
                                         
             capacity_dic[tech_name] = capacity
             dispatch_dic[tech_name] = dispatch
             
             if 'efficiency' in tech_dic:
-                efficiency = tech_dic['efficiency']
+                inv_efficiency = values['inv_efficiency']
             else:
-                efficiency = 1.0
+                inv_efficiency = 1.0
 
-            node_balance[node_to] += dispatch
-            node_balance[node_from] += - dispatch/efficiency # need more in than out            
+            # flow into node_to, and out of node_from with losses (see link_flows)
+            link_flow_list.append((dispatch, node_to, node_from, inv_efficiency))
 
             if 'var_cost' in tech_dic:
-                fnc2min += cvx.sum(dispatch * tech_dic['var_cost'])
-            fnc2min += capacity * tech_dic['fixed_cost'] * num_time_periods
+                fnc2min += sum_over_time(dispatch * values['var_cost'], time_weights)
+            fnc2min += capacity_times(case_dic, capacity, values, 'fixed_cost') * num_time_periods_represented
         
         #----------------------------------------------------------------------
         # Bidirectional Transmission (directional)
@@ -315,55 +417,66 @@ def core_model(case_dic, tech_list):
         # Assumed to be unidirectional for simplicity !!!
         
         elif tech_type == 'transmission':
-            capacity = cvx.Variable(1)
+            capacity = capacity_decision(case_dic, tech_name, values, constraint_dic)
             dispatch = cvx.Variable(num_time_periods)
             dispatch_reverse = cvx.Variable(num_time_periods)
-            constraints += [ capacity >= 0 ]
-            constraint_list += [tech_name + ' capacity_ge_0']
-            constraints += [ dispatch >= 0 ]
-            constraint_list += [tech_name + ' dispatch_ge_0']
-            constraints += [ dispatch_reverse >= 0 ]
-            constraint_list += [tech_name + ' dispatch_ge_0_rev']
-            constraints += [ dispatch <= capacity ]
-            constraint_list += [tech_name + ' dispatch_le_capacity']
-            constraints += [ dispatch_reverse <= capacity ]
-            constraint_list += [tech_name + ' capacity_ge_0']
+            constraint_dic[(tech_name, 'dispatch_ge_0')] = dispatch >= 0
+            constraint_dic[(tech_name, 'dispatch_reverse_ge_0')] = dispatch_reverse >= 0
+            constraint_dic[(tech_name, 'dispatch_le_capacity')] = dispatch <= capacity
+            constraint_dic[(tech_name, 'dispatch_reverse_le_capacity')] = dispatch_reverse <= capacity
                                         
             capacity_dic[tech_name] = capacity
             dispatch_dic[tech_name] = dispatch
             dispatch_dic[tech_name+' reverse'] = dispatch_reverse
             
             if 'efficiency' in tech_dic:
-                efficiency = tech_dic['efficiency']
+                inv_efficiency = values['inv_efficiency']
             else:
-                efficiency = 1.0
+                inv_efficiency = 1.0
 
-            node_balance[node_to] += dispatch
-            node_balance[node_from] += - dispatch/efficiency # need more in than out            
-            node_balance[node_from] += dispatch_reverse
-            node_balance[node_to] += -dispatch_reverse/efficiency # need more in than out            
+            link_flow_list.append((dispatch, node_to, node_from, inv_efficiency))
+            link_flow_list.append((dispatch_reverse, node_from, node_to, inv_efficiency))
                     
             if 'var_cost' in tech_dic:
-                fnc2min += cvx.sum(dispatch * tech_dic['var_cost'])
-                fnc2min += cvx.sum(dispatch_reverse * tech_dic['var_cost'])
-            fnc2min += capacity * tech_dic['fixed_cost'] * num_time_periods
+                fnc2min += sum_over_time(dispatch * values['var_cost'], time_weights)
+                fnc2min += sum_over_time(dispatch_reverse * values['var_cost'], time_weights)
+            fnc2min += capacity_times(case_dic, capacity, values, 'fixed_cost') * num_time_periods_represented
+
+        #----------------------------------------------------------------------
+        # Capacity given in the input (e.g., dispatch with a fixed fleet)
+        
+        if 'capacity' in tech_dic and tech_name in capacity_dic and not case_dic['dispatch_only']:
+            constraint_dic[(tech_name, 'capacity_eq_fixed')] = capacity_dic[tech_name] == values['capacity']
+
+        add_profile_time('build', tech_type, time.perf_counter() - tech_start_time)
 
     # end of loop to build up minimization function and constraints 
     
     #%%======================================================================
     # Now add all of the node balances to the constraints
     
-    for node in node_balance:
-        constraints += [ 0 == node_balance[node] ]
-        constraint_list += [node + ' balance']
+    # The node balances are a single (time x node) constraint: column n holds
+    # the techs at node n, plus the flows between nodes through the incidence
+    # matrices of Network.py. The price at node n is column n of its dual value.
+    
+    problem_start_time = time.perf_counter()
+    if len(link_flow_list) > 0:
+        node_flow_list.append(link_flows(link_flow_list, node_index_dic, num_time_periods))
+    node_balance_matrix = cvx.hstack([
+            cvx.reshape(node_balance.get(node, cvx.Constant(np.zeros(num_time_periods))), (num_time_periods, 1), order = 'F')
+            for node in node_index_dic])
+    for node_flow in node_flow_list:
+        node_balance_matrix += node_flow
+    constraint_dic[node_balance_key] = 0 == node_balance_matrix
         
     #%%======================================================================
-    # Now solve the problem
+    # Now define the problem
 
     fnc2min_scaled = case_dic['numerics_scaling']*fnc2min
     obj = cvx.Minimize(fnc2min_scaled)
+    constraints = list(constraint_dic.values())
     prob = cvx.Problem(obj, constraints)
-    prob.solve(solver = 'GUROBI')
+    add_profile_time('build', 'node_balance', time.perf_counter() - problem_start_time)
 
 #    # problem is solved
 #    #======================================================================
@@ -406,14 +519,417 @@ def core_model(case_dic, tech_list):
 #    return global_results_dic, decision_dic_list
 #    
     
-    end_time = datetime.datetime.now()    # timer starts
-    if case_dic['verbose']:
-        print ('    end time = ',end_time)
-        print ('    elapsed time = ',end_time - start_time)
+    return constraint_dic,constraints,prob,capacity_dic,dispatch_dic,parameter_dic
+
+#%% Numeric values and parameters
+
+def get_tech_values(case_dic, tech_dic):
+    # Numeric values from <tech_dic> that enter the model.
+    # Reciprocals of efficiency and charging_time are included so that the model
+    # only multiplies by these values, as division by a cvx.Parameter is not
+    # allowed in a parameterized (DPP) problem. For the same reason, the fraction
+    # of stored energy retained over one representative period is included.
+    values = {}
+    for key in ['fixed_cost','var_cost','efficiency','decay_rate','series',
+                'capacity','energy_stored_initial']:
+        if key in tech_dic:
+            values[key] = tech_dic[key]
+    if 'efficiency' in tech_dic:
+        values['inv_efficiency'] = 1.0 / tech_dic['efficiency']
+    if 'charging_time' in tech_dic:
+        values['inv_charging_time'] = 1.0 / tech_dic['charging_time']
+    if 'decay_rate' in tech_dic and 'period_sequence' in case_dic:
+        values['period_retention'] = (1.0 - tech_dic['decay_rate']) ** case_dic['period_length']
+    if case_dic['dispatch_only'] and 'capacity' in tech_dic:
+        # products with the capacity given in the input (see capacity_times)
+        for key in ['series','inv_charging_time','fixed_cost']:
+            if key in values:
+                values['capacity_x_' + key] = tech_dic['capacity'] * np.asarray(values[key])
+    return values
+
+def make_parameters(tech_name, values, parameter_dic):
+    # Replace each value by a cvx.Parameter holding that value.
+    parameters = {}
+    for key in values:
+        parameter = cvx.Parameter(np.shape(values[key]), value = values[key])
+        parameter_dic[(tech_name, key)] = parameter
+        parameters[key] = parameter
+    return parameters
+
+def update_parameters(case_dic, parameter_dic, tech_list):
+    # Set parameter values from <tech_list>.
+    for tech_dic in tech_list:
+        if 'tech_group' in tech_dic:
+            continue
+        values = get_tech_values(case_dic, tech_dic)
+        for key in values:
+            parameter_dic[(tech_dic['tech_name'], key)].value = values[key]
+    for group_name, member_list in tech_groups(tech_list).items():
+        values = get_group_values(case_dic, group_name, member_list)
+        for key in values:
+            parameter_dic[(group_name, key)].value = values[key]
+
+def model_structure_key(case_dic, tech_list):
+    # Everything that determines the structure of the problem built by
+    # build_core_model, but not the values of its parameters.
+    tech_structure = tuple(
+        (tech_dic['tech_name'], tech_dic['tech_type'],
+         tech_dic.get('node_to'), tech_dic.get('node_from'), tech_dic.get('tech_group'),
+         tuple(sorted(get_tech_values(case_dic, tech_dic))))
+        for tech_dic in tech_list)
+    # representative periods enter the problem as constants
+    time_structure = [case_dic['num_time_periods'], case_dic['numerics_scaling'], case_dic['dispatch_only'],
+                      time_step_hours(case_dic)]
+    for key in ['time_weights', 'period_sequence']:
+        if key in case_dic:
+            time_structure.append(case_dic[key].tobytes())
+    return (tuple(time_structure), tech_structure)
+
+#%% Helper functions for building the problem
+
+def constraint_names(constraint_dic):
+    # Name of every row of every constraint, e.g., 'node_1_storage storage_balance[17]',
+    # in the order of the constraints in the problem.
+    names = []
+    for (name, kind), constraint in constraint_dic.items():
+        if constraint.size == 1:
+            names.append(name + ' ' + kind)
+        elif len(constraint.shape) == 2: # rows in column-major order, as cvxpy
+            names += [name + ' ' + kind + '[' + str(i) + ',' + str(j) + ']'
+                      for j in range(constraint.shape[1]) for i in range(constraint.shape[0])]
+        else:
+            names += [name + ' ' + kind + '[' + str(i) + ']' for i in range(constraint.size)]
+    return names
+
+def capacity_decision(case_dic, tech_name, values, constraint_dic):
+    # Capacity variable of a tech, or with <dispatch_only> (see Dispatch_Only.py)
+    # the capacity given in the input, so that only the dispatch is optimized.
+    if case_dic['dispatch_only']:
+        return values['capacity']
+    capacity = cvx.Variable(1)
+    constraint_dic[(tech_name, 'capacity_ge_0')] = capacity >= 0
+    return capacity
+
+def capacity_times(case_dic, capacity, values, key):
+    # capacity * values[key]. With <dispatch_only>, both may be parameters, and a
+    # product of parameters is not allowed in a parameterized (DPP) problem, so
+    # the product is taken from get_tech_values.
+    if case_dic['dispatch_only']:
+        return values['capacity_x_' + key]
+    return capacity * values[key]
+
+def sum_over_time(x, time_weights):
+    # Sum of <x> over time steps, weighted if representative periods are used.
+    if time_weights is None:
+        return cvx.sum(x)
+    else:
+        return time_weights @ x
+
+def time_step_hours(case_dic):
+    # Hours per time step, by which storage balances multiply dispatch. Only
+    # resample_time_steps (Time_Aggregation.py) makes time steps longer than an
+    # hour; series that were not resampled are hourly, whatever <time_step_hours> says.
+    if case_dic['time_step_hours'] != 1 and not 'num_time_periods_hourly' in case_dic:
+        raise ValueError('time_step_hours is ' + str(case_dic['time_step_hours']) + ' but the series are hourly; ' +
+                         'resample them with resample_time_steps (Time_Aggregation.py) before core_model')
+    return case_dic['time_step_hours']
+
+def link_flows(link_flow_list, node_index_dic, num_time_periods):
+    # Flows of transfer and transmission techs into each node, as a (time x node)
+    # expression. Each flow in <link_flow_list> goes into its node_to, and out of
+    # its node_from multiplied by its inv_efficiency (more in than out).
+    flow = cvx.hstack([cvx.reshape(link_flow, (num_time_periods, 1), order = 'F')
+                       for link_flow, node_to, node_from, inv_efficiency in link_flow_list])
+    node_to_matrix = incidence_matrix([node_to for link_flow, node_to, node_from, inv_efficiency in link_flow_list], node_index_dic)
+    node_from_matrix = incidence_matrix([node_from for link_flow, node_to, node_from, inv_efficiency in link_flow_list], node_index_dic)
+    inv_efficiency_list = [inv_efficiency for link_flow, node_to, node_from, inv_efficiency in link_flow_list]
+    if all(isinstance(inv_efficiency, float) and inv_efficiency == 1.0 for inv_efficiency in inv_efficiency_list):
+        flow_from = flow
+    else:
+        # a row of constants and parameters
+        flow_from = cvx.multiply(flow, cvx.hstack([cvx.reshape(inv_efficiency, (1, 1), order = 'F')
+                                                   for inv_efficiency in inv_efficiency_list]))
+    return flow @ node_to_matrix.T - flow_from @ node_from_matrix.T
+
+def representative_period_storage(case_dic, tech_name, capacity, dispatch_in, dispatch, energy_stored,
+                                  efficiency, decay_rate, values):
+    # Storage constraints for representative periods (see Time_Aggregation.py).
+    #
+    # <energy_stored> is the energy stored at the end of each time step relative
+    # to the start of its representative period. <energy_stored_start> is the
+    # absolute energy stored at the start of each period of the original sequence.
+    # The energy stored at the start of the next period in the sequence is that at
+    # the start of this period (less decay) plus the change over its representative
+    # period, cycling back to the first period after the last.
+    #
+    # Following Kotzur et al. (2018), the bounds 0 <= energy <= capacity within each
+    # period are imposed through the minimum and maximum of the relative energy
+    # stored over each representative period.
+
+    period_length = case_dic['period_length']
+    period_sequence = case_dic['period_sequence']
+    num_time_periods = case_dic['num_time_periods']
+    num_periods = len(period_sequence)
+    num_representative_periods = num_time_periods // period_length
+
+    if 'period_retention' in values:
+        period_retention = values['period_retention']
+    else:
+        period_retention = 1.0
+
+    time_index = np.arange(num_time_periods)
+    period_of_step = time_index // period_length
+    previous_step = time_index - 1
+    not_period_start = (time_index % period_length != 0).astype(float) # previous step is in same period
+    period_end = np.arange(num_representative_periods) * period_length + period_length - 1
+
+    energy_stored_start = cvx.Variable(num_periods)
+    energy_stored_min = cvx.Variable(num_representative_periods)
+    energy_stored_max = cvx.Variable(num_representative_periods)
+
+    constraint_dic = {}
+
+    constraint_dic[(tech_name, 'storage_balance')] = (
+        energy_stored ==
+            cvx.multiply(not_period_start, energy_stored[previous_step]) * (1 - decay_rate)
+            + time_step_hours(case_dic) * (efficiency * dispatch_in - dispatch)
+            )
+    constraint_dic[(tech_name, 'storage_balance_between_periods')] = (
+        energy_stored_start[np.roll(np.arange(num_periods), -1)] ==
+            energy_stored_start * period_retention + energy_stored[period_end][period_sequence]
+            )
+    constraint_dic[(tech_name, 'energy_stored_le_max')] = energy_stored_max[period_of_step] >= energy_stored
+    constraint_dic[(tech_name, 'energy_stored_ge_min')] = energy_stored_min[period_of_step] <= energy_stored
+    constraint_dic[(tech_name, 'energy_stored_max_ge_0')] = energy_stored_max >= 0
+    constraint_dic[(tech_name, 'energy_stored_min_le_0')] = energy_stored_min <= 0
+    constraint_dic[(tech_name, 'energy_stored_ge_0')] = energy_stored_start * period_retention + energy_stored_min[period_sequence] >= 0
+    constraint_dic[(tech_name, 'energy_stored_le_capacity')] = energy_stored_start + energy_stored_max[period_sequence] <= capacity
+
+    return constraint_dic
+
+#%% Tech groups
+#
+# Techs with the same <tech_group> (e.g., hundreds of wind sites, or the lines of
+# a network) are built as one group: a (num_time_periods x K) dispatch variable
+# and a K-vector of capacities for the K members, with their series as the
+# columns of a (num_time_periods x K) matrix. Each constraint of the group holds
+# all its members, so the problem has a few large constraints instead of many
+# small ones, which is much faster for cvxpy to compile.
+#
+# Constraints of a group are keyed by (group name, kind) in <constraint_dic>;
+# column k of a constraint belongs to the k-th member in the order of tech_list.
+# <capacity_dic> and <dispatch_dic> hold the column of each member under its
+# own tech_name, so results are extracted by tech name as for other techs.
+
+def tech_groups(tech_list):
+    # {group name: list of tech_dic of its members}, in the order of tech_list.
+    group_dic = {}
+    tech_name_list = [tech_dic['tech_name'] for tech_dic in tech_list]
+    for tech_dic in tech_list:
+        if 'tech_group' in tech_dic:
+            group_name = tech_dic['tech_group']
+            if group_name in tech_name_list:
+                raise ValueError('tech_group ' + group_name + ' has the name of a tech')
+            group_dic.setdefault(group_name, []).append(tech_dic)
+    for group_name, member_list in group_dic.items():
+        if len(set(tech_dic['tech_type'] for tech_dic in member_list)) > 1:
+            raise ValueError('tech_group ' + group_name + ' has techs of more than one tech_type')
+    return group_dic
+
+def group_columns(tech_list):
+    # {tech_name: (group name, column of the tech in its group)} for techs in a group.
+    group_column_dic = {}
+    for group_name, member_list in tech_groups(tech_list).items():
+        for column, tech_dic in enumerate(member_list):
+            group_column_dic[tech_dic['tech_name']] = (group_name, column)
+    return group_column_dic
+
+# values that may be given for some members of a group only, and the value
+# used for the others
+group_default_values = {'fixed_cost':0.0, 'var_cost':0.0, 'efficiency':1.0,
+                        'inv_efficiency':1.0, 'decay_rate':0.0, 'capacity_x_fixed_cost':0.0}
+
+def get_group_values(case_dic, group_name, member_list):
+    # Numeric values of the members of a group, as K-vectors, and their series
+    # as a (num_time_periods x K) matrix. A value is included if any member has it.
+
+    member_values = [get_tech_values(case_dic, tech_dic) for tech_dic in member_list]
+    if member_list[0]['tech_type'] == 'storage' and 'period_sequence' in case_dic:
+        raise ValueError('tech_group ' + group_name + ': storage groups cannot be used with representative periods')
+
+    values = {}
+    for key in set().union(*member_values):
+        if key in group_default_values:
+            values[key] = np.array([tech_values.get(key, group_default_values[key]) for tech_values in member_values], dtype = float)
+        elif not all(key in tech_values for tech_values in member_values):
+            raise ValueError('tech_group ' + group_name + ': ' + key + ' must be given for all techs of the group or none')
+        elif key in ['series', 'capacity_x_series']:
+            values[key] = np.column_stack([tech_values[key] for tech_values in member_values])
+        else:
+            values[key] = np.array([tech_values[key] for tech_values in member_values], dtype = float)
+    return values
+
+def node_flows(node_index_dic, node_names, flow, factor = None, sign = 1.0):
+    # Flow into each node from the members of a group, as a (time x node)
+    # expression, where the flow of member k is sign * flow[:, k] * factor[k],
+    # with <flow> (time x K) and <factor> a K-vector or None.
+    if factor is not None:
+        flow = cvx.multiply(flow, as_row(factor))
+    return sign * (flow @ incidence_matrix(node_names, node_index_dic).T)
+
+def as_row(x):
+    # K-vector as a (1 x K) row, which multiplies each row of a (time x K) matrix
+    return cvx.reshape(x, (1, x.shape[0]), order = 'F')
+
+def build_tech_group(case_dic, group_name, member_list, values, node_index_dic, time_weights, num_time_periods_represented):
+    # Model of the techs of one group, as build_core_model builds each tech of
+    # that tech_type. Returns constraint_dic, capacity_dic and dispatch_dic (for
+    # each member), a list of (time x node) flows into the nodes, and the cost
+    # of the group.
 
-            
-    return constraint_list,constraints,prob,capacity_dic,dispatch_dic    
-    
-    
-    
-    
\ No newline at end of file
+    num_time_periods = case_dic['num_time_periods']
+    tech_type = member_list[0]['tech_type']
+    num_members = len(member_list)
+    shape = (num_time_periods, num_members)
+    node_to_names = [tech_dic.get('node_to') for tech_dic in member_list]
+    node_from_names = [tech_dic.get('node_from') for tech_dic in member_list]
+
+    constraint_dic = {}
+    capacity_dic = {}
+    dispatch_dic = {}
+    node_flow_list = []
+    cost = 0.0
+
+    dispatch_only = case_dic['dispatch_only']
+    if tech_type in capacity_tech_types and dispatch_only:
+        # capacities given in the input, with their products taken from
+        # get_tech_values (see capacity_times)
+        capacity = values['capacity']
+        capacity_row = as_row(capacity)
+        if 'capacity_x_fixed_cost' in values:
+            cost += cvx.sum(values['capacity_x_fixed_cost']) * num_time_periods_represented
+    elif tech_type in capacity_tech_types:
+        capacity = cvx.Variable(num_members)
+        capacity_row = as_row(capacity)
+        constraint_dic[(group_name, 'capacity_ge_0')] = capacity >= 0
+        fixed_cost = values['fixed_cost'] if 'fixed_cost' in values else np.zeros(num_members)
+        cost += capacity @ fixed_cost * num_time_periods_represented
+        if 'capacity' in values:
+            constraint_dic[(group_name, 'capacity_eq_fixed')] = capacity == values['capacity']
+    if tech_type in capacity_tech_types:
+        for column, tech_dic in enumerate(member_list):
+            capacity_dic[tech_dic['tech_name']] = capacity[column]
+
+    if tech_type == 'demand':
+        if 'series' in values:
+            dispatch = values['series']
+        else:
+            dispatch = np.ones(shape)
+        node_flow_list.append(node_flows(node_index_dic, node_from_names, dispatch, sign = -1.0))
+
+    elif tech_type in ['lost_load', 'curtailment']:
+        dispatch = cvx.Variable(shape)
+        constraint_dic[(group_name, 'dispatch_ge_0')] = dispatch >= 0
+        if tech_type == 'lost_load':
+            node_flow_list.append(node_flows(node_index_dic, node_to_names, dispatch))
+        else:
+            node_flow_list.append(node_flows(node_index_dic, node_from_names, dispatch, sign = -1.0))
+
+    elif tech_type == 'fixed_generator':
+        if 'series' in values and dispatch_only:
+            node_flow_list.append(node_flows(node_index_dic, node_to_names, values['capacity_x_series']))
+        elif 'series' in values:
+            node_flow_list.append(node_flows(node_index_dic, node_to_names, values['series'], capacity))
+        else:
+            node_flow_list.append(node_flows(node_index_dic, node_to_names, np.ones((1, num_members)), capacity))
+
+    elif tech_type == 'generator':
+        dispatch = cvx.Variable(shape)
+        constraint_dic[(group_name, 'dispatch_ge_0')] = dispatch >= 0
+        if 'series' in values and dispatch_only:
+            constraint_dic[(group_name, 'dispatch_le_capacity_x_series')] = dispatch <= values['capacity_x_series']
+        elif 'series' in values:
+            constraint_dic[(group_name, 'dispatch_le_capacity_x_series')] = dispatch <= cvx.multiply(values['series'], capacity_row)
+        else:
+            constraint_dic[(group_name, 'dispatch_le_capacity')] = dispatch <= capacity_row
+        node_flow_list.append(node_flows(node_index_dic, node_to_names, dispatch))
+
+    elif tech_type == 'storage':
+        dispatch_in = cvx.Variable(shape)
+        dispatch = cvx.Variable(shape)
+        energy_stored = cvx.Variable(shape)
+        constraint_dic[(group_name, 'dispatch_in_ge_0')] = dispatch_in >= 0
+        constraint_dic[(group_name, 'dispatch_ge_0')] = dispatch >= 0
+        if 'inv_charging_time' in values:
+            if dispatch_only:
+                charging_rate = as_row(values['capacity_x_inv_charging_time'])
+            else:
+                charging_rate = cvx.multiply(capacity_row, as_row(values['inv_charging_time']))
+            constraint_dic[(group_name, 'dispatch_in_le_charging_rate')] = dispatch_in <= charging_rate
+            constraint_dic[(group_name, 'dispatch_le_discharge_rate')] = dispatch <= charging_rate
+        constraint_dic[(group_name, 'energy_stored_ge_0')] = energy_stored >= 0
+        constraint_dic[(group_name, 'energy_stored_le_capacity')] = energy_stored <= capacity_row
+
+        if 'efficiency' in values:
+            stored_in = cvx.multiply(dispatch_in, as_row(values['efficiency']))
+        else:
+            stored_in = dispatch_in
+        energy_stored_next = energy_stored + time_step_hours(case_dic) * (stored_in - dispatch)
+        if 'decay_rate' in values:
+            energy_stored_next -= cvx.multiply(energy_stored, as_row(values['decay_rate']))
+        if 'energy_stored_initial' in values:
+            constraint_dic[(group_name, 'energy_stored_eq_initial')] = energy_stored[0, :] == values['energy_stored_initial']
+            constraint_dic[(group_name, 'storage_balance')] = energy_stored[1:, :] == energy_stored_next[:-1, :]
+            constraint_dic[(group_name, 'energy_stored_final_ge_0')] = energy_stored_next[-1, :] >= 0
+            constraint_dic[(group_name, 'energy_stored_final_le_capacity')] = energy_stored_next[-1, :] <= capacity
+        else:
+            next_step = np.roll(np.arange(num_time_periods), -1)
+            constraint_dic[(group_name, 'storage_balance')] = energy_stored[next_step, :] == energy_stored_next
+
+        node_flow_list.append(node_flows(node_index_dic, node_to_names, dispatch))
+        node_in_names = [tech_dic.get('node_from', tech_dic['node_to']) for tech_dic in member_list]
+        node_flow_list.append(node_flows(node_index_dic, node_in_names, dispatch_in, sign = -1.0))
+        for column, tech_dic in enumerate(member_list):
+            dispatch_dic[tech_dic['tech_name'] + ' in'] = dispatch_in[:, column]
+
+    elif tech_type in ['transfer', 'transmission']:
+        dispatch = cvx.Variable(shape)
+        constraint_dic[(group_name, 'dispatch_ge_0')] = dispatch >= 0
+        constraint_dic[(group_name, 'dispatch_le_capacity')] = dispatch <= capacity_row
+        inv_efficiency = values.get('inv_efficiency') # need more in than out
+        node_flow_list.append(node_flows(node_index_dic, node_to_names, dispatch))
+        node_flow_list.append(node_flows(node_index_dic, node_from_names, dispatch, inv_efficiency, sign = -1.0))
+
+        if tech_type == 'transmission':
+            dispatch_reverse = cvx.Variable(shape)
+            constraint_dic[(group_name, 'dispatch_reverse_ge_0')] = dispatch_reverse >= 0
+            constraint_dic[(group_name, 'dispatch_reverse_le_capacity')] = dispatch_reverse <= capacity_row
+            node_flow_list.append(node_flows(node_index_dic, node_from_names, dispatch_reverse))
+            node_flow_list.append(node_flows(node_index_dic, node_to_names, dispatch_reverse, inv_efficiency, sign = -1.0))
+            if 'var_cost' in values:
+                cost += sum_over_time(dispatch_reverse @ values['var_cost'], time_weights)
+            for column, tech_dic in enumerate(member_list):
+                dispatch_dic[tech_dic['tech_name'] + ' reverse'] = dispatch_reverse[:, column]
+
+    # variable cost of dispatch (for storage, of output only)
+    if 'var_cost' in values and tech_type not in ['demand', 'fixed_generator']:
+        cost += sum_over_time(dispatch @ values['var_cost'], time_weights)
+
+    if tech_type != 'fixed_generator':
+        for column, tech_dic in enumerate(member_list):
+            dispatch_dic[tech_dic['tech_name']] = dispatch[:, column]
+
+    return constraint_dic,capacity_dic,dispatch_dic,node_flow_list,cost
+
+def tech_dual_value(constraint_dic, group_column_dic, tech_name, kind):
+    # Dual value of the constraint <kind> of tech <tech_name>, or None if the tech
+    # has no such constraint. For a tech in a group (see group_columns), the
+    # column of the group constraint that belongs to the tech.
+    if tech_name in group_column_dic:
+        group_name, column = group_column_dic[tech_name]
+        if not (group_name, kind) in constraint_dic:
+            return None
+        return constraint_dic[(group_name, kind)].dual_value[..., column]
+    if not (tech_name, kind) in constraint_dic:
+        return None
+    return constraint_dic[(tech_name, kind)].dual_value
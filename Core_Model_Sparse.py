@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+
+'''
+
+File name: Core_Model_Sparse.py
+
+Macro Energy Model ver. 2.0
+
+Alternative to Core_Model.py that does not use cvxpy.
+
+The same linear program that core_model defines with cvxpy expressions is
+assembled here directly as scipy.sparse matrices:
+
+    minimize    c @ x
+    subject to  A_ub @ x <= b_ub
+                A_eq @ x == b_eq
+                lower_bound <= x <= upper_bound
+
+Each technology owns one or more blocks of columns in x (capacity, dispatch,
+dispatch_in, energy_stored, dispatch_reverse), located by a column offset.
+Non-negativity of decision variables is expressed as variable bounds rather than
+as constraint rows.
+
+The problem is solved with scipy.optimize.linprog (HiGHS) and the solution is
+handed back in the same <prob_dic>, <capacity_dic>, <dispatch_dic> form that
+Extract_Cvxpy_Output.py produces, so Save_Basic_Results.py can be used unchanged.
+
+The solver is always HIGHS: a warning is printed if <solver> names another one,
+and there is no <solver_fallback>. <solver_options> are translated as for HIGHS
+(see Solver_Interface.py) and passed to linprog where it takes them: tolerance,
+presolve, method (simplex or ipm, as linprog method highs-ds or highs-ipm) and
+the linprog options in <linprog_option_names>. Options linprog does not take
+(e.g., threads) are ignored with a warning.
+
+Since no cvxpy canonicalization is involved, <numerics_scaling> is not applied
+to the objective function; costs and prices are in their natural units.
+
+'''
+
+#%%
+
+import datetime, time
+import numpy as np
+import scipy
+import scipy.sparse as sps
+from scipy.optimize import linprog
+
+from Profiling import profile_stage, add_profile_time, record_problem_size
+from Solver_Interface import translate_solver_options, parse_solver_options
+
+# linprog method for each value of the HIGHS option 'solver' (generic option 'method')
+linprog_methods = {'choose':'highs', 'simplex':'highs-ds', 'ipm':'highs-ipm'}
+
+# HIGHS options that linprog takes under the same name
+linprog_option_names = ['maxiter','disp','time_limit','dual_feasibility_tolerance','primal_feasibility_tolerance',
+                        'ipm_optimality_tolerance','simplex_dual_edge_weight_strategy']
+
+#%%
+
+def core_model_sparse(case_dic, tech_list):
+
+    start_time = datetime.datetime.now()    # timer starts
+    if case_dic['verbose']:
+        print ('    start time = ',start_time)
+
+    with profile_stage('build', 'sparse'):
+        lp_dic = assemble_sparse_lp(case_dic, tech_list)
+    if case_dic['profile']:
+        num_rows = lp_dic['A_ub'].shape[0] + lp_dic['A_eq'].shape[0]
+        record_problem_size(len(lp_dic['c']), num_rows, num_rows, len(lp_dic['c']),
+                            lp_dic['A_ub'].nnz + lp_dic['A_eq'].nnz)
+    if case_dic['solver'].upper() != 'HIGHS':
+        print ('    model_backend sparse always solves with HIGHS (scipy.optimize.linprog); solver ' +
+               case_dic['solver'] + ' is not used')
+    method, options = linprog_options(case_dic)
+    solve_start_time = time.time()
+    result = solve_sparse_lp(lp_dic, method, options)
+    solve_time = time.time() - solve_start_time
+    add_profile_time('solve', 'total', solve_time)
+    add_profile_time('solver', 'HIGHS (scipy.optimize.linprog)', solve_time)
+    with profile_stage('extract', 'sparse'):
+        prob_dic, capacity_dic, dispatch_dic = extract_sparse_output(case_dic, lp_dic, result)
+    prob_dic['solver_name'] = 'HIGHS (scipy.optimize.linprog)'
+    prob_dic['solver_version'] = scipy.__version__
+    prob_dic['solve_time'] = solve_time
+
+    end_time = datetime.datetime.now()
+    if case_dic['verbose']:
+        print ('    end time = ',end_time)
+        print ('    elapsed time = ',end_time - start_time)
+
+    return prob_dic, capacity_dic, dispatch_dic
+
+#%%
+
+def assemble_sparse_lp(case_dic, tech_list):
+    # Turn <tech_list> into the sparse matrices of a linear program.
+    # Returns a dictionary holding c, A_ub, b_ub, A_eq, b_eq, the variable bounds,
+    # and maps from names to column and row offsets.
+    #
+    # var_map[(tech_name, var_kind)] = (column offset, number of columns)
+    # ub_map[(tech_name, constraint_kind)] = (row offset, number of rows) in A_ub
+    # eq_map[(tech_name or node, constraint_kind)] = (row offset, number of rows) in A_eq
+
+    if 'period_sequence' in case_dic:
+        raise ValueError('representative periods (Time_Aggregation.py) require model_backend cvxpy')
+    if case_dic['time_step_hours'] != 1:
+        raise ValueError('time_step_hours (Time_Aggregation.py) requires model_backend cvxpy')
+    for tech_dic in tech_list:
+        if 'energy_stored_initial' in tech_dic:
+            raise ValueError('energy_stored_initial (Rolling_Horizon.py) requires model_backend cvxpy')
+
+    num_time_periods = case_dic['num_time_periods']
+    time_index = np.arange(num_time_periods)
+    next_step = np.roll(time_index, -1)
+
+    var_map = {}
+    ub_map = {}
+    eq_map = {}
+    c_list = []
+    upper_bound_list = []
+    lower_bound_list = []
+
+    # sparse triplets for A_ub and A_eq
+    ub_rows = []; ub_cols = []; ub_vals = []; b_ub_list = []
+    eq_rows = []; eq_cols = []; eq_vals = []; b_eq_list = []
+    num_cols = [0]
+    num_ub_rows = [0]
+    num_eq_rows = [0]
+
+    node_terms = {} # node -> list of (column index array, coefficient array)
+    node_demand = {} # node -> vector of demand withdrawn from node
+
+    def add_var(tech_name, var_kind, size, cost = 0.0):
+        offset = num_cols[0]
+        var_map[(tech_name, var_kind)] = (offset, size)
+        c_list.append(np.broadcast_to(np.asarray(cost, dtype = float), (size,)))
+        lower_bound_list.append(np.zeros(size))
+        upper_bound_list.append(np.full(size, np.inf))
+        num_cols[0] += size
+        return offset + np.arange(size)
+
+    def add_rows(rows, cols, vals, b, key, row_map, num_rows, rows_list, cols_list, vals_list, b_list):
+        # <rows> are local row indices 0..len(b)-1 of this block of constraints
+        offset = num_rows[0]
+        row_map[key] = (offset, len(b))
+        rows_list.append(offset + np.concatenate(rows))
+        cols_list.append(np.concatenate(cols))
+        vals_list.append(np.concatenate(vals))
+        b_list.append(b)
+        num_rows[0] += len(b)
+
+    def add_ub(key, rows, cols, vals, b):
+        add_rows(rows, cols, vals, b, key, ub_map, num_ub_rows, ub_rows, ub_cols, ub_vals, b_ub_list)
+
+    def add_eq(key, rows, cols, vals, b):
+        add_rows(rows, cols, vals, b, key, eq_map, num_eq_rows, eq_rows, eq_cols, eq_vals, b_eq_list)
+
+    def add_node(node):
+        if not node in node_terms:
+            node_terms[node] = []
+            node_demand[node] = np.zeros(num_time_periods)
+
+    def add_to_node(node, cols, coef):
+        add_node(node)
+        node_terms[node].append((cols, np.broadcast_to(np.asarray(coef, dtype = float), (num_time_periods,))))
+
+    def dispatch_le_capacity(tech_name, kind, dispatch_cols, capacity_col, capacity_coef):
+        # dispatch[t] - capacity_coef[t] * capacity <= 0
+        capacity_coef = np.broadcast_to(np.asarray(capacity_coef, dtype = float), (num_time_periods,))
+        add_ub((tech_name, kind),
+               [time_index, time_index],
+               [dispatch_cols, np.full(num_time_periods, capacity_col)],
+               [np.ones(num_time_periods), -capacity_coef],
+               np.zeros(num_time_periods))
+
+    for tech_dic in tech_list:
+
+        tech_name = tech_dic['tech_name']
+        tech_type = tech_dic['tech_type']
+        var_cost = tech_dic.get('var_cost', 0.0)
+        fixed_cost = tech_dic.get('fixed_cost', 0.0) * num_time_periods
+        efficiency = tech_dic.get('efficiency', 1.0)
+
+        if 'node_to' in tech_dic:
+            node_to = tech_dic['node_to']
+        if 'node_from' in tech_dic:
+            node_from = tech_dic['node_from']
+
+        #----------------------------------------------------------------------
+        if tech_type == 'demand':
+            if 'series' in tech_dic:
+                series = tech_dic['series']
+            else:
+                series = np.ones(num_time_periods)
+            add_node(node_from)
+            node_demand[node_from] = node_demand[node_from] + series
+
+        #----------------------------------------------------------------------
+        elif tech_type == 'lost_load':
+            dispatch_cols = add_var(tech_name, 'dispatch', num_time_periods, var_cost)
+            add_to_node(node_to, dispatch_cols, 1.0)
+
+        #----------------------------------------------------------------------
+        elif tech_type == 'curtailment':
+            dispatch_cols = add_var(tech_name, 'dispatch', num_time_periods, var_cost)
+            add_to_node(node_from, dispatch_cols, -1.0)
+
+        #----------------------------------------------------------------------
+        elif tech_type == 'fixed_generator':
+            capacity_col = add_var(tech_name, 'capacity', 1, fixed_cost)
+            series = tech_dic.get('series', np.ones(num_time_periods))
+            add_to_node(node_to, np.full(num_time_periods, capacity_col[0]), series)
+
+        #----------------------------------------------------------------------
+        elif tech_type == 'generator':
+            capacity_col = add_var(tech_name, 'capacity', 1, fixed_cost)
+            dispatch_cols = add_var(tech_name, 'dispatch', num_time_periods, var_cost)
+            if 'series' in tech_dic:
+                dispatch_le_capacity(tech_name, 'dispatch_le_capacity_x_series',
+                                     dispatch_cols, capacity_col[0], tech_dic['series'])
+            else:
+                dispatch_le_capacity(tech_name, 'dispatch_le_capacity',
+                                     dispatch_cols, capacity_col[0], 1.0)
+            add_to_node(node_to, dispatch_cols, 1.0)
+
+        #----------------------------------------------------------------------
+        elif tech_type == 'storage':
+            decay_rate = tech_dic.get('decay_rate', 0.0)
+            capacity_col = add_var(tech_name, 'capacity', 1, fixed_cost)
+            dispatch_cols = add_var(tech_name, 'dispatch', num_time_periods, var_cost)
+            dispatch_in_cols = add_var(tech_name, 'dispatch_in', num_time_periods)
+            energy_stored_cols = add_var(tech_name, 'energy_stored', num_time_periods)
+
+            dispatch_le_capacity(tech_name, 'energy_stored_le_capacity',
+                                 energy_stored_cols, capacity_col[0], 1.0)
+            if 'charging_time' in tech_dic:
+                dispatch_le_capacity(tech_name, 'dispatch_in_le_charging_rate',
+                                     dispatch_in_cols, capacity_col[0], 1.0 / tech_dic['charging_time'])
+                dispatch_le_capacity(tech_name, 'dispatch_le_discharge_rate',
+                                     dispatch_cols, capacity_col[0], 1.0 / tech_dic['charging_time'])
+
+            # energy_stored[next] - (1 - decay_rate) * energy_stored - efficiency * dispatch_in + dispatch == 0
+            # (when num_time_periods == 1, next == this step and the two terms add)
+            ones = np.ones(num_time_periods)
+            add_eq((tech_name, 'storage_balance'),
+                   [time_index, time_index, time_index, time_index],
+                   [energy_stored_cols[next_step], energy_stored_cols, dispatch_in_cols, dispatch_cols],
+                   [ones, -(1.0 - decay_rate) * ones, -efficiency * ones, ones],
+                   np.zeros(num_time_periods))
+
+            add_to_node(node_to, dispatch_cols, 1.0)
+            if 'node_from' in tech_dic:
+                add_to_node(node_from, dispatch_in_cols, -1.0)
+            else:
+                add_to_node(node_to, dispatch_in_cols, -1.0)
+
+        #----------------------------------------------------------------------
+        elif tech_type == 'transfer':
+            capacity_col = add_var(tech_name, 'capacity', 1, fixed_cost)
+            dispatch_cols = add_var(tech_name, 'dispatch', num_time_periods, var_cost)
+            dispatch_le_capacity(tech_name, 'dispatch_le_capacity',
+                                 dispatch_cols, capacity_col[0], 1.0)
+            add_to_node(node_to, dispatch_cols, 1.0)
+            add_to_node(node_from, dispatch_cols, -1.0 / efficiency)
+
+        #----------------------------------------------------------------------
+        elif tech_type == 'transmission':
+            capacity_col = add_var(tech_name, 'capacity', 1, fixed_cost)
+            dispatch_cols = add_var(tech_name, 'dispatch', num_time_periods, var_cost)
+            dispatch_reverse_cols = add_var(tech_name, 'dispatch_reverse', num_time_periods, var_cost)
+            dispatch_le_capacity(tech_name, 'dispatch_le_capacity',
+                                 dispatch_cols, capacity_col[0], 1.0)
+            dispatch_le_capacity(tech_name, 'dispatch_reverse_le_capacity',
+                                 dispatch_reverse_cols, capacity_col[0], 1.0)
+            add_to_node(node_to, dispatch_cols, 1.0)
+            add_to_node(node_from, dispatch_cols, -1.0 / efficiency)
+            add_to_node(node_from, dispatch_reverse_cols, 1.0)
+            add_to_node(node_to, dispatch_reverse_cols, -1.0 / efficiency)
+
+    #%%======================================================================
+    # Node balances: sum of flows into node == demand withdrawn from node
+
+    node_list = list(node_terms)
+    for node in node_list:
+        rows = []; cols = []; vals = []
+        for term_cols, term_coef in node_terms[node]:
+            rows.append(time_index)
+            cols.append(term_cols)
+            vals.append(term_coef)
+        if len(rows) == 0:
+            rows = [np.zeros(0, dtype = int)]; cols = [np.zeros(0, dtype = int)]; vals = [np.zeros(0)]
+        add_eq((node, 'balance'), rows, cols, vals, node_demand[node])
+
+    #%%======================================================================
+    # Assemble matrices
+
+    def to_csr(rows_list, cols_list, vals_list, num_rows):
+        if num_rows == 0:
+            return sps.csr_matrix((0, num_cols[0]))
+        return sps.coo_matrix((np.concatenate(vals_list),
+                               (np.concatenate(rows_list), np.concatenate(cols_list))),
+                              shape = (num_rows, num_cols[0])).tocsr()
+
+    lp_dic = {}
+    lp_dic['c'] = np.concatenate(c_list)
+    lp_dic['A_ub'] = to_csr(ub_rows, ub_cols, ub_vals, num_ub_rows[0])
+    lp_dic['b_ub'] = np.concatenate(b_ub_list) if b_ub_list else np.zeros(0)
+    lp_dic['A_eq'] = to_csr(eq_rows, eq_cols, eq_vals, num_eq_rows[0])
+    lp_dic['b_eq'] = np.concatenate(b_eq_list) if b_eq_list else np.zeros(0)
+    lp_dic['lower_bound'] = np.concatenate(lower_bound_list)
+    lp_dic['upper_bound'] = np.concatenate(upper_bound_list)
+
+    # capacities given in the input are fixed through their bounds
+    for tech_dic in tech_list:
+        if 'capacity' in tech_dic and (tech_dic['tech_name'], 'capacity') in var_map:
+            offset, size = var_map[(tech_dic['tech_name'], 'capacity')]
+            lp_dic['lower_bound'][offset] = tech_dic['capacity']
+            lp_dic['upper_bound'][offset] = tech_dic['capacity']
+    lp_dic['var_map'] = var_map
+    lp_dic['ub_map'] = ub_map
+    lp_dic['eq_map'] = eq_map
+    lp_dic['node_list'] = node_list
+
+    return lp_dic
+
+#%%
+
+def linprog_options(case_dic):
+    # linprog method and options from <solver_options>, translated as for HIGHS.
+    highs_options = translate_solver_options('HIGHS', parse_solver_options(case_dic['solver_options']))['highs_options']
+    method = highs_options.pop('solver', 'choose')
+    if not method in linprog_methods:
+        raise ValueError('model_backend sparse: method ' + str(method) + ' is not one of ' + ', '.join(linprog_methods))
+    options = {}
+    ignored_list = []
+    for key, value in highs_options.items():
+        if key == 'presolve':
+            options['presolve'] = value != 'off'
+        elif key in linprog_option_names:
+            options[key] = value
+        else:
+            ignored_list.append(key)
+    if len(ignored_list) > 0:
+        print ('    model_backend sparse: solver options ' + ', '.join(ignored_list) +
+               ' are not taken by scipy.optimize.linprog and are ignored')
+    return linprog_methods[method], options
+
+def solve_sparse_lp(lp_dic, method = 'highs', options = None):
+    # Solve the assembled linear program with the HiGHS solver in scipy.
+
+    if lp_dic['A_ub'].shape[0] > 0:
+        A_ub = lp_dic['A_ub']
+        b_ub = lp_dic['b_ub']
+    else:
+        A_ub = None
+        b_ub = None
+
+    result = linprog(lp_dic['c'],
+                     A_ub = A_ub, b_ub = b_ub,
+                     A_eq = lp_dic['A_eq'], b_eq = lp_dic['b_eq'],
+                     bounds = np.column_stack((lp_dic['lower_bound'], lp_dic['upper_bound'])),
+                     method = method,
+                     options = options)
+    return result
+
+#%%
+
+def extract_sparse_output(case_dic, lp_dic, result):
+    # Map the linprog solution back into the structures produced by
+    # Extract_Cvxpy_Output.extract_cvxpy_output.
+
+    num_time_periods = case_dic['num_time_periods']
+    var_map = lp_dic['var_map']
+
+    # names used for dispatch variables in Core_Model.py
+    dispatch_suffix = {'dispatch':'', 'dispatch_in':' in', 'dispatch_reverse':' reverse'}
+
+    prob = {}
+    if result.status == 0:
+        prob['status'] = 'optimal'
+    else:
+        prob['status'] = result.message
+
+    capacity_dic = {}
+    dispatch_dic = {}
+    node_price = {}
+
+    if result.x is not None:
+        x = result.x
+        for (tech_name, var_kind), (offset, size) in var_map.items():
+            if var_kind == 'capacity':
+                capacity_dic[tech_name] = x[offset]
+            elif var_kind in dispatch_suffix:
+                dispatch_dic[tech_name + dispatch_suffix[var_kind] + ' dispatch'] = x[offset:offset + size]
+
+        # The marginal of a node balance row is the change in total cost per
+        # unit of additional demand at that node, i.e., the price.
+        marginals = result.eqlin.marginals
+        for node in lp_dic['node_list']:
+            offset, size = lp_dic['eq_map'][(node, 'balance')]
+            node_price[node] = marginals[offset:offset + size]
+
+        prob['value'] = result.fun
+        prob['avg_cost'] = prob['value']/num_time_periods
+    else:
+        prob['value'] = np.nan
+        prob['avg_cost'] = np.nan
+
+    prob['node_price'] = node_price
+
+    return prob, capacity_dic, dispatch_dic
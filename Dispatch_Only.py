@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+
+Dispatch_Only.py
+
+Dispatch of a fleet with given capacities, e.g., a fleet optimized in an
+earlier run simulated again with another weather year or demand series.
+
+With <dispatch_only>, core_model builds the dispatch problem only: capacities
+enter the problem as numbers (or parameters), not as variables (see
+capacity_decision in Core_Model.py). The fixed costs of the capacities are
+still included in the total system cost, so results have the same form and
+meaning as those of a normal run.
+
+The capacity of each technology with a capacity decision is taken from:
+
+    -- its <capacity> in the TECH_DATA section, if given
+    -- otherwise, the results file <capacity_file> of an earlier run (any
+       format written by Save_Basic_Results.py)
+
+Without storage, nothing links one time step to the next, so the problem
+splits into independent subproblems of <dispatch_block_length> time steps
+(1 for each hour on its own, 24 for days), which are solved in parallel
+processes. Each process solves a contiguous run of blocks with one
+parameterized model (see Core_Model.py), so its model is compiled once (twice
+if the last block is shorter). With storage, the whole time series is solved
+as one problem, or in windows with <rolling_horizon> (see Rolling_Horizon.py).
+
+Keywords in the CASE_DATA section of the case input file:
+
+    dispatch_only           -- True to optimize dispatch only (default False)
+    capacity_file           -- results file to take capacities from (default none)
+    dispatch_block_length   -- time steps per subproblem without storage
+                               (default 24); 0 for a single problem
+    dispatch_workers        -- number of parallel processes (default 0 = one
+                               per CPU); 1 to solve subproblems in this process
+
+The results are stitched together into the <prob_dic>, <capacity_dic>,
+<dispatch_dic> form returned by extract_cvxpy_output. As capacities are not
+constraints of the problem, there are no capacity shadow values.
+The cvxpy model is used whatever the <model_backend>.
+
+"""
+
+#%%
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from Core_Model import core_model, capacity_tech_types
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Rolling_Horizon import rolling_horizon_dispatch
+from Save_Basic_Results import read_results_file
+
+#%% Capacities
+
+def load_fixed_capacities(case_dic, tech_list):
+    # Set <capacity> of each tech with a capacity decision and no capacity in
+    # the input, from <capacity_file>.
+
+    if case_dic['capacity_file'] != '':
+        case_df, tech_df, stats_df, time_df = read_results_file(case_dic['capacity_file'])
+        file_capacity_dic = results_file_capacities(tech_df)
+    else:
+        file_capacity_dic = {}
+
+    for tech_dic in tech_list:
+        if tech_dic['tech_type'] in capacity_tech_types and not 'capacity' in tech_dic:
+            if not tech_dic['tech_name'] in file_capacity_dic:
+                raise ValueError('dispatch_only requires capacity for technology ' + tech_dic['tech_name'])
+            tech_dic['capacity'] = file_capacity_dic[tech_dic['tech_name']]
+
+def results_file_capacities(tech_df):
+    # {tech_name: capacity} from the tech table of a results file, in which the
+    # capacity of each tech is in column '<tech_name> capacity' of its row.
+    capacity_dic = {}
+    for index, row in tech_df.iterrows():
+        key = str(row['tech_name']) + ' capacity'
+        if key in tech_df.columns and not pd.isnull(row[key]):
+            capacity_dic[row['tech_name']] = max(float(row[key]), 0.0) # without solver round-off below zero
+    return capacity_dic
+
+#%% Dispatch
+
+def dispatch_only_model(case_dic, tech_list):
+
+    num_time_periods = case_dic['num_time_periods']
+    block_length = case_dic['dispatch_block_length']
+    has_storage = any(tech_dic['tech_type'] == 'storage' for tech_dic in tech_list)
+
+    if has_storage and case_dic['rolling_horizon']:
+        return rolling_horizon_dispatch(case_dic, tech_list)
+    if has_storage or block_length == 0 or block_length >= num_time_periods or 'time_weights' in case_dic:
+        constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+        return extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                        cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+
+    # independent blocks, split into one contiguous run of blocks per process
+    num_blocks = (num_time_periods + block_length - 1) // block_length
+    workers = case_dic['dispatch_workers']
+    if workers == 0:
+        workers = os.cpu_count()
+    workers = min(workers, num_blocks)
+    chunk_list = []
+    for block_array in np.array_split(np.arange(num_blocks), workers):
+        chunk_start = block_array[0] * block_length
+        chunk_end = min((block_array[-1] + 1) * block_length, num_time_periods)
+        chunk_case_dic = dict(case_dic)
+        chunk_case_dic['num_time_periods'] = chunk_end - chunk_start
+        chunk_list.append((chunk_case_dic, slice_series(tech_list, chunk_start, chunk_end)))
+
+    if case_dic['verbose']:
+        print ('    dispatch only: ' + str(num_blocks) + ' subproblems of ' + str(block_length) +
+               ' time steps, ' + str(workers) + ' processes')
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            chunk_result_list = list(executor.map(solve_blocks, *zip(*chunk_list)))
+    else:
+        chunk_result_list = [solve_blocks(*chunk_list[0])]
+    result_list = [result for chunk_result in chunk_result_list for result in chunk_result]
+
+    # stitch the blocks together
+    prob_dic_list = [result[0] for result in result_list]
+    dispatch_dic = {}
+    for key in result_list[0][2]:
+        dispatch_dic[key] = np.concatenate([result[2][key] for result in result_list])
+    node_price = {}
+    for node in prob_dic_list[0]['node_price']:
+        node_price[node] = np.concatenate([block_prob_dic['node_price'][node] for block_prob_dic in prob_dic_list])
+    capacity_dic = result_list[0][1]
+
+    prob_dic = {}
+    non_optimal_list = [block_prob_dic['status'] for block_prob_dic in prob_dic_list if block_prob_dic['status'] != 'optimal']
+    if len(non_optimal_list) > 0:
+        prob_dic['status'] = non_optimal_list[0]
+    else:
+        prob_dic['status'] = 'optimal'
+    # each block includes the fixed costs of its own time steps
+    prob_dic['value'] = sum(block_prob_dic['value'] for block_prob_dic in prob_dic_list)
+    prob_dic['avg_cost'] = prob_dic['value'] / num_time_periods
+    prob_dic['solver_name'] = prob_dic_list[0]['solver_name']
+    prob_dic['solver_version'] = prob_dic_list[0]['solver_version']
+    for key in ['solve_time','compilation_time','num_iterations']:
+        prob_dic[key] = sum(block_prob_dic[key] for block_prob_dic in prob_dic_list)
+    prob_dic['warm_start'] = case_dic['warm_start']
+    prob_dic['num_blocks'] = num_blocks
+    prob_dic['node_price'] = node_price
+
+    if case_dic['verbose']:
+        print ('    ' + str(num_blocks) + ' subproblems solved, total solve time ' + '%.3f' % prob_dic['solve_time'] + ' s')
+
+    return prob_dic, capacity_dic, dispatch_dic
+
+def solve_blocks(case_dic, tech_list):
+    # Solve the time steps of <case_dic> in consecutive blocks of
+    # <dispatch_block_length>, returning the results of each block.
+    block_length = case_dic['dispatch_block_length']
+    block_case_dic = dict(case_dic)
+    block_case_dic['parameterized'] = True
+    block_case_dic['verbose'] = False
+
+    result_list = []
+    for block_start in range(0, case_dic['num_time_periods'], block_length):
+        block_end = min(block_start + block_length, case_dic['num_time_periods'])
+        block_case_dic['num_time_periods'] = block_end - block_start
+        block_tech_list = slice_series(tech_list, block_start, block_end)
+        constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(block_case_dic, block_tech_list)
+        result_list.append(extract_cvxpy_output(block_case_dic,block_tech_list,constraint_dic,
+                        cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic))
+    return result_list
+
+def slice_series(tech_list, start, end):
+    # Copy of <tech_list> with series of time steps <start> to <end> - 1 only.
+    slice_tech_list = []
+    for tech_dic in tech_list:
+        slice_tech_dic = dict(tech_dic)
+        if 'series' in tech_dic:
+            slice_tech_dic['series'] = np.asarray(tech_dic['series'])[start:end]
+        slice_tech_list.append(slice_tech_dic)
+    return slice_tech_list
@@ -13,16 +13,22 @@ save basic results for the simple energy model
 
 
 import cvxpy
+import time
 import utilities
+from Solver_Interface import get_solver_version
+from Core_Model import group_columns, tech_dual_value, node_balance_key
+from Profiling import add_profile_time
 import numpy as np
 
        
 #%%
 # save scalar results for all cases
-def extract_cvxpy_output(case_dic,tech_list,constraint_list, 
+def extract_cvxpy_output(case_dic,tech_list,constraint_dic, 
                         cvxpy_constraints,cvxpy_prob,
                         cvxpy_capacity_dic,cvxpy_dispatch_dic):
         
+    start_time = time.perf_counter()
+
     # conert everything to numpy arrays
     numerics_scaling = case_dic['numerics_scaling']
     num_time_periods = case_dic['num_time_periods']
@@ -35,26 +41,74 @@ def extract_cvxpy_output(case_dic,tech_list,constraint_list,
     capacity_dic = {}
     dispatch_dic = {}
 
+    # decisions are variables, or columns of the variables of a tech group;
+    # series given in the input (e.g., demand) are not. With <dispatch_only>,
+    # capacities are given in the input, as numbers or parameters.
     for item in cvxpy_capacity_dic:
         val = cvxpy_capacity_dic[item]
-        if type(val) ==  cvxpy.expressions.variable.Variable:
-            capacity_dic[item] = np.asscalar(cvxpy_capacity_dic[item].value)
+        if isinstance(val, cvxpy.Expression):
+            capacity_dic[item] = np.asarray(val.value).item()
+        else:
+            capacity_dic[item] = np.asarray(val).item()
        
     for item in cvxpy_dispatch_dic:
         val = cvxpy_dispatch_dic[item]
-        if type(val) ==  cvxpy.expressions.variable.Variable:
+        if isinstance(val, cvxpy.Expression) and len(val.variables()) > 0:
             dispatch_dic[item+' dispatch'] = cvxpy_dispatch_dic[item].value
     
     prob = {}
     prob['status'] = cvxpy_prob.status
     prob['value'] = cvxpy_prob.value / numerics_scaling
-    prob['avg_cost'] = prob['value']/num_time_periods
+    if 'time_weights' in case_dic: # representative periods
+        prob['avg_cost'] = prob['value']/np.sum(case_dic['time_weights'])
+    else:
+        prob['avg_cost'] = prob['value']/num_time_periods
+    
+    # record which solver was used and how long it took
+    solver_stats = cvxpy_prob.solver_stats
+    prob['solver_name'] = solver_stats.solver_name
+    prob['solver_version'] = get_solver_version(solver_stats.solver_name)
+    if solver_stats.solve_time is None:
+        prob['solve_time'] = np.nan
+    else:
+        prob['solve_time'] = solver_stats.solve_time
+    prob['compilation_time'] = cvxpy_prob.compilation_time
+    if solver_stats.num_iters is None:
+        prob['num_iterations'] = np.nan
+    else:
+        prob['num_iterations'] = solver_stats.num_iters
+    prob['warm_start'] = case_dic['warm_start']
     
     # get electricity price at each node by taking dual value of node balance equation
+    # (column n of the node balance is node n of node_list, see Network.py)
+    node_balance_dual = constraint_dic[node_balance_key].dual_value
     node_price = {}
-    for node in node_list:
-        idx = constraint_list.index(node + ' balance')
-        node_price[node] = -cvxpy_prob.constraints[idx].dual_value / numerics_scaling
+    for n, node in enumerate(node_list):
+        node_price[node] = -node_balance_dual[:, n] / numerics_scaling
+        if 'time_weights' in case_dic: # dual value is for all time steps represented
+            node_price[node] = node_price[node] / case_dic['time_weights']
     prob['node_price'] = node_price
+
+    # value of one more unit of energy stored at each time step, from the storage balance
+    group_column_dic = group_columns(tech_list)
+    storage_value = {}
+    for tech_dic in tech_list:
+        tech_name = tech_dic['tech_name']
+        dual_value = tech_dual_value(constraint_dic, group_column_dic, tech_name, 'storage_balance')
+        if dual_value is not None:
+            storage_value[tech_name] = dual_value / numerics_scaling
+    if len(storage_value) > 0:
+        prob['storage_value'] = storage_value
+
+    # change in total cost per unit change of a capacity given in the input
+    capacity_shadow_value = {}
+    for tech_name in cvxpy_capacity_dic:
+        dual_value = tech_dual_value(constraint_dic, group_column_dic, tech_name, 'capacity_eq_fixed')
+        if dual_value is not None:
+            capacity_shadow_value[tech_name] = -dual_value.item() / numerics_scaling
+    if len(capacity_shadow_value) > 0:
+        prob['capacity_shadow_value'] = capacity_shadow_value
+
+    add_profile_time('extract', 'cvxpy', time.perf_counter() - start_time)
     
     return prob,capacity_dic,dispatch_dic
\ No newline at end of file
@@ -16,9 +16,15 @@
 
 from Preprocess_Input import preprocess_input
 
-from Core_Model import core_model
-from Extract_Cvxpy_Output import extract_cvxpy_output
 from Save_Basic_Results import save_basic_results
+from Parameter_Sweep import run_parameter_sweep
+from Run_Case import prepare_time_steps, solve_case
+from Result_Cache import result_cache_key, load_cached_result, store_cached_result, result_cache_report
+from Compiled_Cache import compiled_cache_report
+from Profiling import save_profile, profile_report
+from Network import check_topology
+from Dispatch_Only import load_fixed_capacities
+from Problem_File import write_problem_file
 import sys
 
 from shutil import copy2
@@ -41,6 +47,15 @@ else:
 print ('Macro_Energy_Model: Pre-processing input')
 case_dic,tech_list = preprocess_input(case_input_path_filename)
 
+# report disconnected parts of the network (see Network.py)
+island_list = check_topology(tech_list)
+
+if case_dic['time_step_hours'] > 1:
+    print ('Macro_Energy_Model: Resampling time series into time steps of ' + str(case_dic['time_step_hours']) + ' hours')
+if case_dic['num_representative_periods'] > 0:
+    print ('Macro_Energy_Model: Aggregating time series into representative periods')
+case_dic,tech_list = prepare_time_steps(case_dic, tech_list)
+
 # -----------------------------------------------------------------------------
 
 # copy the input data file to the output folder
@@ -57,16 +72,55 @@ except:
 
 # -----------------------------------------------------------------------------
 
-print ('Macro_Energy_Model: Executing core model')
-#global_results_dic, decision_dic_list = core_model (case_dic, tech_list)
-constraint_list,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic    = core_model (case_dic, tech_list)
+# capacities of the fleet to dispatch (see Dispatch_Only.py)
+if case_dic['dispatch_only']:
+    load_fixed_capacities(case_dic, tech_list)
+
+if case_dic['problem_file'] != '':
+    # problem for a solver outside MEM (see Problem_File.py)
+    print ('Macro_Energy_Model: Writing problem file')
+    write_problem_file(case_dic, tech_list, output_folder + '/' + case_dic['problem_file'])
+    if case_dic['solution_file'] == '':
+        print ('Macro_Energy_Model: Problem written to ' + output_folder + '/' + case_dic['problem_file'] +
+               '; give its solution as <solution_file> to save the results')
+        sys.exit(0)
+
+if len(case_dic['sweep_values']) > 0:
+    # sweep one technology value over several cases, re-using the compiled model
+    print ('Macro_Energy_Model: Executing parameter sweep')
+    sweep_summary_list = run_parameter_sweep(case_dic, tech_list)
+
+else:
+    print ('Macro_Energy_Model: Executing core model')
+    cache_key = None
+    cached_result = None
+    if case_dic['result_cache']:
+        cache_key = result_cache_key(case_dic, tech_list)
+        cached_result = load_cached_result(case_dic, cache_key)
+    if cached_result is not None:
+        # identical case solved before (see Result_Cache.py)
+        cvxpy_constraints = None
+        prob_dic,capacity_dic,dispatch_dic = cached_result
+    else:
+        # the model the case asks for, as in Batch_Runner.py (see Run_Case.py)
+        cvxpy_constraints,prob_dic,capacity_dic,dispatch_dic = solve_case (case_dic, tech_list)
+    if cache_key is not None:
+        if cached_result is None:
+            store_cached_result(case_dic, cache_key, prob_dic, capacity_dic, dispatch_dic)
+        print ('Macro_Energy_Model: ' + result_cache_report())
+    
+    print ('Simple_Energy_Model: Saving basic results')
+    # Note that results for individual cases are output from core_model_loop
+    case,tech,time = save_basic_results(case_dic, tech_list, cvxpy_constraints,prob_dic,capacity_dic,dispatch_dic)
 
-# constraints,prob,capacity_dic,dispatch_dic = extract_cvxpy_output(cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic )
-prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_list,
-                cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic )
+if case_dic['compiled_cache']:
+    print ('Macro_Energy_Model: ' + compiled_cache_report())
 
-print ('Simple_Energy_Model: Saving basic results')
-# Note that results for individual cases are output from core_model_loop
-case,tech,time = save_basic_results(case_dic, tech_list, cvxpy_constraints,prob_dic,capacity_dic,dispatch_dic)
+if case_dic['profile']:
+    # time of each stage, problem size and peak memory (see Profiling.py)
+    print ('Macro_Energy_Model: Saving profile')
+    save_profile(case_dic)
+    if case_dic['verbose']:
+        print (profile_report())
 
  
\ No newline at end of file
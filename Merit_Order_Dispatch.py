@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+
+Merit_Order_Dispatch.py
+
+Fast dispatch simulation for screening many capacity portfolios, without
+building or solving an optimization problem.
+
+Given the capacity of each technology with a capacity decision (in the order
+of capacity_techs), merit_order_dispatch simulates the dispatch of every time
+step with numpy, for a whole batch of portfolios at once:
+
+    -- fixed_generator output and demand give the net load of each time step
+    -- generators with a var_cost below that of storage serve the net load
+       first, in var_cost (merit) order
+    -- storage follows a greedy rule: it charges from any surplus and
+       discharges into any deficit, within its charging rate and state
+       of charge, in the order of tech_list
+    -- the remaining generators serve what is left, in merit order
+    -- lost_load serves any demand still unmet; a surplus goes to curtailment
+
+Everything except storage is computed for all time steps and portfolios at
+once; storage steps through time, for all portfolios at once. Without
+<energy_stored_initial>, storage is run through the time series twice, and
+the second pass, which starts from the energy stored at the end of the first,
+is kept (an approximation of the cyclic storage of Core_Model.py).
+
+Each island of the network (see Network.py) is simulated as a single node
+("copper plate"): transfer and transmission move energy freely within their
+island, without limits or losses, and only their fixed costs are counted.
+Storage does not charge from generators. Without storage and within a single
+node, merit order is the least-cost dispatch, and the system cost matches
+core_model with the same capacities; otherwise it is an approximation
+(see Benchmarks/Validate_Merit_Order_Dispatch.py).
+
+merit_order_dispatch returns a dictionary of arrays with one element (or row)
+per portfolio:
+
+    system_cost     -- fixed_cost + variable_cost
+    fixed_cost      -- capacity times fixed cost, over all time steps
+    variable_cost   -- var_cost times dispatch, incl. lost_load and curtailment
+    curtailment     -- energy curtailed (surplus of fixed_generator output)
+    lost_load       -- demand not met
+    storage_cycles  -- {tech_name: energy discharged / capacity}
+    dispatch        -- {'<tech_name> dispatch': (portfolio x time) dispatch},
+                       with <keep_dispatch> only; keys as in the dispatch_dic
+                       of extract_cvxpy_output (storage charging under
+                       '<tech_name> in dispatch')
+
+Demand that is not met where no lost_load is available makes the problem of
+core_model infeasible; the system cost of such a portfolio is inf.
+Representative periods and <time_step_hours> (<time_weights>) are not
+supported.
+
+"""
+
+#%%
+
+import numpy as np
+
+from Core_Model import capacity_tech_types
+from Network import find_islands
+
+#%% Capacities
+
+def capacity_techs(tech_list):
+    # Names of the techs with a capacity decision, in the order of the columns
+    # of the capacity array of merit_order_dispatch.
+    return [tech_dic['tech_name'] for tech_dic in tech_list if tech_dic['tech_type'] in capacity_tech_types]
+
+def input_capacities(tech_list):
+    # (1 x number of capacity techs) array of the <capacity> given in tech_list
+    capacity_list = []
+    for tech_dic in tech_list:
+        if tech_dic['tech_type'] in capacity_tech_types:
+            if not 'capacity' in tech_dic:
+                raise ValueError('merit order dispatch requires capacity for technology ' + tech_dic['tech_name'])
+            capacity_list.append(float(tech_dic['capacity']))
+    return np.array([capacity_list])
+
+#%% Dispatch
+
+def merit_order_dispatch(case_dic, tech_list, capacity_array = None, keep_dispatch = False):
+    # Simulate the dispatch of each row of <capacity_array>, a (portfolio x
+    # capacity tech) array of capacities (default: the capacities of tech_list).
+
+    if 'time_weights' in case_dic:
+        raise ValueError('merit order dispatch requires hourly time steps, not representative periods or time_step_hours')
+
+    num_time_periods = case_dic['num_time_periods']
+    name_list = capacity_techs(tech_list)
+    if capacity_array is None:
+        capacity_array = input_capacities(tech_list)
+    capacity_array = np.atleast_2d(np.asarray(capacity_array, dtype = float))
+    if capacity_array.shape[1] != len(name_list):
+        raise ValueError('capacity array has ' + str(capacity_array.shape[1]) + ' columns, but there are ' +
+                         str(len(name_list)) + ' techs with a capacity decision')
+    num_portfolios = capacity_array.shape[0]
+    capacity_dic = {tech_name:capacity_array[:, k] for k, tech_name in enumerate(name_list)}
+
+    result_dic = {'fixed_cost':np.zeros(num_portfolios), 'variable_cost':np.zeros(num_portfolios),
+                  'curtailment':np.zeros(num_portfolios), 'lost_load':np.zeros(num_portfolios),
+                  'storage_cycles':{}}
+    if keep_dispatch:
+        result_dic['dispatch'] = {}
+
+    for tech_dic in tech_list:
+        if tech_dic['tech_name'] in capacity_dic:
+            result_dic['fixed_cost'] += capacity_dic[tech_dic['tech_name']] * tech_dic.get('fixed_cost', 0.0) * num_time_periods
+
+    for island in find_islands(tech_list):
+        island_tech_list = [tech_dic for tech_dic in tech_list
+                            if tech_dic.get('node_to') in island or tech_dic.get('node_from') in island]
+        dispatch_island(num_time_periods, island_tech_list, capacity_dic, result_dic)
+
+    result_dic['system_cost'] = result_dic['fixed_cost'] + result_dic['variable_cost']
+    return result_dic
+
+def dispatch_island(num_time_periods, tech_list, capacity_dic, result_dic):
+    # Simulate one island as a single node, adding its costs and totals to
+    # <result_dic>. Arrays are (time x portfolio), so that the time steps of
+    # storage are contiguous rows.
+
+    num_portfolios = len(result_dic['fixed_cost'])
+    dispatch_dic = result_dic.get('dispatch')
+    tech_type_dic = {}
+    for tech_dic in tech_list:
+        tech_type_dic.setdefault(tech_dic['tech_type'], []).append(tech_dic)
+
+    # net load: demand minus fixed_generator output
+    net_load = np.zeros((num_time_periods, num_portfolios))
+    for tech_dic in tech_type_dic.get('demand', []):
+        net_load += series_column(tech_dic, num_time_periods)
+        keep(dispatch_dic, tech_dic['tech_name'], np.broadcast_to(series_column(tech_dic, num_time_periods), net_load.shape))
+    for tech_dic in tech_type_dic.get('fixed_generator', []):
+        dispatch = series_column(tech_dic, num_time_periods) * capacity_dic[tech_dic['tech_name']]
+        net_load -= dispatch
+        keep(dispatch_dic, tech_dic['tech_name'], dispatch)
+    deficit = np.maximum(net_load, 0.0)
+    surplus = np.maximum(-net_load, 0.0)
+
+    # generators in merit order, split around the cheapest storage
+    storage_list = tech_type_dic.get('storage', [])
+    storage_var_cost = min([tech_dic.get('var_cost', 0.0) for tech_dic in storage_list], default = np.inf)
+    generator_list = sorted(tech_type_dic.get('generator', []), key = lambda tech_dic: tech_dic['var_cost'])
+    for tech_dic in generator_list:
+        if tech_dic['var_cost'] < storage_var_cost:
+            deficit = dispatch_generator(tech_dic, capacity_dic, deficit, result_dic)
+    if len(storage_list) > 0:
+        deficit, surplus = dispatch_storage(storage_list, capacity_dic, deficit, surplus, result_dic)
+    for tech_dic in generator_list:
+        if tech_dic['var_cost'] >= storage_var_cost:
+            deficit = dispatch_generator(tech_dic, capacity_dic, deficit, result_dic)
+
+    # backstops: the cheapest lost_load and curtailment of the island
+    unmet = deficit.sum(axis = 0)
+    result_dic['lost_load'] += unmet
+    lost_load_list = sorted(tech_type_dic.get('lost_load', []), key = lambda tech_dic: tech_dic['var_cost'])
+    if len(lost_load_list) > 0:
+        result_dic['variable_cost'] += unmet * lost_load_list[0]['var_cost']
+        keep(dispatch_dic, lost_load_list[0]['tech_name'], deficit)
+    else:
+        result_dic['variable_cost'][unmet > 0] = np.inf
+
+    curtailed = surplus.sum(axis = 0)
+    result_dic['curtailment'] += curtailed
+    curtailment_list = sorted(tech_type_dic.get('curtailment', []), key = lambda tech_dic: tech_dic.get('var_cost', 0.0))
+    if len(curtailment_list) > 0:
+        result_dic['variable_cost'] += curtailed * curtailment_list[0].get('var_cost', 0.0)
+        keep(dispatch_dic, curtailment_list[0]['tech_name'], surplus)
+
+def dispatch_generator(tech_dic, capacity_dic, deficit, result_dic):
+    # Serve as much of <deficit> as the generator can; returns what is left.
+    available = series_column(tech_dic, deficit.shape[0]) * capacity_dic[tech_dic['tech_name']]
+    dispatch = np.minimum(deficit, available)
+    result_dic['variable_cost'] += dispatch.sum(axis = 0) * tech_dic['var_cost']
+    keep(result_dic.get('dispatch'), tech_dic['tech_name'], dispatch)
+    return deficit - dispatch
+
+def dispatch_storage(storage_list, capacity_dic, deficit, surplus, result_dic):
+    # Greedy storage: charge from <surplus>, discharge into <deficit>, one time
+    # step at a time for all portfolios. Returns what is left of both.
+
+    num_time_periods, num_portfolios = deficit.shape
+    num_storage = len(storage_list)
+    capacity = np.array([capacity_dic[tech_dic['tech_name']] for tech_dic in storage_list])
+    # charging and discharging rate, without limit if there is no charging_time
+    rate = np.array([capacity[k] / tech_dic['charging_time'] if 'charging_time' in tech_dic
+                     else np.full(num_portfolios, np.inf) for k, tech_dic in enumerate(storage_list)])
+    efficiency = [tech_dic.get('efficiency', 1.0) for tech_dic in storage_list]
+    retention = [1.0 - tech_dic.get('decay_rate', 0.0) for tech_dic in storage_list]
+
+    if all('energy_stored_initial' in tech_dic for tech_dic in storage_list):
+        energy_stored = np.array([np.full(num_portfolios, float(tech_dic['energy_stored_initial'])) for tech_dic in storage_list])
+        num_passes = 1
+    else:
+        energy_stored = np.zeros((num_storage, num_portfolios))
+        num_passes = 2
+
+    dispatch_in = np.zeros((num_storage, num_time_periods, num_portfolios))
+    dispatch = np.zeros((num_storage, num_time_periods, num_portfolios))
+    for pass_number in range(num_passes):
+        surplus_left = surplus.copy()
+        deficit_left = deficit.copy()
+        for t in range(num_time_periods):
+            for k in range(num_storage):
+                energy_kept = energy_stored[k] * retention[k]
+                charge = np.minimum(np.minimum(surplus_left[t], rate[k]), (capacity[k] - energy_kept) / efficiency[k])
+                np.maximum(charge, 0.0, out = charge)
+                discharge = np.minimum(np.minimum(deficit_left[t], rate[k]), energy_kept)
+                energy_stored[k] = energy_kept + efficiency[k] * charge - discharge
+                surplus_left[t] -= charge
+                deficit_left[t] -= discharge
+                dispatch_in[k, t] = charge
+                dispatch[k, t] = discharge
+
+    for k, tech_dic in enumerate(storage_list):
+        discharged = dispatch[k].sum(axis = 0)
+        result_dic['variable_cost'] += discharged * tech_dic.get('var_cost', 0.0)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            result_dic['storage_cycles'][tech_dic['tech_name']] = np.where(capacity[k] > 0, discharged / capacity[k], 0.0)
+        keep(result_dic.get('dispatch'), tech_dic['tech_name'], dispatch[k])
+        keep(result_dic.get('dispatch'), tech_dic['tech_name'] + ' in', dispatch_in[k])
+    return deficit_left, surplus_left
+
+#%% Utilities
+
+def series_column(tech_dic, num_time_periods):
+    # (time x 1) series of <tech_dic>, or ones without a series
+    if 'series' in tech_dic:
+        return np.asarray(tech_dic['series'], dtype = float)[:num_time_periods, np.newaxis]
+    return np.ones((num_time_periods, 1))
+
+def keep(dispatch_dic, tech_name, dispatch):
+    # Keep the (time x portfolio) <dispatch> as (portfolio x time) if dispatch is kept.
+    if dispatch_dic is not None:
+        dispatch_dic[tech_name + ' dispatch'] = np.array(dispatch.T)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+
+Network.py
+
+Nodes of a case, sparse incidence matrices between nodes and flows, and a
+check of the topology of the network.
+
+Nodes are numbered in the order of utilities.get_nodes, which is also the
+order of the columns of the node balance constraint built by Core_Model.py,
+so that the price at node n is column n of its dual value.
+
+An incidence matrix is a sparse (number of nodes x number of flows) 0/1
+matrix, with a 1 in column j at the node of flow j. For flows held as the
+columns of a (time x number of flows) matrix, flow @ incidence.T is the total
+flow at each node, as a (time x number of nodes) matrix.
+
+Transfer and transmission techs link their <node_from> and <node_to>; storage
+with a <node_from> other than its <node_to> also moves energy between nodes.
+Nodes linked by such techs, directly or through other nodes, are in the same
+island. A network of more than one island is valid (e.g., regions modelled
+together only to share costs), but is often a mistake in the input, so
+check_topology reports it, with any island that has demand but no source of
+energy (no generator or lost_load), for which the problem is infeasible.
+
+"""
+
+#%%
+
+import numpy as np
+import scipy.sparse as sps
+from scipy.sparse.csgraph import connected_components
+
+import utilities
+
+# tech_type values whose dispatch moves energy between two nodes
+link_tech_types = ['transfer','transmission','storage']
+
+# tech_type values that can supply energy to a node
+source_tech_types = ['lost_load','generator','fixed_generator']
+
+#%%
+
+def node_index(tech_list):
+    # {node: index of node} in the order of utilities.get_nodes
+    return {node:i for i, node in enumerate(utilities.get_nodes(tech_list))}
+
+def incidence_matrix(flow_node_list, node_index_dic):
+    # Sparse 0/1 matrix (number of nodes x number of flows) with a 1 at the
+    # node of each flow; <flow_node_list> holds the node of each flow.
+    num_flows = len(flow_node_list)
+    return sps.csr_matrix((np.ones(num_flows), ([node_index_dic[node] for node in flow_node_list], np.arange(num_flows))),
+                          shape = (len(node_index_dic), num_flows))
+
+#%% Topology
+
+def link_list(tech_list):
+    # [(node_from, node_to)] of every tech that moves energy between two nodes
+    return [(tech_dic['node_from'], tech_dic['node_to']) for tech_dic in tech_list
+            if tech_dic['tech_type'] in link_tech_types
+            and 'node_from' in tech_dic and 'node_to' in tech_dic
+            and tech_dic['node_from'] != tech_dic['node_to']]
+
+def find_islands(tech_list):
+    # List of islands, each a list of nodes, largest island first.
+    node_index_dic = node_index(tech_list)
+    node_list = list(node_index_dic)
+    links = link_list(tech_list)
+    adjacency = sps.csr_matrix((np.ones(len(links)),
+                                ([node_index_dic[node_from] for node_from, node_to in links],
+                                 [node_index_dic[node_to] for node_from, node_to in links])),
+                               shape = (len(node_list), len(node_list)))
+    num_islands, island_of_node = connected_components(adjacency, directed = False)
+    island_dic = {}
+    for node, island in zip(node_list, island_of_node):
+        island_dic.setdefault(island, []).append(node)
+    return sorted(island_dic.values(), key = len, reverse = True)
+
+def check_topology(tech_list):
+    # Report islands of the network, and islands with demand but no source of
+    # energy. Returns the list of islands (see find_islands).
+    island_list = find_islands(tech_list)
+    if len(island_list) > 1:
+        print ('    network has ' + str(len(island_list)) + ' disconnected islands:')
+        for island in island_list:
+            print ('        ' + ', '.join(island))
+
+    source_node_set = set(tech_dic['node_to'] for tech_dic in tech_list
+                          if tech_dic['tech_type'] in source_tech_types and 'node_to' in tech_dic)
+    demand_node_set = set(tech_dic['node_from'] for tech_dic in tech_list
+                          if tech_dic['tech_type'] == 'demand' and 'node_from' in tech_dic)
+    for island in island_list:
+        if demand_node_set.intersection(island) and not source_node_set.intersection(island):
+            print ('    warning: demand but no generator or lost_load in island ' + ', '.join(island))
+    return island_list
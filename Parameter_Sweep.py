@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+
+Parameter_Sweep.py
+
+Run a sequence of cases that differ only in one numeric value of one technology,
+for example the fixed cost of one generator.
+
+The sweep is defined in the CASE_DATA section of the case input file:
+
+    sweep_tech_name,node_2_natgas
+    sweep_keyword,fixed_cost
+    sweep_values,0.01 0.02 0.03 0.04
+
+The model is built once with cvxpy Parameters (case_dic['parameterized'] = True),
+so cvxpy compiles the problem for the first case only; each following case only
+sets new parameter values and re-solves.
+
+With <warm_start> True, each case starts from the solution of the case before
+(see Solver_Interface.py). Warm starts help most when neighbouring cases are
+similar, so with <sweep_order> set to 'nearest' the values are run in
+nearest-neighbour order (increasing order for a single keyword) instead of the
+order given (<sweep_order> 'input', the default). The number of solver
+iterations and the solve time of each case are in the summary, so runs with and
+without warm start can be compared (see Benchmarks/Benchmark_Warm_Start.py).
+
+One set of results is saved per case, with the sweep keyword and value appended
+to <case_name>, and a summary with timing of each case is saved as
+<case_name>_sweep_summary.csv in the output folder.
+
+With <result_cache>, cases solved before are taken from the result cache
+(see Result_Cache.py) instead of being solved again.
+
+"""
+
+#%%
+
+import os
+import csv
+import time
+import numpy as np
+import utilities
+
+from Core_Model import core_model
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Save_Basic_Results import save_basic_results
+from Result_Cache import result_cache_key, load_cached_result, store_cached_result, result_cache_report
+
+#%%
+
+def run_parameter_sweep(case_dic, tech_list):
+
+    sweep_tech_name = case_dic['sweep_tech_name']
+    sweep_keyword = case_dic['sweep_keyword']
+    sweep_values = [float(value) for value in case_dic['sweep_values'].split()]
+    if case_dic['sweep_order'] == 'nearest':
+        sweep_values = [sweep_values[i] for i in utilities.nearest_neighbour_order(sweep_values)]
+    elif case_dic['sweep_order'] != 'input':
+        raise ValueError('sweep_order must be input or nearest, not ' + case_dic['sweep_order'])
+
+    # copies, so that <case_dic> and <tech_list> are not changed by the sweep
+    sweep_case_dic = dict(case_dic)
+    sweep_case_dic['parameterized'] = True
+    sweep_tech_list = [dict(tech_dic) for tech_dic in tech_list]
+
+    sweep_tech_dic_list = [tech_dic for tech_dic in sweep_tech_list if tech_dic['tech_name'] == sweep_tech_name]
+    if len(sweep_tech_dic_list) != 1:
+        raise ValueError('sweep_tech_name ' + sweep_tech_name + ' does not name exactly one technology')
+    sweep_tech_dic = sweep_tech_dic_list[0]
+
+    summary_list = []
+    for value in sweep_values:
+
+        sweep_tech_dic[sweep_keyword] = value
+        sweep_case_dic['case_name'] = case_dic['case_name'] + '_' + sweep_keyword + '_' + str(value)
+        if case_dic['verbose']:
+            print ('Parameter_Sweep: ' + sweep_case_dic['case_name'])
+
+        cached_result = None
+        if case_dic['result_cache']:
+            cache_key = result_cache_key(sweep_case_dic, sweep_tech_list)
+            cached_result = load_cached_result(sweep_case_dic, cache_key)
+
+        start_time = time.time()
+        if cached_result is not None:
+            cvxpy_constraints = None
+            prob_dic,capacity_dic,dispatch_dic = cached_result
+            model_time = time.time() - start_time
+        else:
+            constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(sweep_case_dic, sweep_tech_list)
+            model_time = time.time() - start_time
+
+            prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(sweep_case_dic,sweep_tech_list,constraint_dic,
+                            cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+            if case_dic['result_cache']:
+                store_cached_result(sweep_case_dic, cache_key, prob_dic, capacity_dic, dispatch_dic)
+        save_basic_results(sweep_case_dic, sweep_tech_list, cvxpy_constraints,prob_dic,capacity_dic,dispatch_dic)
+
+        summary_dic = {}
+        summary_dic['case_name'] = sweep_case_dic['case_name']
+        summary_dic[sweep_keyword] = value
+        summary_dic['status'] = prob_dic['status']
+        summary_dic['value'] = prob_dic['value']
+        summary_dic['model_time'] = model_time
+        summary_dic['compilation_time'] = prob_dic['compilation_time']
+        summary_dic['solve_time'] = prob_dic['solve_time']
+        summary_dic['num_iterations'] = prob_dic['num_iterations']
+        summary_dic['warm_start'] = prob_dic['warm_start']
+        summary_list.append(summary_dic)
+
+    save_sweep_summary(case_dic, summary_list)
+
+    if case_dic['verbose'] and len(summary_list) > 1:
+        first_time = summary_list[0]['model_time']
+        later_time = np.mean([summary_dic['model_time'] for summary_dic in summary_list[1:]])
+        print ('Parameter_Sweep: first case ' + '%.3f' % first_time + ' s (includes compilation), ' +
+               'later cases ' + '%.3f' % later_time + ' s on average, ' +
+               '%.1f' % (first_time / later_time) + ' times faster')
+    if case_dic['verbose'] and case_dic['result_cache']:
+        print ('Parameter_Sweep: ' + result_cache_report())
+
+    return summary_list
+
+#%%
+
+def save_sweep_summary(case_dic, summary_list):
+
+    output_folder = case_dic['output_path'] + '/' + case_dic['case_name']
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    output_file_path_name = output_folder + '/' + case_dic['case_name'] + '_sweep_summary.csv'
+    with open(output_file_path_name, 'w', newline='') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames = list(summary_list[0]))
+        writer.writeheader()
+        writer.writerows(summary_list)
+
+    if case_dic['verbose']:
+        print ('file written: ' + output_file_path_name)
@@ -17,44 +17,67 @@ It generates a result containing <case_dic> and <case_dic_list>
 
 '''
 
+import os
 import csv
 import numpy as np
+import pandas as pd
 import utilities
 import datetime
+import time
+from Profiling import reset_profile, profile_stage, add_profile_time
 
 
                                                
 #%% 
 
-def preprocess_input(case_input_path_filename):
+def preprocess_input(case_input_path_filename, override_list = None):
     # This is the highest level function that reads in the case input file
     # and generated <case_dic_list> from this input.
+    #
+    # <override_list> is an optional list of (tech_name, keyword, value) that
+    # replace values of the case input file, with value as text (as in the file)
+    # and tech_name '' for a keyword of the CASE_DATA section (see Batch_Runner.py).
+    
+    reset_profile() # profile of this run (see Profiling.py)
+    profile_start_time = time.perf_counter()
         
     # -----------------------------------------------------------------------------
     # Recognized keywords in case_input.csv file
     
-    keywords_logical = ['verbose']
+    keywords_logical = ['verbose','parameterized','rolling_horizon','benders','series_cache',
+                        'excel_summary','result_cache','warm_start','profile','dispatch_only',
+                        'compiled_cache','solver_fallback']
     
     keywords_str = ['case_name','data_path','output_path',
                     'tech_name','tech_type','node_to','node_from',
                     'series_file',
-                    'time_start','time_end','notes']
+                    'time_start','time_end','notes',
+                    'model_backend','solver','solver_options',
+                    'sweep_tech_name','sweep_keyword','sweep_values',
+                    'output_format','sweep_order','tech_group','capacity_file',
+                    'problem_file','solution_file']
 
     keywords_int = ['year_start','month_start','day_start','hour_start',
-                    'year_end','month_end','day_end','hour_end']
+                    'year_end','month_end','day_end','hour_end',
+                    'num_representative_periods','period_length','time_step_hours',
+                    'window_length','look_ahead',
+                    'benders_block_length','benders_max_iterations','benders_workers',
+                    'dispatch_block_length','dispatch_workers',
+                    'series_start']
     
-    keywords_real = ['numerics_scaling','fixed_cost','var_cost','charging_time'
-                     'efficiency','decay_rate']
+    keywords_real = ['numerics_scaling','fixed_cost','var_cost','charging_time',
+                     'efficiency','decay_rate','capacity','energy_stored_initial',
+                     'benders_tolerance','result_cache_size','compiled_cache_size']
             
     tech_keywords = {}
-    tech_keywords['demand'] = ['tech_name','tech_type','node_from','series_file']
-    tech_keywords['curtailment'] = ['tech_name','tech_type','node_from','var_cost']
-    tech_keywords['lost_load'] = ['tech_name','tech_type','node_to','var_cost']
-    tech_keywords['generator'] = ['tech_name','tech_type','node_to','series_file','fixed_cost','var_cost']
-    tech_keywords['fixed_generator'] = ['tech_name','tech_type','node_to','series_file','fixed_cost']
-    tech_keywords['transfer'] = ['tech_name','tech_type','node_to','node_from','fixed_cost','var_cost','efficiency']
-    tech_keywords['transmission'] = ['tech_name','tech_type','node_to','node_from','fixed_cost','var_cost','efficiency']
-    tech_keywords['storage'] = ['tech_name','tech_type','node_to','node_from','fixed_cost','var_cost','efficiency','charging_time','decay_rate']
+    tech_keywords['demand'] = ['tech_name','tech_type','node_from','series_file','series_start','tech_group']
+    tech_keywords['curtailment'] = ['tech_name','tech_type','node_from','var_cost','tech_group']
+    tech_keywords['lost_load'] = ['tech_name','tech_type','node_to','var_cost','tech_group']
+    tech_keywords['generator'] = ['tech_name','tech_type','node_to','series_file','series_start','fixed_cost','var_cost','capacity','tech_group']
+    tech_keywords['fixed_generator'] = ['tech_name','tech_type','node_to','series_file','series_start','fixed_cost','capacity','tech_group']
+    tech_keywords['transfer'] = ['tech_name','tech_type','node_to','node_from','fixed_cost','var_cost','efficiency','capacity','tech_group']
+    tech_keywords['transmission'] = ['tech_name','tech_type','node_to','node_from','fixed_cost','var_cost','efficiency','capacity','tech_group']
+    tech_keywords['storage'] = ['tech_name','tech_type','node_to','node_from','fixed_cost','var_cost','efficiency','charging_time','decay_rate','capacity','energy_stored_initial','tech_group']
     
                                               
 #%% 
@@ -63,6 +86,8 @@ def preprocess_input(case_input_path_filename):
     # <import_case_input> reads in the file from the csv file, but does not parse
     # this data.
     case_data,tech_data = import_case_input(case_input_path_filename)
+    if override_list is not None:
+        apply_overrides(case_data, tech_data, override_list)
 
     # -----------------------------------------------------------------------------
     # the basic logic here is that if a keyword appears in the 'global'
@@ -90,6 +115,76 @@ def preprocess_input(case_input_path_filename):
         case_dic['verbose'] = True
     if not 'numerics_scaling' in case_dic:
         case_dic['numerics_scaling'] = 1.
+    if not 'model_backend' in case_dic:
+        case_dic['model_backend'] = 'cvxpy' # 'cvxpy' (Core_Model.py) or 'sparse' (Core_Model_Sparse.py)
+    if not 'solver' in case_dic:
+        case_dic['solver'] = 'GUROBI' # see Solver_Interface.py for fallback if not installed
+    if not 'solver_fallback' in case_dic:
+        case_dic['solver_fallback'] = True # True to try other installed solvers if the solver fails
+    if not 'solver_options' in case_dic:
+        case_dic['solver_options'] = '' # e.g., threads=4; presolve=1; tolerance=1e-7
+    if not 'parameterized' in case_dic:
+        case_dic['parameterized'] = False # True to build model with cvxpy Parameters (see Core_Model.py)
+    if not 'num_representative_periods' in case_dic:
+        case_dic['num_representative_periods'] = 0 # 0 for full time resolution (see Time_Aggregation.py)
+    if not 'period_length' in case_dic:
+        case_dic['period_length'] = 24
+    if not 'time_step_hours' in case_dic:
+        case_dic['time_step_hours'] = 1 # hours per time step of the model (see resample_time_steps in Time_Aggregation.py)
+    if not 'sweep_values' in case_dic:
+        case_dic['sweep_values'] = '' # values separated by spaces (see Parameter_Sweep.py)
+    if not 'sweep_order' in case_dic:
+        case_dic['sweep_order'] = 'input' # 'input' or 'nearest' (see Parameter_Sweep.py)
+    if not 'profile' in case_dic:
+        case_dic['profile'] = False # True to save a profile of the run (see Profiling.py)
+    if not 'warm_start' in case_dic:
+        case_dic['warm_start'] = False # True to start each solve from the previous solution (see Solver_Interface.py)
+    if not 'rolling_horizon' in case_dic:
+        case_dic['rolling_horizon'] = False # True for dispatch with fixed capacities (see Rolling_Horizon.py)
+    if not 'window_length' in case_dic:
+        case_dic['window_length'] = 168
+    if not 'look_ahead' in case_dic:
+        case_dic['look_ahead'] = 24
+    if not 'dispatch_only' in case_dic:
+        case_dic['dispatch_only'] = False # True to optimize dispatch with capacities given (see Dispatch_Only.py)
+    if not 'capacity_file' in case_dic:
+        case_dic['capacity_file'] = '' # results file to take capacities from
+    if not 'dispatch_block_length' in case_dic:
+        case_dic['dispatch_block_length'] = 24 # time steps per subproblem without storage; 0 for one problem
+    if not 'dispatch_workers' in case_dic:
+        case_dic['dispatch_workers'] = 0 # 0 for one process per CPU
+    if not 'problem_file' in case_dic:
+        case_dic['problem_file'] = '' # .lp or .mps file to write for an outside solver (see Problem_File.py)
+    if not 'solution_file' in case_dic:
+        case_dic['solution_file'] = '' # solution to read instead of solving
+    if not 'output_format' in case_dic:
+        case_dic['output_format'] = 'npz' # 'npz', 'parquet', 'hdf5' or 'xlsx' (see Save_Basic_Results.py)
+    if not case_dic['output_format'] in ['npz', 'parquet', 'hdf5', 'xlsx']:
+        raise ValueError('output_format must be npz, parquet, hdf5 or xlsx, not ' + case_dic['output_format'])
+    if not 'excel_summary' in case_dic:
+        case_dic['excel_summary'] = True # case and tech tables also as a small Excel file
+    if not 'series_cache' in case_dic:
+        case_dic['series_cache'] = True # keep parsed series files as <series_file>.cache.npz
+    if not 'benders' in case_dic:
+        case_dic['benders'] = False # True for Benders decomposition (see Benders_Decomposition.py)
+    if not 'benders_block_length' in case_dic:
+        case_dic['benders_block_length'] = 8760 # 0 for a single subproblem
+    if not 'benders_tolerance' in case_dic:
+        case_dic['benders_tolerance'] = 1.e-4
+    if not 'benders_max_iterations' in case_dic:
+        case_dic['benders_max_iterations'] = 100
+    if not 'benders_workers' in case_dic:
+        case_dic['benders_workers'] = 0 # 0 for one process per subproblem
+    if not 'result_cache' in case_dic:
+        case_dic['result_cache'] = False # True to re-use results of identical cases (see Result_Cache.py)
+    if not 'result_cache_size' in case_dic:
+        case_dic['result_cache_size'] = 1000. # MB
+    if not 'compiled_cache' in case_dic:
+        case_dic['compiled_cache'] = False # True to keep compiled problems on disk (see Compiled_Cache.py)
+    if not 'compiled_cache_size' in case_dic:
+        case_dic['compiled_cache_size'] = 1000. # MB
+    if case_dic['compiled_cache']:
+        case_dic['parameterized'] = True # only parameterized problems can be reused with new values
         
     verbose = case_dic['verbose']     
     
@@ -140,23 +235,12 @@ def preprocess_input(case_input_path_filename):
     #%% 
     # Now add the time series to tech_list
     
-    for tech_dic in tech_list:
-        if 'series_file' in tech_dic:
-            
-            series = read_csv_dated_data_file(
-                    case_dic['year_start'],
-                    case_dic['month_start'],
-                    case_dic['day_start'],
-                    case_dic['hour_start'],
-                    case_dic['year_end'],
-                    case_dic['month_end'],
-                    case_dic['day_end'],
-                    case_dic['hour_end'],
-                    case_dic['data_path'],
-                    tech_dic['series_file']
-                    )
-
-            tech_dic['series'] = series
+    load_tech_series(case_dic, tech_list)
+    if case_dic['verbose']:
+        print ('    ' + str(series_store_stats['num_series']) + ' series from ' +
+               str(series_store_stats['num_loaded']) + ' series files, ' +
+               str(series_store_stats['bytes_loaded']) + ' bytes loaded for ' +
+               str(series_store_stats['bytes_referenced']) + ' bytes of series')
 
     #%%
         
@@ -164,11 +248,33 @@ def preprocess_input(case_input_path_filename):
     if case_dic['verbose']:
         print ('    end time = ',end_time)
         print ('    elapsed time = ',end_time - start_time)
+    add_profile_time('preprocess', 'total', time.perf_counter() - profile_start_time)
 
     return case_dic,tech_list
 
 #%%
 
+def apply_overrides(case_data, tech_data, override_list):
+    # Replace values in <case_data> and <tech_data> as read by import_case_input,
+    # so that overridden values are parsed like values in the case input file.
+    tech_keys = tech_data[0]
+    idx_tech_name = tech_keys.index('tech_name')
+    for tech_name, keyword, value in override_list:
+        if tech_name == '':
+            case_data.append([keyword, value]) # later entries replace earlier ones
+        else:
+            if not keyword in tech_keys:
+                tech_keys.append(keyword)
+                for data_row in tech_data[1:]:
+                    data_row += [''] * (len(tech_keys) - len(data_row))
+            idx_key = tech_keys.index(keyword)
+            data_rows = [data_row for data_row in tech_data[1:] if data_row[idx_tech_name] == tech_name]
+            if len(data_rows) != 1:
+                raise ValueError('override of ' + keyword + ': tech_name ' + tech_name + ' does not name exactly one technology')
+            data_rows[0][idx_key] = value
+
+#%%
+
 def import_case_input(case_input_path_filename):
     # Import case_input.csv file from local directory.
     # return 2 objects: param_list, and case_list
@@ -208,9 +314,59 @@ def import_case_input(case_input_path_filename):
 
 #%% 
 
+# Statistics of the series store of the last call of load_tech_series:
+#     num_series       -- number of techs with a series
+#     num_loaded       -- number of (series file, date window) pairs read
+#     bytes_loaded     -- bytes of series read
+#     bytes_referenced -- bytes of series held by all techs together
+series_store_stats = {}
+
+def load_tech_series(case_dic, tech_list):
+    # Set tech_dic['series'] for each tech with a series_file.
+    # Each (series file, date window) pair is read once into the series store;
+    # techs using the same series file get read-only views of the same array.
+    # Returns the series store.
+    #
+    # Series files are csv files (see read_csv_dated_data_file) or numpy files
+    # (.npy or .npz, see read_npy_dated_data_file). For a .npy file holding only
+    # values, <series_start> (yyyymmddhh of its first value) is taken from the
+    # tech, or else from CASE_DATA.
+    
+    date_window = (case_dic['year_start'], case_dic['month_start'], case_dic['day_start'], case_dic['hour_start'],
+                   case_dic['year_end'], case_dic['month_end'], case_dic['day_end'], case_dic['hour_end'])
+    
+    series_store = {}
+    num_series = 0
+    bytes_referenced = 0
+    for tech_dic in tech_list:
+        if 'series_file' in tech_dic:
+            series_start = tech_dic.get('series_start', case_dic.get('series_start'))
+            key = (case_dic['data_path'], tech_dic['series_file'], series_start, date_window)
+            if not key in series_store:
+                with profile_stage('series_load', tech_dic['series_file']):
+                    if os.path.splitext(tech_dic['series_file'])[1] in ['.npy', '.npz']:
+                        series = read_npy_dated_data_file(*date_window, case_dic['data_path'], tech_dic['series_file'],
+                                                          series_start)
+                    else:
+                        series = read_csv_dated_data_file(*date_window, case_dic['data_path'], tech_dic['series_file'],
+                                                          case_dic['series_cache'])
+                series.setflags(write = False)
+                series_store[key] = series
+            tech_dic['series'] = series_store[key].view()
+            num_series += 1
+            bytes_referenced += tech_dic['series'].nbytes
+    
+    series_store_stats.clear()
+    series_store_stats['num_series'] = num_series
+    series_store_stats['num_loaded'] = len(series_store)
+    series_store_stats['bytes_loaded'] = sum(series.nbytes for series in series_store.values())
+    series_store_stats['bytes_referenced'] = bytes_referenced
+    
+    return series_store
+
 def read_csv_dated_data_file(start_year,start_month,start_day,start_hour,
                              end_year,end_month,end_day,end_hour,
-                             data_path, data_filename):
+                             data_path, data_filename, use_cache = True):
     
     # turn dates into yyyymmddhh format for comparison.
     # Assumes all datasets are on the same time step and are not missing any data.
@@ -219,38 +375,136 @@ def read_csv_dated_data_file(start_year,start_month,start_day,start_hour,
       
     path_filename = data_path + '/' + data_filename
     
-    data = []
+    hour_num, values = load_dated_data_file(path_filename, use_cache)
+    
+    return select_dated_series(hour_num, values, start_hour, end_hour)
+
+def load_dated_data_file(path_filename, use_cache = True):
+    # Returns the yyyymmddhh key and the value of each data line of a dated csv file.
+    #
+    # The lines after 'BEGIN_DATA' and the header line are parsed at once with pandas.
+    # Blank lines are skipped and data end at the first line that is not
+    # year,month,day,hour,value.
+    #
+    # If <use_cache>, the arrays are saved next to the file as <path_filename>.cache.npz
+    # together with the size and modification time of the file, and read from there
+    # as long as the file is unchanged.
+    
+    cache_path_filename = path_filename + '.cache.npz'
+    file_stat = os.stat(path_filename)
+    if use_cache and os.path.exists(cache_path_filename):
+        try:
+            with np.load(cache_path_filename) as cache:
+                if cache['source_size'] == file_stat.st_size and cache['source_mtime'] == file_stat.st_mtime:
+                    return cache['hour_num'], cache['values']
+        except (OSError, ValueError, KeyError):
+            pass # unreadable cache is replaced below
+    
+    # read to keyword 'BEGIN_DATA' and then one more line (header line)
+    num_header_lines = 0
     with open(path_filename) as fin:
-        # read to keyword 'BEGIN_DATA' and then one more line (header line)
-        data_reader = csv.reader(fin)
-        
-        #Throw away all lines up to and include the line that has 'BEGIN_GLOBAL_DATA' in the first cell of the line
-        while True:
-            line = next(data_reader)
-            if line[0] == 'BEGIN_DATA':
-                break
-        # Now take the header row
-        line = next(data_reader)
-        
-        # Now take all non-blank lines
-        data = []
-        while True:
-            try:
-                line = next(data_reader)
-                if any(field.strip() for field in line):
-                    data.append([int(line[0]),int(line[1]),int(line[2]),int(line[3]),float(line[4])])
-                    # the above if clause was from: https://stackoverflow.com/questions/4521426/delete-blank-rows-from-csv
-            except:
+        for line in fin:
+            num_header_lines += 1
+            if line.split(',')[0].strip('"') == 'BEGIN_DATA':
                 break
-            
-    data_array = np.array(data) # make into a numpy object
+    num_header_lines += 1
+    
+    try:
+        # all fields numeric or empty
+        data_array = pd.read_csv(path_filename, skiprows = num_header_lines, header = None,
+                                 usecols = range(5), dtype = float).to_numpy()
+        data_array = data_array[~np.all(np.isnan(data_array), axis = 1)]
+    except ValueError:
+        # some field is not a number: data end at the line before it
+        data_frame = pd.read_csv(path_filename, skiprows = num_header_lines, header = None,
+                                 usecols = range(5), dtype = str)
+        blank_lines = (data_frame.fillna('').apply(lambda column: column.str.strip()) == '').all(axis = 1).to_numpy()
+        data_array = data_frame.apply(pd.to_numeric, errors = 'coerce').to_numpy(dtype = float)
+        data_array = data_array[~blank_lines]
+    bad_lines = np.flatnonzero(np.any(np.isnan(data_array), axis = 1))
+    if len(bad_lines) > 0:
+        data_array = data_array[:bad_lines[0]]
+    
+    date_array = data_array[:,:4].astype(np.int64)
+    hour_num = date_array[:,3] + 100 * (date_array[:,2] + 100 * (date_array[:,1] + 100* date_array[:,0]))
+    values = data_array[:,4]
     
-    hour_num = data_array[:,3] + 100 * (data_array[:,2] + 100 * (data_array[:,1] + 100* data_array[:,0]))   
+    if use_cache:
+        try:
+            np.savez(cache_path_filename, hour_num = hour_num, values = values,
+                     source_size = file_stat.st_size, source_mtime = file_stat.st_mtime)
+        except OSError:
+            pass # e.g., data directory is read-only
     
+    return hour_num, values
 
-    series = [item[1] for item in zip(hour_num,data_array[:,4]) if item[0]>= start_hour and item[0] <= end_hour]
+def read_npy_dated_data_file(start_year,start_month,start_day,start_hour,
+                             end_year,end_month,end_day,end_hour,
+                             data_path, data_filename, series_start = None):
+    # Read the date window of a numpy series file. Three forms are accepted:
+    #
+    #   .npy holding a structured array with fields 'hour_num' (yyyymmddhh) and
+    #       'value', as written by write_npy_dated_data_file
+    #   .npy holding only hourly values, with <series_start> the yyyymmddhh of
+    #       the first value (e.g., 1980010101 for the Shaner et al. files)
+    #   .npz holding arrays 'hour_num' and 'values'
+    #
+    # .npy files are opened with np.load(mmap_mode = 'r') and the returned series
+    # is a view of the file for the date window, so only the pages of the window
+    # are read from disk. Members of an .npz file cannot be memory mapped, so an
+    # .npz file is read whole.
+    
+    start_hour = start_hour + 100 * (start_day + 100 * (start_month + 100* start_year)) 
+    end_hour = end_hour + 100 * (end_day + 100 * (end_month + 100* end_year)) 
+    
+    path_filename = data_path + '/' + data_filename
+    
+    if path_filename.endswith('.npz'):
+        with np.load(path_filename) as data:
+            return select_dated_series(data['hour_num'], data['values'], start_hour, end_hour)
     
-    return np.array(series).flatten() # return flatten series
+    data = np.load(path_filename, mmap_mode = 'r')
+    if data.dtype.names is not None:
+        # hour_num is in time order (see write_npy_dated_data_file), so a binary
+        # search reads only a few pages of the file
+        first = np.searchsorted(data['hour_num'], start_hour, side = 'left')
+        last = np.searchsorted(data['hour_num'], end_hour, side = 'right')
+        return data['value'][first:last]
+    
+    if series_start is None:
+        raise ValueError('series_start is required for series file ' + data_filename +
+                         ', which has no hour_num field')
+    first = max(hours_between(series_start, start_hour), 0)
+    last = min(hours_between(series_start, end_hour) + 1, len(data))
+    return data[first:last]
+
+def write_npy_dated_data_file(path_filename, hour_num, values):
+    # Write a series with its yyyymmddhh keys as a structured .npy file,
+    # e.g., write_npy_dated_data_file(path_filename + '.npy', *load_dated_data_file(path_filename))
+    # to convert a csv series file.
+    if np.any(np.diff(hour_num) <= 0):
+        raise ValueError('hour_num of ' + path_filename + ' is not in time order')
+    data = np.empty(len(values), dtype = [('hour_num', np.int64), ('value', np.float64)])
+    data['hour_num'] = hour_num
+    data['value'] = values
+    np.save(path_filename, data)
+
+def hours_between(start_hour_num, end_hour_num):
+    # Number of hours from one yyyymmddhh to another (hours 1 to 24 of each day).
+    def to_datetime(hour_num):
+        date_num, hour = divmod(int(hour_num), 100)
+        return datetime.datetime.strptime(str(date_num), '%Y%m%d') + datetime.timedelta(hours = hour)
+    return int((to_datetime(end_hour_num) - to_datetime(start_hour_num)).total_seconds()) // 3600
+
+def select_dated_series(hour_num, values, start_hour, end_hour):
+    # Values with start_hour <= hour_num <= end_hour (yyyymmddhh).
+    # Data are normally in time order, so the range is found by binary search.
+    if np.all(hour_num[1:] > hour_num[:-1]):
+        first = np.searchsorted(hour_num, start_hour, side = 'left')
+        last = np.searchsorted(hour_num, end_hour, side = 'right')
+        return values[first:last].copy()
+    else:
+        return values[(hour_num >= start_hour) & (hour_num <= end_hour)]
 
                                                
 #%% 
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+
+Problem_File.py
+
+Write the linear program of a case to a standard LP or MPS file, to be solved
+outside MEM (e.g., on a dedicated solver machine), and read the solution of
+that solver back into the <prob_dic>, <capacity_dic>, <dispatch_dic> form
+returned by extract_cvxpy_output, so that save_basic_results runs as usual.
+
+The problem written is the one assembled by assemble_sparse_lp (see
+Core_Model_Sparse.py), the same linear program that core_model builds with
+cvxpy, with the same limits (no representative periods, energy_stored_initial
+or time_step_hours). Costs and prices are in their natural units, without
+<numerics_scaling>. Variables and constraints have stable names, made from
+the tech name (or node) and the kind of variable or constraint:
+
+    capacity(<tech_name>)
+    dispatch(<tech_name>,<t>)        also dispatch_in, dispatch_reverse and
+                                     energy_stored
+    <kind>(<tech_name>,<t>)          e.g., dispatch_le_capacity(natgas,12)
+    balance(<node>,<t>)              node balance; its dual value is the price
+
+where <t> is the time step, from 0. Characters of names that LP files do not
+allow (e.g., spaces) are replaced by '_'.
+
+Keywords in the CASE_DATA section of the case input file:
+
+    problem_file    -- name of the file to write in the output folder, ending
+                       in .lp or .mps; without <solution_file>, MEM stops after
+                       writing it
+    solution_file   -- solution of the problem, read instead of solving
+
+Solution files can be:
+
+    -- a HiGHS solution file (highs --solution_file, or Highs.writeSolution),
+       with primal and dual values
+    -- a Gurobi JSON solution file (ResultFile ending in .json, with
+       JSONSolDetail=1 for dual values)
+    -- any other file of '<name> <value>' lines (e.g., a Gurobi .sol file), with
+       primal values only; node prices are then nan
+
+"""
+
+#%%
+
+import re
+import json
+import numpy as np
+import scipy.sparse as sps
+from scipy.optimize import OptimizeResult
+
+from Core_Model_Sparse import assemble_sparse_lp, extract_sparse_output
+
+# characters allowed in names in LP files, besides letters, digits and '_'
+name_characters = '!"#$%&/,.;?@`\'{}|~'
+
+#%% Names
+
+def lp_name(kind, name, time_step = None):
+    # Name of a variable or constraint, e.g., dispatch(natgas,12)
+    name = re.sub('[^0-9A-Za-z_' + re.escape(name_characters) + ']', '_', str(name))
+    if time_step is None:
+        return kind + '(' + name + ')'
+    return kind + '(' + name + ',' + str(time_step) + ')'
+
+def variable_names(lp_dic):
+    # Name of each column of the problem
+    names = np.empty(len(lp_dic['c']), dtype = object)
+    for (tech_name, var_kind), (offset, size) in lp_dic['var_map'].items():
+        if var_kind == 'capacity':
+            names[offset] = lp_name(var_kind, tech_name)
+        else:
+            names[offset:offset + size] = [lp_name(var_kind, tech_name, t) for t in range(size)]
+    return check_unique(names)
+
+def constraint_names(row_map, num_rows):
+    # Name of each row of A_ub or A_eq, from <row_map> (ub_map or eq_map)
+    names = np.empty(num_rows, dtype = object)
+    for (name, kind), (offset, size) in row_map.items():
+        names[offset:offset + size] = [lp_name(kind, name, t) for t in range(size)]
+    return check_unique(names)
+
+def check_unique(names):
+    # Names that differ only in characters replaced by '_' are not allowed.
+    if len(set(names)) < len(names):
+        seen = set()
+        for name in names:
+            if name in seen:
+                raise ValueError('name ' + name + ' is not unique in the problem file; rename the tech or node')
+            seen.add(name)
+    return names
+
+#%% Writing
+
+def write_problem_file(case_dic, tech_list, path_filename):
+    # Write the problem of the case as an LP or MPS file, by the extension
+    # of <path_filename>.
+
+    lp_dic = assemble_sparse_lp(case_dic, tech_list)
+    if path_filename.lower().endswith('.lp'):
+        write_lp(lp_dic, path_filename)
+    elif path_filename.lower().endswith('.mps'):
+        write_mps(lp_dic, path_filename, case_dic['case_name'])
+    else:
+        raise ValueError('problem_file must end in .lp or .mps, not ' + path_filename)
+
+    if case_dic['verbose']:
+        print ('    problem of ' + str(len(lp_dic['c'])) + ' variables and ' +
+               str(lp_dic['A_ub'].shape[0] + lp_dic['A_eq'].shape[0]) + ' constraints written to ' + path_filename)
+
+def write_mps(lp_dic, path_filename, problem_name):
+    # Free format MPS file, column by column.
+
+    column_names = variable_names(lp_dic)
+    ub_names = constraint_names(lp_dic['ub_map'], lp_dic['A_ub'].shape[0])
+    eq_names = constraint_names(lp_dic['eq_map'], lp_dic['A_eq'].shape[0])
+    row_names = np.concatenate([ub_names, eq_names])
+    A = sps.vstack([lp_dic['A_ub'], lp_dic['A_eq']]).tocsc()
+    b = np.concatenate([lp_dic['b_ub'], lp_dic['b_eq']])
+    c = lp_dic['c']
+
+    with open(path_filename, 'w') as mps_file:
+        mps_file.write('NAME ' + re.sub(r'\s', '_', str(problem_name)) + '\n')
+        mps_file.write('ROWS\n N  cost\n')
+        for name in ub_names:
+            mps_file.write(' L  ' + name + '\n')
+        for name in eq_names:
+            mps_file.write(' E  ' + name + '\n')
+
+        mps_file.write('COLUMNS\n')
+        for j, column_name in enumerate(column_names):
+            if c[j] != 0:
+                mps_file.write('    ' + column_name + ' cost ' + '%.17g' % c[j] + '\n')
+            for index in range(A.indptr[j], A.indptr[j + 1]):
+                mps_file.write('    ' + column_name + ' ' + row_names[A.indices[index]] + ' ' + '%.17g' % A.data[index] + '\n')
+
+        mps_file.write('RHS\n')
+        for i in np.flatnonzero(b):
+            mps_file.write('    RHS ' + row_names[i] + ' ' + '%.17g' % b[i] + '\n')
+
+        mps_file.write('BOUNDS\n')
+        for bound_type, column_name, value in bounds(lp_dic, column_names):
+            mps_file.write(' ' + {'=':'FX', '>=':'LO', '<=':'UP', 'free':'FR'}[bound_type] + ' BND ' + column_name +
+                           ('' if bound_type == 'free' else ' ' + '%.17g' % value) + '\n')
+        mps_file.write('ENDATA\n')
+
+def write_lp(lp_dic, path_filename):
+    # CPLEX LP file, row by row.
+
+    column_names = variable_names(lp_dic)
+
+    with open(path_filename, 'w') as lp_file:
+        lp_file.write('Minimize\n cost:')
+        write_terms(lp_file, np.flatnonzero(lp_dic['c']), lp_dic['c'][np.flatnonzero(lp_dic['c'])], column_names)
+        lp_file.write('\nSubject To\n')
+        for A_key, b_key, map_key, sense in [('A_ub', 'b_ub', 'ub_map', '<='), ('A_eq', 'b_eq', 'eq_map', '=')]:
+            A = lp_dic[A_key].tocsr()
+            row_names = constraint_names(lp_dic[map_key], A.shape[0])
+            for i, row_name in enumerate(row_names):
+                lp_file.write(' ' + row_name + ':')
+                columns = A.indices[A.indptr[i]:A.indptr[i + 1]]
+                if len(columns) == 0:
+                    lp_file.write(' 0 ' + column_names[0]) # a row needs at least one term
+                write_terms(lp_file, columns, A.data[A.indptr[i]:A.indptr[i + 1]], column_names)
+                lp_file.write(' ' + sense + ' ' + '%.17g' % lp_dic[b_key][i] + '\n')
+
+        lp_file.write('Bounds\n')
+        for bound_type, column_name, value in bounds(lp_dic, column_names):
+            if bound_type == 'free':
+                lp_file.write(' ' + column_name + ' free\n')
+            else:
+                lp_file.write(' ' + column_name + ' ' + bound_type + ' ' + '%.17g' % value + '\n')
+        lp_file.write('End\n')
+
+def write_terms(lp_file, columns, values, column_names, terms_per_line = 4):
+    # '+ 2 x - 3 y ...', a few terms per line, as lines of LP files are limited
+    for k, (j, value) in enumerate(zip(columns, values)):
+        if k > 0 and k % terms_per_line == 0:
+            lp_file.write('\n   ')
+        lp_file.write((' + ' if value >= 0 else ' - ') + '%.17g' % abs(value) + ' ' + column_names[j])
+
+def bounds(lp_dic, column_names):
+    # (bound type, column name, value) of each bound other than the default
+    # 0 <= x < inf of LP and MPS files
+    bound_list = []
+    for j, (lower, upper) in enumerate(zip(lp_dic['lower_bound'], lp_dic['upper_bound'])):
+        if lower == upper:
+            bound_list.append(('=', column_names[j], lower))
+            continue
+        if lower == -np.inf and upper == np.inf:
+            bound_list.append(('free', column_names[j], None))
+            continue
+        if lower != 0:
+            bound_list.append(('>=', column_names[j], lower))
+        if upper != np.inf:
+            bound_list.append(('<=', column_names[j], upper))
+    return bound_list
+
+#%% Reading
+
+def read_solution_file(path_filename):
+    # Returns the status, {variable name: value} and {constraint name: dual
+    # value} of a solution file (the last is None without dual values).
+
+    if path_filename.lower().endswith('.json'):
+        with open(path_filename) as json_file:
+            solution = json.load(json_file)
+        status = solution.get('SolutionInfo', {}).get('Status', 2)
+        status = 'optimal' if status == 2 else 'gurobi status ' + str(status)
+        primal_dic = {var['VarName']:float(var['X']) for var in solution.get('Vars', [])}
+        dual_dic = {constr['ConstrName']:float(constr['Pi']) for constr in solution.get('Constrs', []) if 'Pi' in constr}
+        return status, primal_dic, (dual_dic if len(dual_dic) > 0 else None)
+
+    with open(path_filename) as solution_file:
+        line_list = [line.strip() for line in solution_file]
+
+    if len(line_list) > 0 and line_list[0] == 'Model status':
+        # HiGHS solution file: values of columns, then of rows, for the primal
+        # solution and then the dual solution
+        status = line_list[1].lower()
+        section_dic = {}
+        section = None
+        i = 2
+        while i < len(line_list):
+            line = line_list[i]
+            if line.startswith('# Primal solution values'):
+                section = 'primal'
+            elif line.startswith('# Dual solution values'):
+                section = 'dual'
+            elif line.startswith('# Basis'):
+                break
+            elif section is not None and (line.startswith('# Columns') or line.startswith('# Rows')):
+                count = int(line.split()[-1])
+                kind = 'columns' if line.startswith('# Columns') else 'rows'
+                section_dic[(section, kind)] = dict(name_value(row) for row in line_list[i + 1:i + 1 + count])
+                i += count
+            i += 1
+        return status, section_dic.get(('primal', 'columns'), {}), section_dic.get(('dual', 'rows'))
+
+    # '<name> <value>' lines, with comments starting with '#'
+    primal_dic = dict(name_value(line) for line in line_list if len(line) > 0 and not line.startswith('#'))
+    return 'optimal', primal_dic, None
+
+def name_value(line):
+    # (name, value) of a line '<name> <value>'
+    name, value = line.rsplit(None, 1)
+    return name, float(value)
+
+def import_solution(case_dic, tech_list, path_filename):
+    # Results of the case from the solution of its problem file.
+
+    lp_dic = assemble_sparse_lp(case_dic, tech_list)
+    status, primal_dic, dual_dic = read_solution_file(path_filename)
+
+    column_names = variable_names(lp_dic)
+    missing_list = [name for name in column_names if not name in primal_dic]
+    if len(missing_list) > 0:
+        raise ValueError('solution file ' + path_filename + ' has no value for ' + str(len(missing_list)) +
+                         ' variables of the problem, e.g., ' + missing_list[0])
+    x = np.array([primal_dic[name] for name in column_names])
+
+    eq_names = constraint_names(lp_dic['eq_map'], lp_dic['A_eq'].shape[0])
+    if dual_dic is None:
+        marginals = np.full(len(eq_names), np.nan)
+    else:
+        marginals = np.array([dual_dic.get(name, np.nan) for name in eq_names])
+
+    # in the form of the result of scipy.optimize.linprog
+    result = OptimizeResult(x = x, fun = float(lp_dic['c'] @ x), status = 0 if status == 'optimal' else 1,
+                            message = status, eqlin = OptimizeResult(marginals = marginals))
+    prob_dic, capacity_dic, dispatch_dic = extract_sparse_output(case_dic, lp_dic, result)
+    prob_dic['solver_name'] = 'solution file ' + path_filename
+    prob_dic['solver_version'] = ''
+    prob_dic['solve_time'] = np.nan
+
+    if case_dic['verbose']:
+        print ('    solution read from ' + path_filename + ': ' + status)
+
+    return prob_dic, capacity_dic, dispatch_dic
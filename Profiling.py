@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+
+Profiling.py
+
+Time spent in each stage of a run, size of the problem and peak memory use.
+
+Stages record their time with profile_stage (or add_profile_time) under a
+(stage, name) pair, e.g.,
+
+    ('preprocess', 'total')         -- reading the case input file and series
+    ('series_load', <series_file>)  -- reading one series file
+    ('build', <tech_type>)          -- building the model for all techs of one type
+    ('solve', 'total')              -- whole call to prob.solve, which includes:
+    ('compile', 'cvxpy')            --     cvxpy canonicalization (compilation_time)
+    ('solver', <solver>)            --     time reported by the solver
+    ('extract', 'cvxpy')            -- primal and dual values from the solved problem
+    ('save', <output_format>)       -- writing the results file
+
+Repeated stages (e.g., the cases of a parameter sweep) add up; their number is
+kept as <count>. The peak resident memory of the process so far is recorded
+at the end of each stage.
+
+Timing is always recorded; it costs little. With <profile> True in the
+CASE_DATA section, the problem size is also recorded (variables, constraints,
+and rows, columns and nonzeros of the matrix passed to the solver), and
+save_profile writes <case_name>_profile.json and <case_name>_profile.csv in
+the output folder, and adds one line per run to <output_path>/profile_history.csv
+so that runs can be compared over time.
+
+"""
+
+#%%
+
+import os
+import sys
+import csv
+import json
+import time
+import datetime
+import contextlib
+
+try:
+    import resource # not available on Windows
+except ImportError:
+    resource = None
+
+# profile_dic[(stage, name)] = {'count':, 'time':, 'peak_rss_mb':}
+profile_dic = {}
+
+# problem size of the last problem recorded
+problem_size_dic = {}
+
+# columns of profile_history.csv
+profile_history_fields = ['date','case_name','num_time_periods','peak_rss_mb',
+                          'num_variables','num_constraints','num_rows','num_columns','num_nonzeros',
+                          'preprocess_time','series_load_time','build_time','solve_time',
+                          'compile_time','solver_time','extract_time','save_time']
+
+#%%
+
+def reset_profile():
+    profile_dic.clear()
+    problem_size_dic.clear()
+
+@contextlib.contextmanager
+def profile_stage(stage, name = ''):
+    # with profile_stage('build', tech_type): ...
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_profile_time(stage, name, time.perf_counter() - start_time)
+
+def add_profile_time(stage, name, elapsed_time):
+    entry = profile_dic.setdefault((stage, name), {'count':0, 'time':0.0, 'peak_rss_mb':0.0})
+    entry['count'] += 1
+    entry['time'] += elapsed_time
+    entry['peak_rss_mb'] = max(entry['peak_rss_mb'], peak_rss_mb())
+
+def peak_rss_mb():
+    # Peak resident memory of this process in MB, or nan where not available.
+    if resource is None:
+        return float('nan')
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss / 1.e6 # bytes
+    return max_rss / 1.e3 # kilobytes
+
+#%%
+
+def record_problem_size(num_variables, num_constraints, num_rows, num_columns, num_nonzeros):
+    problem_size_dic['num_variables'] = int(num_variables)
+    problem_size_dic['num_constraints'] = int(num_constraints)
+    problem_size_dic['num_rows'] = int(num_rows)
+    problem_size_dic['num_columns'] = int(num_columns)
+    problem_size_dic['num_nonzeros'] = int(num_nonzeros)
+
+def record_cvxpy_problem_size(prob):
+    # Size of a solved cvxpy problem. The matrix passed to the solver comes from
+    # the compiled problem that cvxpy keeps after solving, so it is not compiled again.
+    num_variables = sum(variable.size for variable in prob.variables())
+    num_constraints = sum(constraint.size for constraint in prob.constraints)
+    data, chain, inverse_data = prob.get_problem_data(prob.solver_stats.solver_name)
+    matrix_list = [data[key] for key in ('A', 'F', 'G') if key in data and data[key] is not None]
+    record_problem_size(num_variables, num_constraints,
+                        sum(matrix.shape[0] for matrix in matrix_list), len(data['c']),
+                        sum(matrix.nnz for matrix in matrix_list))
+
+#%%
+
+def save_profile(case_dic):
+    # Write the profile of this run next to its results.
+
+    output_folder = case_dic['output_path'] + '/' + case_dic['case_name']
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    file_path_name = output_folder + '/' + case_dic['case_name'] + '_profile'
+
+    stage_list = [{'stage':stage, 'name':name, 'count':entry['count'], 'time':entry['time'],
+                   'peak_rss_mb':entry['peak_rss_mb']} for (stage, name), entry in profile_dic.items()]
+    profile = {'case_name':case_dic['case_name'],
+               'date':datetime.datetime.now().isoformat(timespec = 'seconds'),
+               'num_time_periods':case_dic['num_time_periods'],
+               'peak_rss_mb':peak_rss_mb(),
+               'problem_size':dict(problem_size_dic),
+               'stages':stage_list}
+
+    with open(file_path_name + '.json', 'w') as output_file:
+        json.dump(profile, output_file, indent = 1)
+
+    with open(file_path_name + '.csv', 'w', newline='') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames = ['stage','name','count','time','peak_rss_mb'])
+        writer.writeheader()
+        writer.writerows(stage_list)
+
+    # one line per run, with the time of each stage summed over names
+    history_dic = {'date':profile['date'], 'case_name':case_dic['case_name'],
+                   'num_time_periods':case_dic['num_time_periods'], 'peak_rss_mb':profile['peak_rss_mb']}
+    history_dic.update(problem_size_dic)
+    for stage_dic in stage_list:
+        history_dic[stage_dic['stage'] + '_time'] = history_dic.get(stage_dic['stage'] + '_time', 0.0) + stage_dic['time']
+    history_file_path_name = case_dic['output_path'] + '/profile_history.csv'
+    write_header = not os.path.exists(history_file_path_name)
+    with open(history_file_path_name, 'a', newline='') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames = profile_history_fields, extrasaction = 'ignore')
+        if write_header:
+            writer.writeheader()
+        writer.writerow(history_dic)
+
+    if case_dic['verbose']:
+        print ('file written: ' + file_path_name + '.json')
+
+def profile_report():
+    # Table of the stages, most time first.
+    line_list = ['%-12s %-40s %6s %10s %10s' % ('stage', 'name', 'count', 'time (s)', 'rss (MB)')]
+    for (stage, name), entry in sorted(profile_dic.items(), key = lambda item: -item[1]['time']):
+        line_list.append('%-12s %-40s %6d %10.3f %10.1f' % (stage, name[:40], entry['count'], entry['time'],
+                                                          entry['peak_rss_mb']))
+    return '\n'.join(line_list)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+
+Result_Cache.py
+
+Keep the results of solved cases, so that a case identical to one solved
+before is not built and solved again.
+
+Each result (prob_dic, capacity_dic, dispatch_dic) is stored in the folder
+<output_path>/result_cache under a key that is a hash of everything that
+determines the solution:
+
+    -- the CASE_DATA values, except those that only name or place the case or
+       its output (see <result_cache_ignored_case_keys>)
+    -- every tech dictionary, with the content of its series instead of the
+       name of its series file
+    -- the solver actually used, its version and the solver options
+
+So a case that only differs in <case_name>, or reads the same data from a
+renamed series file, finds the result of the earlier case.
+
+Keywords in the CASE_DATA section of the case input file:
+
+    result_cache        -- True to use the result cache (default False)
+    result_cache_size   -- maximum size of the cache in MB (default 1000); when
+                           it is exceeded, the least recently used results are
+                           removed
+
+The number of hits, misses, stored and removed results in this process is kept
+in <result_cache_stats> (see result_cache_report).
+
+"""
+
+#%%
+
+import os
+import glob
+import pickle
+import hashlib
+import numpy as np
+
+from Solver_Interface import select_solver, get_solver_version, parse_solver_options
+
+result_cache_folder_name = 'result_cache'
+
+# CASE_DATA keywords that do not change the solution
+result_cache_ignored_case_keys = ['case_name','data_path','output_path','verbose','notes',
+                                  'output_format','excel_summary','series_cache',
+                                  'result_cache','result_cache_size','parameterized',
+                                  'sweep_tech_name','sweep_keyword','sweep_values',
+                                  'benders_workers','warm_start','sweep_order',
+                                  'capacity_file','dispatch_workers','problem_file',
+                                  'compiled_cache','compiled_cache_size',
+                                  'solver','solver_options','solver_fallback']
+
+# tech keywords that do not change the solution (series are hashed by content)
+result_cache_ignored_tech_keys = ['series','series_file','notes']
+
+# Use of the cache in this process:
+#     hits, misses, stores, evictions -- number of each
+#     bytes_read, bytes_written       -- bytes of results read and written
+result_cache_stats = {'hits':0, 'misses':0, 'stores':0, 'evictions':0,
+                      'bytes_read':0, 'bytes_written':0}
+
+#%%
+
+def result_cache_key(case_dic, tech_list):
+    # Hash of everything in <case_dic> and <tech_list> that determines the solution.
+
+    hasher = hashlib.sha256()
+
+    solver = select_solver(case_dic['solver'])
+    update_hash(hasher, ['solver', solver, get_solver_version(solver),
+                         parse_solver_options(case_dic['solver_options'])])
+
+    update_hash(hasher, {key:case_dic[key] for key in case_dic if not key in result_cache_ignored_case_keys})
+
+    for tech_dic in tech_list:
+        update_hash(hasher, {key:tech_dic[key] for key in tech_dic if not key in result_cache_ignored_tech_keys})
+        if 'series' in tech_dic:
+            update_hash(hasher, np.asarray(tech_dic['series'], dtype = float))
+
+    return hasher.hexdigest()
+
+def update_hash(hasher, value):
+    # Add <value> to <hasher> in a form that does not depend on dictionary order
+    # or on the type of array holding the numbers.
+    if isinstance(value, dict):
+        hasher.update(b'{')
+        for key in sorted(value):
+            update_hash(hasher, key)
+            update_hash(hasher, value[key])
+        hasher.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b'[')
+        for item in value:
+            update_hash(hasher, item)
+        hasher.update(b']')
+    elif isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        hasher.update(('array ' + value.dtype.str + ' ' + str(value.shape) + ' ').encode())
+        hasher.update(value.tobytes())
+    else:
+        if isinstance(value, np.generic):
+            value = value.item()
+        hasher.update((type(value).__name__ + ' ' + repr(value) + ';').encode())
+
+#%%
+
+def result_cache_path(case_dic, key):
+    return case_dic['output_path'] + '/' + result_cache_folder_name + '/' + key + '.pkl'
+
+def load_cached_result(case_dic, key):
+    # Returns (prob_dic, capacity_dic, dispatch_dic) stored under <key>, or None.
+
+    path = result_cache_path(case_dic, key)
+    try:
+        with open(path, 'rb') as cache_file:
+            result = pickle.load(cache_file)
+        os.utime(path) # most recently used
+    except (OSError, EOFError, pickle.UnpicklingError):
+        result_cache_stats['misses'] += 1
+        return None
+
+    result_cache_stats['hits'] += 1
+    result_cache_stats['bytes_read'] += os.path.getsize(path)
+    if case_dic['verbose']:
+        print ('    result cache hit ' + key[:12])
+    return result
+
+def store_cached_result(case_dic, key, prob_dic, capacity_dic, dispatch_dic):
+    # Store a result under <key>, then remove least recently used results until
+    # the cache is no larger than <result_cache_size>.
+
+    if prob_dic['status'] != 'optimal':
+        return # not worth keeping, and may depend on the solver run
+
+    cache_folder = case_dic['output_path'] + '/' + result_cache_folder_name
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder, exist_ok = True)
+
+    # write to a file of this process, then rename, so that parallel runs never
+    # read a partly written result
+    path = result_cache_path(case_dic, key)
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'wb') as cache_file:
+        pickle.dump((prob_dic, capacity_dic, dispatch_dic), cache_file, protocol = pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    result_cache_stats['stores'] += 1
+    result_cache_stats['bytes_written'] += os.path.getsize(path)
+
+    result_cache_stats['evictions'] += evict_cached_results(cache_folder, case_dic['result_cache_size'] * 1.e6)
+
+def evict_cached_results(cache_folder, max_bytes):
+    # Remove the least recently used files while the cache is larger than
+    # <max_bytes>; returns the number of files removed.
+
+    file_list = []
+    for path in glob.glob(cache_folder + '/*.pkl'):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue # removed by another process
+        file_list.append((stat.st_mtime, stat.st_size, path))
+
+    num_removed = 0
+    total_bytes = sum(size for mtime, size, path in file_list)
+    for mtime, size, path in sorted(file_list):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            num_removed += 1
+        except OSError:
+            pass
+        total_bytes -= size
+    return num_removed
+
+def result_cache_report():
+    # One line summary of <result_cache_stats>.
+    num_lookups = result_cache_stats['hits'] + result_cache_stats['misses']
+    hit_rate = result_cache_stats['hits'] / num_lookups if num_lookups > 0 else 0.0
+    return ('result cache: ' + str(result_cache_stats['hits']) + ' hits, ' +
+            str(result_cache_stats['misses']) + ' misses (' + '%.0f' % (100 * hit_rate) + '% hit rate), ' +
+            str(result_cache_stats['stores']) + ' stored, ' + str(result_cache_stats['evictions']) + ' removed, ' +
+            str(result_cache_stats['bytes_read']) + ' bytes read, ' +
+            str(result_cache_stats['bytes_written']) + ' bytes written')
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+
+Rolling_Horizon.py
+
+Dispatch of a system with fixed capacities, solved as a sequence of
+overlapping windows instead of one problem over the whole time series.
+
+Each window covers <window_length> + <look_ahead> time steps. Only the first
+<window_length> time steps of each window are kept; the look-ahead lets storage
+anticipate the following time steps. The next window starts where the kept part
+of this window ends, with the energy stored in each storage technology at that
+time step. The size of each problem (and so the memory needed to solve it)
+depends on the window only, not on the length of the time series.
+
+Keywords in the CASE_DATA section of the case input file:
+
+    rolling_horizon -- True to use rolling-horizon dispatch (default False)
+    window_length   -- number of time steps kept from each window (default 168)
+    look_ahead      -- number of additional time steps in each window (default 24)
+
+Every technology with a capacity decision must have its <capacity> given in the
+TECH_DATA section. Storage starts from <energy_stored_initial> (default 0).
+
+Windows have the same structure, so the model is built with cvxpy Parameters
+(see Core_Model.py) and compiled once (twice if the last window is shorter).
+
+The results are stitched together into the <prob_dic>, <capacity_dic>,
+<dispatch_dic> form returned by extract_cvxpy_output.
+
+"""
+
+#%%
+
+import numpy as np
+
+from Core_Model import core_model, capacity_tech_types
+from Extract_Cvxpy_Output import extract_cvxpy_output
+
+#%%
+
+def rolling_horizon_dispatch(case_dic, tech_list):
+
+    if 'period_sequence' in case_dic:
+        raise ValueError('rolling_horizon cannot be combined with representative periods')
+    for tech_dic in tech_list:
+        if tech_dic['tech_type'] in capacity_tech_types and not 'capacity' in tech_dic:
+            raise ValueError('rolling_horizon requires capacity for technology ' + tech_dic['tech_name'])
+
+    num_time_periods = case_dic['num_time_periods']
+    window_length = case_dic['window_length']
+    look_ahead = case_dic['look_ahead']
+
+    # weight of each time step (see resample_time_steps in Time_Aggregation.py)
+    time_weights = case_dic.get('time_weights', np.ones(num_time_periods))
+
+    window_case_dic = dict(case_dic)
+    window_case_dic['parameterized'] = True
+    window_case_dic['verbose'] = False
+
+    # energy stored at the start of the next window
+    energy_stored = {}
+    for tech_dic in tech_list:
+        if tech_dic['tech_type'] == 'storage':
+            energy_stored[tech_dic['tech_name']] = tech_dic.get('energy_stored_initial', 0.0)
+
+    status_list = []
+    solve_time = 0.0
+    compilation_time = 0.0
+    var_cost_sum = 0.0
+    dispatch_list_dic = {}
+    node_price_list_dic = {}
+
+    num_windows = 0
+    for window_start in range(0, num_time_periods, window_length):
+        window_end = min(window_start + window_length + look_ahead, num_time_periods)
+        num_kept = min(window_length, num_time_periods - window_start)
+        num_windows += 1
+        if case_dic['verbose']:
+            print ('    window ' + str(num_windows) + ': time steps ' + str(window_start) + ' to ' + str(window_end - 1))
+
+        window_case_dic['num_time_periods'] = window_end - window_start
+        if 'time_weights' in case_dic:
+            window_case_dic['time_weights'] = time_weights[window_start:window_end]
+        window_tech_list = []
+        for tech_dic in tech_list:
+            window_tech_dic = dict(tech_dic)
+            if 'series' in tech_dic:
+                window_tech_dic['series'] = np.asarray(tech_dic['series'])[window_start:window_end]
+            if tech_dic['tech_type'] == 'storage':
+                window_tech_dic['energy_stored_initial'] = energy_stored[tech_dic['tech_name']]
+            window_tech_list.append(window_tech_dic)
+
+        constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(window_case_dic, window_tech_list)
+        window_prob_dic,capacity_dic,window_dispatch_dic = extract_cvxpy_output(window_case_dic,window_tech_list,constraint_dic,
+                        cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+
+        status_list.append(window_prob_dic['status'])
+        solve_time += window_prob_dic['solve_time']
+        compilation_time += window_prob_dic['compilation_time']
+
+        # keep the first <num_kept> time steps of the window
+        for key in window_dispatch_dic:
+            dispatch_list_dic.setdefault(key, []).append(window_dispatch_dic[key][:num_kept])
+        for node in window_prob_dic['node_price']:
+            node_price_list_dic.setdefault(node, []).append(window_prob_dic['node_price'][node][:num_kept])
+
+        for tech_dic in tech_list:
+            tech_name = tech_dic['tech_name']
+            if 'var_cost' in tech_dic:
+                for key in [tech_name + ' dispatch', tech_name + ' reverse dispatch']:
+                    if key in window_dispatch_dic:
+                        var_cost_sum += tech_dic['var_cost'] * np.sum(window_dispatch_dic[key][:num_kept] *
+                                                                      time_weights[window_start:window_start + num_kept])
+            if tech_dic['tech_type'] == 'storage':
+                energy_stored[tech_name] = storage_state(tech_dic, energy_stored[tech_name],
+                                window_dispatch_dic[tech_name + ' in dispatch'][:num_kept],
+                                window_dispatch_dic[tech_name + ' dispatch'][:num_kept],
+                                case_dic['time_step_hours'])
+
+    dispatch_dic = {}
+    for key in dispatch_list_dic:
+        dispatch_dic[key] = np.concatenate(dispatch_list_dic[key])
+    node_price = {}
+    for node in node_price_list_dic:
+        node_price[node] = np.concatenate(node_price_list_dic[node])
+
+    fixed_cost_sum = 0.0
+    for tech_dic in tech_list:
+        if tech_dic['tech_name'] in capacity_dic and 'fixed_cost' in tech_dic:
+            fixed_cost_sum += tech_dic['fixed_cost'] * tech_dic['capacity'] * np.sum(time_weights)
+
+    prob_dic = {}
+    non_optimal_list = [status for status in status_list if status != 'optimal']
+    if len(non_optimal_list) > 0:
+        prob_dic['status'] = non_optimal_list[0]
+    else:
+        prob_dic['status'] = 'optimal'
+    prob_dic['value'] = fixed_cost_sum + var_cost_sum
+    prob_dic['avg_cost'] = prob_dic['value'] / np.sum(time_weights)
+    prob_dic['solver_name'] = window_prob_dic['solver_name']
+    prob_dic['solver_version'] = window_prob_dic['solver_version']
+    prob_dic['solve_time'] = solve_time
+    prob_dic['compilation_time'] = compilation_time
+    prob_dic['num_windows'] = num_windows
+    prob_dic['node_price'] = node_price
+
+    if case_dic['verbose']:
+        print ('    ' + str(num_windows) + ' windows solved, total solve time ' + '%.3f' % solve_time + ' s')
+
+    return prob_dic, capacity_dic, dispatch_dic
+
+#%%
+
+def storage_state(tech_dic, energy_stored, dispatch_in, dispatch, time_step_hours = 1):
+    # Energy stored after the time steps of <dispatch_in> and <dispatch>,
+    # starting from <energy_stored>, using the storage balance of Core_Model.py.
+    decay_rate = tech_dic.get('decay_rate', 0.0)
+    efficiency = tech_dic.get('efficiency', 1.0)
+    for step in range(len(dispatch)):
+        energy_stored = energy_stored * (1 - decay_rate) + time_step_hours * (efficiency * dispatch_in[step] - dispatch[step])
+    # remove solver round-off outside the bounds of the storage
+    return min(max(energy_stored, 0.0), tech_dic['capacity'])
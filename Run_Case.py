@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+
+Run_Case.py
+
+The steps between preprocess_input and save_basic_results that every run of a
+case goes through, shared by Macro_Energy_Model.py and Batch_Runner.py so that
+a case gives the same results from either:
+
+    prepare_time_steps  -- time steps of <time_step_hours> hours, then
+                           <num_representative_periods> representative periods
+                           (see Time_Aggregation.py)
+    solve_case          -- the model the case asks for:
+                               <solution_file>   import_solution (Problem_File.py)
+                               <dispatch_only>   dispatch_only_model (Dispatch_Only.py)
+                               <rolling_horizon> rolling_horizon_dispatch (Rolling_Horizon.py)
+                               <benders>         benders_decomposition (Benders_Decomposition.py)
+                               <model_backend>   sparse: core_model_sparse (Core_Model_Sparse.py)
+                               otherwise         core_model and extract_cvxpy_output
+
+Capacities of <dispatch_only> cases must be set (load_fixed_capacities in
+Dispatch_Only.py) before solve_case.
+
+"""
+
+#%%
+
+from Core_Model import core_model
+from Core_Model_Sparse import core_model_sparse
+from Extract_Cvxpy_Output import extract_cvxpy_output
+from Time_Aggregation import aggregate_time_series, resample_time_steps
+from Rolling_Horizon import rolling_horizon_dispatch
+from Benders_Decomposition import benders_decomposition
+from Dispatch_Only import dispatch_only_model
+from Problem_File import import_solution
+
+#%%
+
+def prepare_time_steps(case_dic, tech_list):
+    # Returns the case and technology dictionaries with the time steps the model is built on.
+
+    if case_dic['time_step_hours'] > 1:
+        case_dic,tech_list = resample_time_steps(case_dic, tech_list)
+
+    if case_dic['num_representative_periods'] > 0:
+        case_dic,tech_list = aggregate_time_series(case_dic, tech_list)
+
+    return case_dic, tech_list
+
+def solve_case(case_dic, tech_list):
+    # Returns (cvxpy_constraints, prob_dic, capacity_dic, dispatch_dic);
+    # cvxpy_constraints is None unless the case is solved by core_model.
+
+    if case_dic['solution_file'] != '':
+        # solution of the problem file, solved outside MEM
+        return (None,) + import_solution(case_dic, tech_list, case_dic['solution_file'])
+    elif case_dic['dispatch_only']:
+        # dispatch of given capacities, in independent blocks of time steps where possible
+        return (None,) + dispatch_only_model(case_dic, tech_list)
+    elif case_dic['rolling_horizon']:
+        # dispatch with fixed capacities, one window of time steps at a time
+        return (None,) + rolling_horizon_dispatch(case_dic, tech_list)
+    elif case_dic['benders']:
+        # master problem over capacities, dispatch subproblems in parallel
+        return (None,) + benders_decomposition(case_dic, tech_list)
+    elif case_dic['model_backend'] == 'sparse':
+        # assemble scipy.sparse matrices directly, bypassing cvxpy
+        return (None,) + core_model_sparse(case_dic, tech_list)
+
+    constraint_dic,cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic = core_model(case_dic, tech_list)
+    prob_dic,capacity_dic,dispatch_dic = extract_cvxpy_output(case_dic,tech_list,constraint_dic,
+                    cvxpy_constraints,cvxpy_prob,cvxpy_capacity_dic,cvxpy_dispatch_dic)
+    return cvxpy_constraints, prob_dic, capacity_dic, dispatch_dic
@@ -12,6 +12,7 @@ save basic results for the simple energy model
 
 
 import os
+import io
 import copy
 import numpy as np
 import csv
@@ -21,6 +22,7 @@ import pickle
 import utilities
 import cvxpy
 import pandas as pd
+from Profiling import profile_stage
 
        
 #%%
@@ -44,7 +46,8 @@ def save_basic_results(case_dic, tech_list, constraints,prob_dic,capacity_dic,di
     case_output_dic = {} # one scalar item per element per case
     
     for key in case_dic:
-        case_output_dic[key] = case_dic[key]
+        if np.ndarray != type(case_dic[key]): # vectors (e.g., time_weights) are not case scalars
+            case_output_dic[key] = case_dic[key]
         
     temp_dic = flatten_dic(meanify(prob_dic))
     for key in temp_dic:
@@ -71,6 +74,8 @@ def save_basic_results(case_dic, tech_list, constraints,prob_dic,capacity_dic,di
     num_time_periods = case_dic['num_time_periods']
     time_output_dic = {} # one time vector per keyword
     time_output_dic['time_index'] = np.array(range(num_time_periods))
+    if 'time_weights' in case_dic: # representative periods
+        time_output_dic['time_weights'] = case_dic['time_weights']
     for item in tech_list:
         tech_name = item['tech_name']
         if 'series' in item:
@@ -85,7 +90,7 @@ def save_basic_results(case_dic, tech_list, constraints,prob_dic,capacity_dic,di
     
     case_df = pd.DataFrame(list(case_output_dic.items()))
     tech_df = pd.DataFrame(tech_output_dic_list)
-    time_df = pd.DataFrame(time_output_dic)
+    stats_df = reduce_vectors(time_output_dic)
     
     output_path = case_dic['output_path']
     case_name = case_dic['case_name']
@@ -95,21 +100,29 @@ def save_basic_results(case_dic, tech_list, constraints,prob_dic,capacity_dic,di
         str(today.hour).zfill(2) + str(today.minute).zfill(2) + str(today.second).zfill(2)
     
     output_file_name = case_name + '_vector_' + todayString
-    output_file_path_name = output_folder + "/" + output_file_name + '.xlsx'
+    output_format = case_dic['output_format']
+    output_file_path_name = output_folder + "/" + output_file_name + output_file_extension[output_format]
     
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     
-    writer = pd.ExcelWriter(output_file_path_name, engine = 'xlsxwriter')
-    case_df.to_excel(writer, sheet_name = 'case')  
-    tech_df.to_excel(writer, sheet_name = 'tech')
-    time_df.to_excel(writer, sheet_name = 'time') 
-    writer.save()
+    with profile_stage('save', output_format):
+        output_writer[output_format](output_file_path_name, case_df, tech_df, stats_df, time_output_dic)
     
     verbose = case_dic['verbose']       
     if verbose: 
         print ( 'file written: ' + output_file_path_name )
     
+    # case and tech tables as a small Excel file, next to a non-Excel results file
+    if case_dic['excel_summary'] and output_format != 'xlsx':
+        summary_file_path_name = output_folder + "/" + case_name + '_summary_' + todayString + '.xlsx'
+        with profile_stage('save', 'excel_summary'), pd.ExcelWriter(summary_file_path_name, engine = 'xlsxwriter') as writer:
+            case_df.to_excel(writer, sheet_name = 'case')
+            tech_df.to_excel(writer, sheet_name = 'tech')
+            stats_df.to_excel(writer, sheet_name = 'stats')
+        if verbose:
+            print ( 'file written: ' + summary_file_path_name )
+    
     return case_output_dic,tech_output_dic_list,time_output_dic
 
     
@@ -161,6 +174,97 @@ def temp():
     if verbose: 
         print ( 'file written: ' + output_file_name + '.csv')
 
+#%%
+# Results files. Each writer stores the case table, the tech table, the statistics
+# of the time series (see reduce_vectors) and the time series (one column per
+# keyword of <time_output_dic>) in a single file.
+# read_results_file reads any of them back as (case_df, tech_df, stats_df, time_df).
+#
+#   'xlsx'    -- sheets 'case', 'tech', 'stats' and 'time' (at most 1048575 time steps)
+#   'parquet' -- time series columns; other tables as json in the file metadata
+#                (requires pyarrow)
+#   'hdf5'    -- one compressed array per time series column in group /time, in
+#                the order of the names in its attribute column_names; other
+#                tables as json in arrays /case, /tech and /stats (requires pytables)
+#   'npz'     -- compressed numpy arrays 'time/<column>', other tables as json
+
+output_file_extension = {'xlsx':'.xlsx', 'parquet':'.parquet', 'hdf5':'.h5', 'npz':'.npz'}
+
+def write_xlsx_results(output_file_path_name, case_df, tech_df, stats_df, time_output_dic):
+    time_df = pd.DataFrame(time_output_dic)
+    if len(time_df) >= 1048576:
+        raise ValueError(str(len(time_df)) + ' time steps do not fit in an Excel sheet; ' +
+                         'use output_format parquet, hdf5 or npz')
+    with pd.ExcelWriter(output_file_path_name, engine = 'xlsxwriter') as writer:
+        case_df.to_excel(writer, sheet_name = 'case')
+        tech_df.to_excel(writer, sheet_name = 'tech')
+        stats_df.to_excel(writer, sheet_name = 'stats')
+        time_df.to_excel(writer, sheet_name = 'time')
+
+def write_parquet_results(output_file_path_name, case_df, tech_df, stats_df, time_output_dic):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.table({key: np.asarray(time_output_dic[key]) for key in time_output_dic})
+    table = table.replace_schema_metadata({'case': case_df.to_json(orient = 'split'),
+                                           'tech': tech_df.to_json(orient = 'split'),
+                                           'stats': stats_df.to_json(orient = 'split')})
+    pq.write_table(table, output_file_path_name)
+
+def write_hdf5_results(output_file_path_name, case_df, tech_df, stats_df, time_output_dic):
+    import tables
+    with tables.open_file(output_file_path_name, mode = 'w') as h5_file:
+        h5_file.create_array('/', 'case', obj = np.array([case_df.to_json(orient = 'split').encode()]))
+        h5_file.create_array('/', 'tech', obj = np.array([tech_df.to_json(orient = 'split').encode()]))
+        h5_file.create_array('/', 'stats', obj = np.array([stats_df.to_json(orient = 'split').encode()]))
+        # time series column by column, without a table of all of them
+        group = h5_file.create_group('/', 'time')
+        group._v_attrs.column_names = list(time_output_dic)
+        filters = tables.Filters(complevel = 5, complib = 'zlib')
+        for i, key in enumerate(time_output_dic):
+            h5_file.create_carray(group, 'column_' + str(i), obj = np.asarray(time_output_dic[key]), filters = filters)
+
+def write_npz_results(output_file_path_name, case_df, tech_df, stats_df, time_output_dic):
+    arrays = {'time/' + key: np.asarray(time_output_dic[key]) for key in time_output_dic}
+    arrays['case'] = np.array(case_df.to_json(orient = 'split'))
+    arrays['tech'] = np.array(tech_df.to_json(orient = 'split'))
+    arrays['stats'] = np.array(stats_df.to_json(orient = 'split'))
+    np.savez_compressed(output_file_path_name, **arrays)
+
+output_writer = {'xlsx':write_xlsx_results, 'parquet':write_parquet_results,
+                 'hdf5':write_hdf5_results, 'npz':write_npz_results}
+
+def read_results_file(output_file_path_name):
+    # Returns (case_df, tech_df, stats_df, time_df) from a file written by one of the writers above.
+    extension = os.path.splitext(output_file_path_name)[1]
+    if extension == '.xlsx':
+        sheets = pd.read_excel(output_file_path_name, sheet_name = None, index_col = 0)
+        return sheets['case'], sheets['tech'], sheets['stats'], sheets['time']
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(output_file_path_name)
+        metadata = table.schema.metadata
+        return (pd.read_json(io.StringIO(metadata[b'case'].decode()), orient = 'split'),
+                pd.read_json(io.StringIO(metadata[b'tech'].decode()), orient = 'split'),
+                pd.read_json(io.StringIO(metadata[b'stats'].decode()), orient = 'split'),
+                table.to_pandas())
+    elif extension == '.h5':
+        import tables
+        with tables.open_file(output_file_path_name, mode = 'r') as h5_file:
+            group = h5_file.get_node('/time')
+            time_df = pd.DataFrame({key: group._f_get_child('column_' + str(i)).read()
+                                    for i, key in enumerate(group._v_attrs.column_names)})
+            return (pd.read_json(io.StringIO(h5_file.root.case.read()[0].decode()), orient = 'split'),
+                    pd.read_json(io.StringIO(h5_file.root.tech.read()[0].decode()), orient = 'split'),
+                    pd.read_json(io.StringIO(h5_file.root.stats.read()[0].decode()), orient = 'split'),
+                    time_df)
+    else:
+        with np.load(output_file_path_name) as data:
+            time_df = pd.DataFrame({key[len('time/'):]: data[key] for key in data.files if key.startswith('time/')})
+            return (pd.read_json(io.StringIO(str(data['case'])), orient = 'split'),
+                    pd.read_json(io.StringIO(str(data['tech'])), orient = 'split'),
+                    pd.read_json(io.StringIO(str(data['stats'])), orient = 'split'),
+                    time_df)
+
 #%%
 # flatten dictionary of dictionaries to dictionary (1 level)
 def flatten_dic(dic_in):
@@ -176,16 +280,56 @@ def flatten_dic(dic_in):
 
 #%%
 # take mean if vector else return value
+# A new dictionary is built, so arrays in <dic_in> are read but never copied.
         
 def meanify(dic_in):
-    dic_out = copy.deepcopy(dic_in)
-    for item in dic_out:
-        if np.ndarray == type(dic_out[item]):
-            dic_out[item] = np.average(dic_out[item])
-        elif dict == type(dic_out[item]):
-            dic_out[item] = meanify(dic_out[item])
+    dic_out = {}
+    for item in dic_in:
+        if isinstance(dic_in[item], np.ndarray):
+            dic_out[item] = np.average(dic_in[item])
+        elif isinstance(dic_in[item], dict):
+            dic_out[item] = meanify(dic_in[item])
+        else:
+            dic_out[item] = copy.copy(dic_in[item])
     return dic_out
 
+#%%
+# Statistics of many vectors at once. Vectors of the same length are stacked
+# into blocks of at most <max_block_bytes> and each statistic is computed for
+# a whole block in one numpy call. Statistics are 'mean', 'sum', 'min', 'max'
+# and percentiles 'p<q>' (e.g., 'p5', 'p50', 'p95').
+# Returns a DataFrame with one row per statistic and one column per vector.
+
+default_statistics = ['mean', 'sum', 'min', 'max', 'p5', 'p50', 'p95']
+
+def reduce_vectors(vector_dic, statistics = default_statistics, max_block_bytes = 2**26):
+    
+    percentile_statistics = [statistic for statistic in statistics if statistic[0] == 'p']
+    percentiles = [float(statistic[1:]) for statistic in percentile_statistics]
+    
+    keys_by_length = {}
+    for key in vector_dic:
+        keys_by_length.setdefault(len(vector_dic[key]), []).append(key)
+    
+    result = {}
+    for length, key_list in keys_by_length.items():
+        block_size = max(1, max_block_bytes // (8 * max(length, 1)))
+        for block_start in range(0, len(key_list), block_size):
+            block_keys = key_list[block_start:block_start + block_size]
+            block = np.vstack([np.asarray(vector_dic[key], dtype = float) for key in block_keys])
+            block_result = {}
+            block_result['mean'] = np.mean(block, axis = 1)
+            block_result['sum'] = np.sum(block, axis = 1)
+            block_result['min'] = np.min(block, axis = 1)
+            block_result['max'] = np.max(block, axis = 1)
+            if len(percentiles) > 0:
+                for statistic, values in zip(percentile_statistics, np.percentile(block, percentiles, axis = 1)):
+                    block_result[statistic] = values
+            for i, key in enumerate(block_keys):
+                result[key] = [block_result[statistic][i] for statistic in statistics]
+    
+    return pd.DataFrame(result, index = statistics, columns = list(vector_dic))
+
 #%%
 def robust_dic(dic, key):
     if key in dic:
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+
+Solver_Interface.py
+
+Choose a solver for cvxpy and translate solver options.
+
+The solver is selected with the <solver> keyword in the CASE_DATA section of
+the case input file, e.g.,
+
+    solver,HIGHS
+
+If the requested solver is not installed, the first installed solver in
+<solver_fallback_order> is used instead. If a solver fails (cvxpy raises
+SolverError, or ValueError for a solution it cannot unpack), the other
+installed solvers of <solver_fallback_order> are tried in turn until one finds
+a solution, unless <solver_fallback> is False in the CASE_DATA section (as in
+Benchmarks/Benchmark_Solvers.py, which compares each solver on its own).
+A badly scaled problem (e.g., with a large <numerics_scaling>) can make the
+open-source solvers fail, so keep <numerics_scaling> 1 with those.
+
+Solver options are given with the <solver_options> keyword as a list of
+key=value pairs separated by semicolons, e.g.,
+
+    solver_options,threads=4; presolve=1; tolerance=1e-7
+
+The generic keys 'threads', 'method', 'presolve' and 'tolerance' are translated
+to the corresponding option names of the chosen solver (see <generic_options>),
+and their values where the solver expects other values (see
+<generic_option_values>; e.g., presolve=1 is presolve=on for HIGHS). A generic
+key that has no option for the chosen solver is dropped. Any other key is
+passed through to the solver unchanged, so solver specific options (e.g.
+BarConvTol for GUROBI) can be given directly. Options of HIGHS are passed to
+cvxpy in its <highs_options> dictionary, so that HIGHS options named like an
+argument of prob.solve (e.g., 'solver', the HIGHS name of 'method') can be given.
+
+With <warm_start> True in the CASE_DATA section, a problem solved again (as in
+a parameterized sweep, see Parameter_Sweep.py) starts from its previous
+solution: cvxpy passes the previous primal and dual solution to HIGHS, and
+GUROBI re-solves its previous model, keeping its basis. Other solvers start
+from their previous solution where cvxpy supports it. With <warm_start> False
+(the default) every solve starts from scratch.
+
+"""
+
+#%%
+
+import cvxpy as cvx
+from Profiling import profile_stage, add_profile_time
+
+# Solvers tried, in order, if the requested solver is not installed.
+# Only solvers that can solve linear programs are listed.
+solver_fallback_order = ['GUROBI', 'HIGHS', 'CPLEX', 'MOSEK', 'COPT', 'XPRESS',
+                         'CLARABEL', 'ECOS', 'SCS']
+
+# Python package providing each solver; used to report solver version.
+solver_packages = {'GUROBI':'gurobipy', 'HIGHS':'highspy', 'CPLEX':'cplex',
+                   'MOSEK':'mosek', 'COPT':'coptpy', 'XPRESS':'xpress',
+                   'CLARABEL':'clarabel', 'ECOS':'ecos', 'SCS':'scs',
+                   'OSQP':'osqp', 'SCIPY':'scipy', 'GLPK':'cvxopt',
+                   'CVXOPT':'cvxopt', 'CBC':'cylp', 'PIQP':'piqp'}
+
+# Translation of generic option names to solver specific option names.
+# A generic option that maps to a list sets each of the listed options.
+# A generic option that does not appear for a solver is ignored for that solver.
+generic_options = {
+    'GUROBI':   {'threads':'Threads', 'method':'Method', 'presolve':'Presolve',
+                 'tolerance':['FeasibilityTol', 'OptimalityTol']},
+    'HIGHS':    {'threads':'threads', 'method':'solver', 'presolve':'presolve',
+                 'tolerance':['primal_feasibility_tolerance', 'dual_feasibility_tolerance']}, # method: simplex, ipm or pdlp
+    'CPLEX':    {'threads':'threads', 'method':'lpmethod'},
+    'MOSEK':    {'threads':'MSK_IPAR_NUM_THREADS', 'presolve':'MSK_IPAR_PRESOLVE_USE'},
+    'COPT':     {'threads':'Threads', 'method':'LpMethod', 'presolve':'Presolve'},
+    'XPRESS':   {'threads':'threads', 'presolve':'presolve'},
+    'CLARABEL': {'tolerance':['tol_gap_abs', 'tol_gap_rel', 'tol_feas']},
+    'ECOS':     {'tolerance':['abstol', 'reltol', 'feastol']},
+    'SCS':      {'tolerance':['eps_abs', 'eps_rel']},
+    }
+
+# Translation of generic option values, for solvers that do not take the value
+# as given; values not listed are passed unchanged.
+generic_option_values = {
+    'HIGHS':    {'presolve':{1:'on', 0:'off', -1:'choose'}}, # also True and False
+    }
+
+# Solvers whose options cvxpy takes in a dictionary of their own, so that they
+# cannot clash with the arguments of prob.solve.
+nested_solver_options = {'HIGHS':'highs_options'}
+
+#%%
+
+def solve_problem(case_dic, prob):
+    # Solve cvxpy problem <prob> with the solver and options given in <case_dic>;
+    # if the solver fails, try the next installed solver (see <solver_fallback>).
+    # Returns the solver that solved the problem.
+
+    solver = select_solver(case_dic['solver'])
+    if case_dic['verbose']:
+        if solver != case_dic['solver'].upper():
+            print ('    solver ' + case_dic['solver'] + ' not available, using ' + solver)
+        else:
+            print ('    solver = ' + solver)
+
+    if case_dic['solver_fallback']:
+        solver_list = [solver] + fallback_solvers(solver)
+    else:
+        solver_list = [solver]
+
+    for k, solver in enumerate(solver_list):
+        solver_options = translate_solver_options(solver, parse_solver_options(case_dic['solver_options']))
+        try:
+            with profile_stage('solve', 'total'):
+                prob.solve(solver = solver, warm_start = case_dic['warm_start'], **solver_options)
+        except (cvx.error.SolverError, ValueError) as error:
+            if k == len(solver_list) - 1:
+                raise
+            print ('    solver ' + solver + ' failed (' + str(error).split(':')[0] + '), trying ' + solver_list[k + 1])
+            continue
+        # a solver tried after another one failed must also find a solution
+        if 0 < k < len(solver_list) - 1 and not prob.status in cvx.settings.SOLUTION_PRESENT:
+            print ('    solver ' + solver + ' returned ' + prob.status + ', trying ' + solver_list[k + 1])
+            continue
+        break
+    add_profile_time('compile', 'cvxpy', prob.compilation_time)
+    if prob.solver_stats.solve_time is not None:
+        add_profile_time('solver', solver, prob.solver_stats.solve_time)
+
+    return solver
+
+#%%
+
+def select_solver(requested_solver):
+    # Return <requested_solver> if installed, else the first installed
+    # solver in <solver_fallback_order>.
+    installed_solvers = cvx.installed_solvers()
+    for solver in [requested_solver.upper()] + solver_fallback_order:
+        if solver in installed_solvers:
+            return solver
+    raise RuntimeError('no solver for linear programs installed; tried ' +
+                       ', '.join([requested_solver] + solver_fallback_order))
+
+def fallback_solvers(solver):
+    # Installed solvers of <solver_fallback_order> other than <solver>, to try
+    # in turn if <solver> fails.
+    installed_solvers = cvx.installed_solvers()
+    return [other_solver for other_solver in solver_fallback_order
+            if other_solver in installed_solvers and other_solver != solver]
+
+#%%
+
+def parse_solver_options(text):
+    # Convert 'key1=value1; key2=value2' into a dictionary.
+    # Values are converted to int, float or bool where possible.
+    options = {}
+    for item in text.split(';'):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            options[key.strip()] = literal_to_value(value.strip())
+    return options
+
+def literal_to_value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    return text
+
+#%%
+
+def translate_solver_options(solver, options):
+    # Replace generic option names (and values) with those used by <solver>.
+    translation = generic_options.get(solver, {})
+    value_translation = generic_option_values.get(solver, {})
+    solver_options = {}
+    for key in options:
+        if key in ('threads', 'method', 'presolve', 'tolerance'):
+            if key in translation:
+                names = translation[key]
+                if not isinstance(names, list):
+                    names = [names]
+                value = options[key]
+                if key in value_translation and not isinstance(value, str):
+                    value = value_translation[key].get(value, value)
+                for name in names:
+                    solver_options[name] = value
+        else:
+            solver_options[key] = options[key]
+    if solver in nested_solver_options:
+        return {nested_solver_options[solver]:solver_options}
+    return solver_options
+
+#%%
+
+def get_solver_version(solver):
+    # Version of the python package providing <solver>, or 'unknown'.
+    try:
+        from importlib.metadata import version
+        return version(solver_packages[solver])
+    except Exception:
+        return 'unknown'
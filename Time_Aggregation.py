@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+
+Time_Aggregation.py
+
+Reduce the time series of a case to a set of representative periods
+(e.g., representative days or weeks), so that core_model solves a smaller,
+weighted problem.
+
+The time series of all technologies are cut into periods of <period_length>
+time steps. Periods are clustered together (k-means on the series of all
+technologies at once, each series normalized by its standard deviation), and
+for each cluster the actual period closest to the cluster mean is used as the
+representative period. Each representative period is weighted by the number of
+periods in its cluster.
+
+Keywords in the CASE_DATA section of the case input file:
+
+    num_representative_periods -- number of representative periods (0 = off)
+    period_length              -- number of time steps per period (default 24)
+
+After aggregation, case_dic contains:
+
+    num_time_periods        -- number of time steps in the reduced problem
+    num_time_periods_full   -- number of time steps before aggregation
+    time_weights            -- weight of each time step in the reduced problem
+    period_length           -- number of time steps per period
+    period_sequence         -- for each original period, the index of its
+                               representative period
+
+core_model uses <period_sequence> to link storage across the original sequence
+of periods, so that storage can shift energy between periods (seasonal storage),
+following Kotzur et al. (2018), Applied Energy 213, 123-135.
+
+Alternatively (or before aggregation), resample_time_steps makes the time steps
+longer than the hourly steps of the input: each time step of <time_step_hours>
+hours is the average of that many hourly values of each series. Dispatch stays
+a rate (energy per hour), so that capacities and results keep their units:
+
+    -- each time step has a time weight of <time_step_hours>, so that
+       variable costs count each hour and fixed costs all hours
+    -- storage moves <time_step_hours> times its dispatch into and out of
+       storage in each time step (see the storage balance in Core_Model.py),
+       so <charging_time> stays in hours
+    -- <decay_rate> (per hour) becomes the decay over one time step
+
+Keyword in the CASE_DATA section of the case input file:
+
+    time_step_hours -- hours per time step (default 1); num_time_periods
+                       must be a multiple of it
+
+<period_length>, <window_length> and other lengths are then in time steps of
+<time_step_hours>. Averaging smooths the peaks of demand and of wind and solar
+output, so results lose some accuracy (see Benchmarks/Benchmark_Time_Step.py).
+
+"""
+
+#%%
+
+import numpy as np
+
+#%%
+
+def aggregate_time_series(case_dic, tech_list):
+    # Returns copies of <case_dic> and <tech_list> with series replaced
+    # by the concatenated representative periods.
+
+    period_length = case_dic['period_length']
+    num_representative_periods = case_dic['num_representative_periods']
+    num_time_periods = case_dic['num_time_periods']
+
+    if num_time_periods % period_length != 0:
+        raise ValueError('num_time_periods (' + str(num_time_periods) + ') is not a multiple of ' +
+                         'period_length (' + str(period_length) + ')')
+    num_periods = num_time_periods // period_length
+    num_representative_periods = min(num_representative_periods, num_periods)
+
+    # feature matrix: one row per period, all series side by side
+    series_tech_list = [tech_dic for tech_dic in tech_list if 'series' in tech_dic]
+    feature_list = []
+    for tech_dic in series_tech_list:
+        series = np.asarray(tech_dic['series'], dtype = float)
+        scale = np.std(series)
+        if scale == 0:
+            scale = 1.0
+        feature_list.append((series / scale).reshape(num_periods, period_length))
+    if len(feature_list) > 0:
+        features = np.hstack(feature_list)
+    else:
+        features = np.zeros((num_periods, 1))
+
+    cluster_index = kmeans(features, num_representative_periods)
+
+    # representative period of each cluster: the member closest to the cluster mean
+    representative_list = []
+    for cluster in range(num_representative_periods):
+        members = np.flatnonzero(cluster_index == cluster)
+        centroid = np.mean(features[members], axis = 0)
+        distance = np.sum((features[members] - centroid)**2, axis = 1)
+        representative_list.append(members[np.argmin(distance)])
+    representative_periods = np.array(representative_list)
+    period_weights = np.bincount(cluster_index, minlength = num_representative_periods).astype(float)
+
+    # time step indices (in the full series) of the reduced problem
+    step_index = (representative_periods[:, np.newaxis] * period_length +
+                  np.arange(period_length)[np.newaxis, :]).flatten()
+
+    aggregated_case_dic = dict(case_dic)
+    aggregated_case_dic['num_time_periods_full'] = num_time_periods
+    aggregated_case_dic['num_time_periods'] = len(step_index)
+    aggregated_case_dic['time_weights'] = np.repeat(period_weights, period_length)
+    if 'time_weights' in case_dic: # time steps of more than one hour
+        aggregated_case_dic['time_weights'] *= case_dic['time_weights'][step_index]
+    aggregated_case_dic['period_sequence'] = cluster_index
+    aggregated_case_dic['num_representative_periods'] = num_representative_periods
+
+    aggregated_tech_list = []
+    for tech_dic in tech_list:
+        aggregated_tech_dic = dict(tech_dic)
+        if 'series' in tech_dic:
+            aggregated_tech_dic['series'] = np.asarray(tech_dic['series'])[step_index]
+        aggregated_tech_list.append(aggregated_tech_dic)
+
+    if case_dic['verbose']:
+        print ('    ' + str(num_periods) + ' periods of ' + str(period_length) + ' time steps aggregated into ' +
+               str(num_representative_periods) + ' representative periods')
+
+    return aggregated_case_dic, aggregated_tech_list
+
+#%%
+
+def resample_time_steps(case_dic, tech_list):
+    # Returns copies of <case_dic> and <tech_list> with time steps of
+    # <time_step_hours> hours, each the average of that many hourly steps.
+
+    time_step_hours = case_dic['time_step_hours']
+    num_time_periods = case_dic['num_time_periods']
+
+    if num_time_periods % time_step_hours != 0:
+        raise ValueError('num_time_periods (' + str(num_time_periods) + ') is not a multiple of ' +
+                         'time_step_hours (' + str(time_step_hours) + ')')
+    num_time_steps = num_time_periods // time_step_hours
+
+    resampled_case_dic = dict(case_dic)
+    resampled_case_dic['num_time_periods_hourly'] = num_time_periods
+    resampled_case_dic['num_time_periods'] = num_time_steps
+    resampled_case_dic['time_weights'] = np.full(num_time_steps, float(time_step_hours))
+
+    resampled_tech_list = []
+    for tech_dic in tech_list:
+        resampled_tech_dic = dict(tech_dic)
+        if 'series' in tech_dic:
+            resampled_tech_dic['series'] = np.mean(np.asarray(tech_dic['series'], dtype = float).reshape(
+                                                   num_time_steps, time_step_hours), axis = 1)
+        if 'decay_rate' in tech_dic:
+            resampled_tech_dic['decay_rate'] = 1.0 - (1.0 - tech_dic['decay_rate']) ** time_step_hours
+        resampled_tech_list.append(resampled_tech_dic)
+
+    if case_dic['verbose']:
+        print ('    ' + str(num_time_periods) + ' hourly time steps resampled into ' + str(num_time_steps) +
+               ' time steps of ' + str(time_step_hours) + ' hours')
+
+    return resampled_case_dic, resampled_tech_list
+
+#%%
+
+def kmeans(features, num_clusters, max_iterations = 100, seed = 0):
+    # Cluster the rows of <features>; returns the cluster index of each row.
+    # k-means++ initialization with a fixed seed, so results are reproducible.
+
+    rng = np.random.RandomState(seed)
+    num_rows = features.shape[0]
+
+    centroids = [features[rng.randint(num_rows)]]
+    for cluster in range(1, num_clusters):
+        distance = np.min([np.sum((features - centroid)**2, axis = 1) for centroid in centroids], axis = 0)
+        if np.sum(distance) > 0:
+            centroids.append(features[rng.choice(num_rows, p = distance / np.sum(distance))])
+        else:
+            centroids.append(features[rng.randint(num_rows)])
+    centroids = np.array(centroids)
+
+    cluster_index = np.full(num_rows, -1)
+    for iteration in range(max_iterations):
+        distance = (np.sum(features**2, axis = 1)[:, np.newaxis]
+                    - 2. * features @ centroids.T
+                    + np.sum(centroids**2, axis = 1)[np.newaxis, :])
+        new_cluster_index = np.argmin(distance, axis = 1)
+        # do not allow empty clusters: give an empty cluster the row farthest from its centroid
+        for cluster in range(num_clusters):
+            if not np.any(new_cluster_index == cluster):
+                farthest = np.argmax(distance[np.arange(num_rows), new_cluster_index])
+                new_cluster_index[farthest] = cluster
+                distance[farthest, :] = 0.
+        if np.array_equal(new_cluster_index, cluster_index):
+            break
+        cluster_index = new_cluster_index
+        for cluster in range(num_clusters):
+            centroids[cluster] = np.mean(features[cluster_index == cluster], axis = 0)
+
+    return cluster_index
@@ -8,6 +8,8 @@ Created on Sat Jul 27 08:30:50 2019
 @author: kcaldeira
 """
 
+import numpy as np
+
 #%%  Convert dictionary of lists to list of dictionaries
 
 def dict_of_lists_to_list_of_dicts(dict_of_lists):
@@ -51,15 +53,33 @@ def unique_list_of_lists(lol):
 #%%
 
 def get_nodes(tech_list):
-    
-    node_list = []
+    # Nodes of all techs, each once, in order of first appearance
+    # (a dictionary keeps the order and finds nodes already seen in constant time)
+    node_dic = {}
     for item in tech_list:
         if 'node_to' in item:
-            node = item['node_to']
-            if not node in node_list:
-                node_list += [node]
+            node_dic[item['node_to']] = None
         if 'node_from' in item:
-            node = item['node_from']
-            if not node in tech_list:
-                node_list += [node]
-    return node_list
\ No newline at end of file
+            node_dic[item['node_from']] = None
+    return list(node_dic)
+
+#%%  Order points so that each point is close to the one before
+
+def nearest_neighbour_order(points):
+    # Greedy nearest-neighbour path through the rows of <points> (num_points x
+    # num_dimensions), starting at the row with the smallest values. Each
+    # dimension is scaled by its range, so that dimensions with large values
+    # do not dominate.
+    # Returns the list of row indices in path order.
+    points = np.asarray(points, dtype = float)
+    points = points.reshape(len(points), -1)
+    value_range = np.ptp(points, axis = 0)
+    value_range[value_range == 0] = 1.
+    points = (points - np.min(points, axis = 0)) / value_range
+    
+    order = [int(np.argmin(np.sum(points, axis = 1)))]
+    remaining = [i for i in range(len(points)) if i != order[0]]
+    while len(remaining) > 0:
+        distance = np.sum((points[remaining] - points[order[-1]])**2, axis = 1)
+        order.append(remaining.pop(int(np.argmin(distance))))
+    return order